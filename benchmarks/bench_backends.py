@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark dei backend PDF (pypdf contro PyMuPDF) e calibrazione della scelta automatica
+
+Per ogni operazione (unione, divisione, rotazione, testo) e per documenti
+di dimensioni crescenti misura i due motori e ricava la tabella usata dal
+backend "auto": per ogni fascia di dimensione vince il motore più veloce.
+Con --save la tabella viene scritta in ~/.pdf_editor_pro/backend_calibration.json.
+
+Uso:
+    python benchmarks/bench_backends.py --pages 5 50 500 --save
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir.parent / "src"))
+
+import fitz
+
+from pdf_backends import CALIBRATION_FILE, OPERATIONS, available_backends, get_backend
+
+
+def generate_document(path, num_pages):
+    """Genera un documento di testo deterministico"""
+    doc = fitz.open()
+    for i in range(num_pages):
+        page = doc.new_page()
+        for line in range(40):
+            page.insert_text((40, 40 + line * 18),
+                             f"Riga {line + 1} della pagina {i + 1}: testo di esempio per il benchmark")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def run_operation(engine, operation, source, work_dir):
+    """Esegue un'operazione e restituisce il tempo in secondi"""
+    start_time = time.perf_counter()
+    if operation == 'merge':
+        engine.merge([source] * 3, os.path.join(work_dir, "merged.pdf"))
+    elif operation == 'split':
+        split_dir = tempfile.mkdtemp(dir=work_dir)
+        engine.split_pages(source, lambda i: os.path.join(split_dir, f"page_{i + 1}.pdf"))
+    elif operation == 'rotate':
+        engine.rotate(source, os.path.join(work_dir, "rotated.pdf"), 90)
+    else:
+        for _ in engine.iter_text(source):
+            pass
+    return time.perf_counter() - start_time
+
+
+def calibrate(measures):
+    """Converte le misure in regole [dimensione massima, backend] per operazione
+
+    Il confine tra due fasce con vincitori diversi è la media geometrica
+    delle due dimensioni misurate.
+    """
+    calibration = {}
+    for operation in OPERATIONS:
+        points = sorted((size, min(timings, key=timings.get))
+                        for size, timings in measures[operation].items())
+        rules = []
+        for (size, winner), following in zip(points, points[1:] + [None]):
+            if following is not None and following[1] == winner:
+                continue
+            max_size = None if following is None else int((size * following[0]) ** 0.5)
+            rules.append([max_size, winner])
+        calibration[operation] = rules
+    return calibration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=[5, 50, 500],
+                        help="numero di pagine dei documenti di prova")
+    parser.add_argument('--save', action='store_true',
+                        help=f"salva la calibrazione in {CALIBRATION_FILE}")
+    args = parser.parse_args()
+
+    backends = available_backends()
+    measures = {operation: {} for operation in OPERATIONS}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for num_pages in args.pages:
+            source = generate_document(os.path.join(work_dir, f"doc_{num_pages}.pdf"), num_pages)
+            size = os.path.getsize(source)
+            print(f"\n{num_pages} pagine ({size / 1024:.0f} KB)")
+            for operation in OPERATIONS:
+                timings = {name: run_operation(get_backend(name), operation, source, work_dir)
+                           for name in backends}
+                measures[operation][size] = timings
+                row = "  ".join(f"{name} {seconds:7.3f}s" for name, seconds in timings.items())
+                print(f"  {operation:<7} {row}")
+
+    calibration = calibrate(measures)
+    print("\nCalibrazione:")
+    print(json.dumps(calibration, indent=4))
+    if args.save:
+        CALIBRATION_FILE.parent.mkdir(exist_ok=True)
+        with open(CALIBRATION_FILE, 'w', encoding='utf-8') as f:
+            json.dump(calibration, f, indent=4)
+        print(f"Salvata in {CALIBRATION_FILE}")
+
+
+if __name__ == "__main__":
+    main()
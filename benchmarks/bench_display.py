@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark della visualizzazione di una pagina: render -> QPixmap
+
+Confronta, per ogni livello di zoom, il percorso di riserva di
+AcrobatLikeGUI.update_display (PPM -> PIL -> PNG -> QImage) con quello
+diretto, che passa a QImage i pixel del fitz.Pixmap senza codifiche.
+La pagina di prova è un disegno tecnico A3 (molti tratti vettoriali);
+il tempo del render, uguale nei due casi, viene riportato a parte.
+
+Uso:
+    python benchmarks/bench_display.py --zoom 1 2 4 --repeat 5
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_display.py
+"""
+
+import argparse
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir.parent / "src"))
+
+import fitz
+from PIL import Image
+from PySide6.QtGui import QGuiApplication, QPixmap
+
+from acrobat_like_gui import pil_to_qimage, pixmap_to_qimage
+
+
+def generate_drawing():
+    """Pagina A3 orizzontale con una griglia fitta di linee e cerchi"""
+    doc = fitz.open()
+    width, height = fitz.paper_size("a3-l")
+    page = doc.new_page(width=width, height=height)
+    for x in range(20, int(width) - 20, 12):
+        page.draw_line((x, 20), (x, height - 20), color=(0.6, 0.6, 0.6), width=0.3)
+    for y in range(20, int(height) - 20, 12):
+        page.draw_line((20, y), (width - 20, y), color=(0.6, 0.6, 0.6), width=0.3)
+    for i in range(200):
+        center = (40 + (i * 37) % (width - 80), 40 + (i * 53) % (height - 80))
+        page.draw_circle(center, 5 + i % 25, color=(0, 0, 0.5), width=0.8)
+    return doc
+
+
+def measure(function, repeat):
+    """Mediana dei tempi di function(), in millisecondi"""
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start_time) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--zoom', type=float, nargs='+', default=[1.0, 2.0, 4.0],
+                        help="livelli di zoom da misurare")
+    parser.add_argument('--repeat', type=int, default=5, help="ripetizioni per misura (mediana)")
+    args = parser.parse_args()
+
+    app = QGuiApplication.instance() or QGuiApplication(sys.argv[:1])
+    page = generate_drawing()[0]
+
+    print(f"{'zoom':>5} {'pixel':>11} {'render':>9} {'PIL+PNG':>9} {'diretto':>9} {'speedup':>8}")
+    for zoom in args.zoom:
+        matrix = fitz.Matrix(zoom, zoom)
+        pix = page.get_pixmap(matrix=matrix)
+        render_ms = measure(lambda: page.get_pixmap(matrix=matrix), args.repeat)
+        fallback_ms = measure(
+            lambda: QPixmap.fromImage(pil_to_qimage(Image.open(io.BytesIO(pix.tobytes("ppm"))))),
+            args.repeat)
+        direct_ms = measure(lambda: QPixmap.fromImage(pixmap_to_qimage(pix)), args.repeat)
+        print(f"{zoom:>5.1f} {f'{pix.width}x{pix.height}':>11} {render_ms:>7.1f}ms "
+              f"{fallback_ms:>7.1f}ms {direct_ms:>7.1f}ms {fallback_ms / direct_ms:>7.1f}x")
+    del app
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark dell'unione PDF: implementazione standard contro streaming con deduplicazione
+
+Genera N fatture che condividono lo stesso font TrueType incorporato e lo
+stesso logo, poi confronta dimensione del file prodotto, tempo e picco di memoria.
+
+Uso:
+    python benchmarks/bench_merge.py --files 500
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir.parent / "src"))
+
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from pdf_manager import PDFManager
+
+
+def build_logo():
+    """Crea un logo PNG deterministico in memoria"""
+    logo = Image.new('RGB', (400, 200))
+    pixels = logo.load()
+    for x in range(400):
+        for y in range(200):
+            pixels[x, y] = ((x * 7) % 256, (y * 5) % 256, ((x + y) * 3) % 256)
+    buffer = io.BytesIO()
+    logo.save(buffer, format='PNG')
+    buffer.seek(0)
+    return buffer
+
+
+def generate_invoices(output_dir, count):
+    """Genera fatture che condividono font e logo incorporati"""
+    pdfmetrics.registerFont(TTFont('Vera', 'Vera.ttf'))
+    logo = ImageReader(build_logo())
+    paths = []
+    for i in range(count):
+        path = os.path.join(output_dir, f"fattura_{i:05d}.pdf")
+        c = canvas.Canvas(path, pagesize=A4)
+        c.drawImage(logo, 40, 740, width=160, height=80)
+        c.setFont('Vera', 12)
+        c.drawString(40, 700, f"Fattura n. {i + 1}")
+        for row in range(20):
+            c.drawString(40, 660 - row * 18, f"Articolo {row + 1} ........ {(i + row) * 3.5:.2f} EUR")
+        c.save()
+        paths.append(path)
+    return paths
+
+
+def measure(label, func):
+    """Esegue func misurando tempo e picco di memoria Python"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    ok = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'label': label, 'ok': ok, 'seconds': elapsed, 'peak_mb': peak / (1024 * 1024)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark unione PDF")
+    parser.add_argument('--files', type=int, default=200, help="Numero di fatture da unire")
+    args = parser.parse_args()
+
+    manager = PDFManager()
+    with tempfile.TemporaryDirectory() as work_dir:
+        print(f"Generazione di {args.files} fatture...")
+        inputs = generate_invoices(work_dir, args.files)
+        standard_out = os.path.join(work_dir, "merged_standard.pdf")
+        streaming_out = os.path.join(work_dir, "merged_streaming.pdf")
+
+        results = [
+            measure("standard", lambda: manager.merge_pdfs(inputs, standard_out)),
+            measure("streaming", lambda: manager.merge_pdfs(inputs, streaming_out, streaming=True)),
+        ]
+        results[0]['size_mb'] = os.path.getsize(standard_out) / (1024 * 1024)
+        results[1]['size_mb'] = os.path.getsize(streaming_out) / (1024 * 1024)
+
+    print(f"\n{'Modalità':<12}{'Tempo (s)':>12}{'Picco (MB)':>14}{'Output (MB)':>14}")
+    for result in results:
+        print(f"{result['label']:<12}{result['seconds']:>12.2f}"
+              f"{result['peak_mb']:>14.1f}{result['size_mb']:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
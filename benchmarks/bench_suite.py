@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Suite di benchmark delle operazioni del motore PDF
+
+Per ogni tipo di documento del corpus sintetico (vedi corpus.py) e per
+ogni dimensione misura unione, divisione, estrazione del testo, render
+delle pagine e ricerca, con il picco di memoria (RSS) di ciascuna
+misura. Ogni misura gira in un processo separato: il picco di memoria
+non è influenzato dalle misure precedenti.
+
+I risultati vengono scritti in JSON; con --baseline vengono confrontati
+con un'esecuzione precedente e le operazioni più lente (o con più
+memoria) oltre la soglia vengono segnalate come regressioni.
+
+Uso:
+    python benchmarks/bench_suite.py --pages 10 1000 --output risultati.json
+    python benchmarks/bench_suite.py --pages 10 1000 --baseline baseline.json --fail-on-regression
+    python benchmarks/bench_suite.py --kinds text --pages 100000 --operations split extract_text
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir.parent / "src"))
+sys.path.insert(0, str(current_dir))
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import fitz
+import pypdf
+
+from corpus import KINDS, ensure_corpus
+from advanced_pdf_editor import AdvancedPDFEditor
+from pdf_manager import PDFManager
+
+OPERATIONS = ('merge', 'split', 'extract_text', 'get_page_image', 'search_text')
+
+SEARCH_TERM = "riservato"
+
+
+def _reset_peak_rss():
+    """Azzera il picco di memoria del processo (solo Linux, se consentito)"""
+    try:
+        with open("/proc/self/clear_refs", 'w') as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    """Picco di memoria residente del processo in MB (None se non misurabile)"""
+    try:
+        # VmHWM: a differenza di ru_maxrss non eredita il picco del processo padre
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux riporta KB, macOS byte
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_once(operation, source, work_dir, options):
+    """Esegue l'operazione una volta; restituisce (secondi, pagine elaborate)"""
+    manager = PDFManager(backend=options.get('backend'))
+    if operation == 'merge':
+        start_time = time.perf_counter()
+        ok = manager.merge_pdfs([source, source], os.path.join(work_dir, "merged.pdf"))
+        pages = options['pages'] * 2
+    elif operation == 'split':
+        split_dir = tempfile.mkdtemp(dir=work_dir)
+        start_time = time.perf_counter()
+        ok = manager.split_pdf_pages(source, split_dir, workers=options.get('workers', 1))
+        pages = options['pages']
+    elif operation == 'extract_text':
+        start_time = time.perf_counter()
+        ok = manager.extract_text(source, os.path.join(work_dir, "testo.txt"),
+                                  workers=options.get('workers', 1))
+        pages = options['pages']
+    else:
+        editor = AdvancedPDFEditor()
+        if not editor.open_pdf(source):
+            raise RuntimeError(f"Impossibile aprire {source}")
+        try:
+            start_time = time.perf_counter()
+            if operation == 'get_page_image':
+                pages = min(options['pages'], options.get('render_pages', 25))
+                ok = all(editor.get_page_image(i, options.get('zoom', 1.0)) is not None
+                         for i in range(pages))
+            else:
+                editor.search_text(SEARCH_TERM)
+                ok, pages = True, options['pages']
+        finally:
+            elapsed = time.perf_counter() - start_time
+            editor.close_pdf()
+        if not ok:
+            raise RuntimeError(f"Operazione {operation} non riuscita")
+        return elapsed, pages
+    elapsed = time.perf_counter() - start_time
+    if not ok:
+        raise RuntimeError(f"Operazione {operation} non riuscita")
+    return elapsed, pages
+
+
+def measure(operation, source, options):
+    """Ripete l'operazione options['repeat'] volte e riassume tempi e memoria"""
+    _reset_peak_rss()
+    rss_start = _peak_rss_mb()
+    runs = []
+    pages = 0
+    for _ in range(options.get('repeat', 3)):
+        work_dir = tempfile.mkdtemp(prefix="bench_")
+        try:
+            seconds, pages = _run_once(operation, source, work_dir, options)
+            runs.append(seconds)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    seconds = statistics.median(runs)
+    return {
+        'seconds': seconds,
+        'min_seconds': min(runs),
+        'runs': runs,
+        'pages_processed': pages,
+        'pages_per_second': pages / seconds if seconds > 0 else None,
+        'rss_start_mb': rss_start,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def run_suite(kinds=KINDS, page_counts=(10, 100), operations=OPERATIONS, corpus_dir=None,
+              isolate=True, log=print, **options):
+    """Esegue tutte le combinazioni tipo × pagine × operazione
+
+    Args:
+        corpus_dir: cartella del corpus (i documenti già generati vengono
+            riusati); None = cartella temporanea
+        isolate: se True ogni misura gira in un nuovo processo
+        options: repeat, backend, workers, render_pages, zoom
+
+    Returns:
+        dict con "meta" (ambiente) e "results" (una voce per misura)
+    """
+    temporary = corpus_dir is None
+    if temporary:
+        corpus_dir = tempfile.mkdtemp(prefix="corpus_")
+    results = []
+    try:
+        # spawn: il processo figlio non eredita la memoria del processo principale
+        context = multiprocessing.get_context('spawn')
+        for kind in kinds:
+            for num_pages in page_counts:
+                source = ensure_corpus(corpus_dir, kind, num_pages)
+                for operation in operations:
+                    measure_options = dict(options, pages=num_pages)
+                    if isolate:
+                        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                            entry = executor.submit(measure, operation, source, measure_options).result()
+                    else:
+                        entry = measure(operation, source, measure_options)
+                    entry = dict(kind=kind, pages=num_pages, operation=operation,
+                                 file_size=os.path.getsize(source), **entry)
+                    results.append(entry)
+                    log(format_entry(entry))
+    finally:
+        if temporary:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    return {'meta': environment(options, isolate), 'results': results}
+
+
+def environment(options, isolate):
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pymupdf': fitz.VersionBind,
+        'pypdf': pypdf.__version__,
+        'isolated': isolate,
+        'options': options,
+    }
+
+
+def result_key(entry):
+    return f"{entry['kind']}/{entry['pages']}/{entry['operation']}"
+
+
+def format_entry(entry):
+    rss = f"{entry['peak_rss_mb']:8.1f} MB" if entry['peak_rss_mb'] is not None else "       - MB"
+    return (f"{result_key(entry):<36} {entry['seconds'] * 1000:10.1f} ms  "
+            f"{entry['pages_per_second'] or 0:10.0f} pag/s  {rss}")
+
+
+def compare(results, baseline, threshold=0.10):
+    """Confronta i risultati con una baseline
+
+    Una misura è una regressione se tempo o picco di memoria superano
+    quelli della baseline di oltre threshold (0.10 = 10%), un
+    miglioramento se il tempo è inferiore di oltre threshold.
+
+    Returns:
+        Lista di dict (key, seconds, baseline_seconds, time_ratio,
+        rss_ratio, status) con status "regression", "improvement", "ok"
+        o "new" (misura assente nella baseline)
+    """
+    reference = {result_key(entry): entry for entry in baseline['results']}
+    comparison = []
+    for entry in results['results']:
+        key = result_key(entry)
+        base = reference.get(key)
+        if base is None:
+            comparison.append({'key': key, 'seconds': entry['seconds'], 'status': 'new'})
+            continue
+        time_ratio = entry['seconds'] / base['seconds'] if base['seconds'] > 0 else None
+        rss_ratio = None
+        if entry.get('peak_rss_mb') and base.get('peak_rss_mb'):
+            rss_ratio = entry['peak_rss_mb'] / base['peak_rss_mb']
+        if (time_ratio or 0) > 1 + threshold or (rss_ratio or 0) > 1 + threshold:
+            status = 'regression'
+        elif time_ratio is not None and time_ratio < 1 - threshold:
+            status = 'improvement'
+        else:
+            status = 'ok'
+        comparison.append({'key': key, 'seconds': entry['seconds'],
+                           'baseline_seconds': base['seconds'], 'time_ratio': time_ratio,
+                           'rss_ratio': rss_ratio, 'status': status})
+    return comparison
+
+
+def format_comparison(comparison):
+    lines = []
+    for item in comparison:
+        if item['status'] == 'new':
+            lines.append(f"{item['key']:<36} {'nuova':>10}")
+            continue
+        seconds = f"{item['time_ratio']:.2f}x" if item['time_ratio'] is not None else "-"
+        rss = f"{item['rss_ratio']:.2f}x" if item['rss_ratio'] is not None else "-"
+        lines.append(f"{item['key']:<36} tempo {seconds:>6}  memoria {rss:>6}  "
+                     f"{item['status']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark delle operazioni del motore PDF")
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=list(KINDS))
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 100],
+                        help="dimensioni dei documenti (es: 10 1000 100000)")
+    parser.add_argument('--operations', nargs='+', choices=OPERATIONS, default=list(OPERATIONS))
+    parser.add_argument('--repeat', type=int, default=3, help="ripetizioni per misura (si usa la mediana)")
+    parser.add_argument('--backend', choices=['auto', 'pypdf', 'pymupdf'], default=None)
+    parser.add_argument('--workers', type=int, default=1, help="processi per divisione e testo")
+    parser.add_argument('--render-pages', type=int, default=25, help="pagine da renderizzare per misura")
+    parser.add_argument('--corpus', help="cartella del corpus da riusare tra le esecuzioni")
+    parser.add_argument('--no-isolate', dest='isolate', action='store_false',
+                        help="misure nel processo principale (il picco di memoria diventa cumulativo)")
+    parser.add_argument('--output', default="bench_results.json", help="file JSON dei risultati")
+    parser.add_argument('--baseline', help="risultati precedenti con cui confrontare")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="variazione oltre la quale segnalare una regressione (0.10 = 10%%)")
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help="termina con codice 1 in caso di regressioni")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.kinds, args.pages, args.operations, corpus_dir=args.corpus,
+                        isolate=args.isolate, repeat=args.repeat, backend=args.backend,
+                        workers=args.workers, render_pages=args.render_pages)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nRisultati salvati in {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        comparison = compare(results, baseline, args.threshold)
+        print(f"\nConfronto con {args.baseline}:")
+        print(format_comparison(comparison))
+        regressions = [item for item in comparison if item['status'] == 'regression']
+        if regressions:
+            print(f"\n{len(regressions)} regressioni oltre il {args.threshold:.0%}")
+            if args.fail_on_regression:
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
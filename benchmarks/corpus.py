@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Generatore di corpus PDF sintetici e deterministici per i benchmark
+
+Tipi di documento:
+    text        pagine di testo fitto (reportlab)
+    image       una foto JPEG diversa per pagina più una didascalia (reportlab)
+    form        campi modulo: testo, checkbox e combo (PyMuPDF)
+    annotation  evidenziazioni, note, rettangoli e testo libero (PyMuPDF)
+
+Con lo stesso tipo, numero di pagine e seme il file prodotto è identico
+byte per byte. Un blocco di al massimo BLOCK_PAGES pagine diverse viene
+generato una volta e replicato fino al numero di pagine richiesto, così
+anche i documenti da 100k pagine si creano in tempi ragionevoli.
+
+Uso:
+    python benchmarks/corpus.py text 1000 -o corpus/
+    python benchmarks/corpus.py all 10 100 -o corpus/
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+
+import fitz
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+KINDS = ('text', 'image', 'form', 'annotation')
+
+BLOCK_PAGES = 50
+
+WORDS = ("documento contratto fattura pagina benchmark sezione articolo clausola importo "
+         "cliente fornitore consegna ordine riservato allegato firma data totale").split()
+
+SAVE_OPTIONS = {'garbage': 1, 'deflate': True, 'no_new_id': True}
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _text_block(path, num_pages, rng):
+    c = canvas.Canvas(path, pagesize=A4, invariant=1)
+    for page in range(num_pages):
+        c.setFont('Helvetica-Bold', 14)
+        c.drawString(40, 800, f"Sezione {page + 1}")
+        c.setFont('Helvetica', 9)
+        for line in range(70):
+            c.drawString(40, 780 - line * 11, _sentence(rng))
+        c.showPage()
+    c.save()
+
+
+def _photo(rng, size=(600, 400)):
+    """Immagine JPEG deterministica con sfumature e rumore (poco comprimibile)"""
+    base = Image.linear_gradient('L').resize(size).convert('RGB')
+    noise = Image.frombytes('RGB', size, rng.randbytes(size[0] * size[1] * 3))
+    image = Image.blend(base, noise, 0.35)
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=85)
+    buffer.seek(0)
+    return ImageReader(buffer)
+
+
+def _image_block(path, num_pages, rng):
+    c = canvas.Canvas(path, pagesize=A4, invariant=1)
+    for page in range(num_pages):
+        c.drawImage(_photo(rng), 40, 380, width=515, height=400)
+        c.setFont('Helvetica', 10)
+        c.drawString(40, 360, f"Figura {page + 1}: {_sentence(rng, 8)}")
+        c.showPage()
+    c.save()
+
+
+def _form_block(path, num_pages, rng):
+    doc = fitz.open()
+    for page_index in range(num_pages):
+        page = doc.new_page()
+        page.insert_text((40, 50), f"Modulo {page_index + 1}", fontsize=14)
+        for row in range(8):
+            top = 80 + row * 70
+            page.insert_text((40, top + 14), f"Campo {row + 1}", fontsize=10)
+            widget = fitz.Widget()
+            widget.rect = fitz.Rect(140, top, 420, top + 20)
+            widget.field_name = f"p{page_index + 1}_campo{row + 1}"
+            if row % 3 == 0:
+                widget.field_type = fitz.PDF_WIDGET_TYPE_CHECKBOX
+                widget.rect = fitz.Rect(140, top, 160, top + 20)
+                widget.field_value = rng.random() < 0.5
+            elif row % 3 == 1:
+                widget.field_type = fitz.PDF_WIDGET_TYPE_COMBOBOX
+                widget.choice_values = WORDS[:5]
+                widget.field_value = rng.choice(WORDS[:5])
+            else:
+                widget.field_type = fitz.PDF_WIDGET_TYPE_TEXT
+                widget.field_value = _sentence(rng, 4)
+            page.add_widget(widget)
+    doc.save(path, **SAVE_OPTIONS)
+    doc.close()
+
+
+def _annotation_block(path, num_pages, rng):
+    doc = fitz.open()
+    for page_index in range(num_pages):
+        page = doc.new_page()
+        for line in range(30):
+            page.insert_text((40, 60 + line * 22), _sentence(rng, 10), fontsize=10)
+        for i in range(10):
+            top = 50 + i * 66
+            kind = i % 4
+            if kind == 0:
+                page.add_highlight_annot(fitz.Rect(40, top, 400, top + 14))
+            elif kind == 1:
+                page.add_text_annot((520, top), _sentence(rng, 6))
+            elif kind == 2:
+                page.add_rect_annot(fitz.Rect(60, top, 300, top + 40))
+            else:
+                page.add_freetext_annot(fitz.Rect(320, top, 560, top + 30), _sentence(rng, 5),
+                                        fontsize=8)
+    doc.save(path, **SAVE_OPTIONS)
+    doc.close()
+
+
+GENERATORS = {
+    'text': _text_block,
+    'image': _image_block,
+    'form': _form_block,
+    'annotation': _annotation_block,
+}
+
+
+def generate(kind, num_pages, path, seed=0):
+    """Genera un documento del tipo indicato con num_pages pagine"""
+    if kind not in GENERATORS:
+        raise ValueError(f"Tipo di corpus sconosciuto: '{kind}' (disponibili: {', '.join(KINDS)})")
+    rng = random.Random(f"{kind}-{seed}")
+    block_pages = min(num_pages, BLOCK_PAGES)
+    if block_pages == num_pages:
+        GENERATORS[kind](path, num_pages, rng)
+        return path
+
+    block_path = f"{path}.block"
+    try:
+        GENERATORS[kind](block_path, block_pages, rng)
+        with fitz.open(block_path) as block, fitz.open() as doc:
+            full, rest = divmod(num_pages, block_pages)
+            for _ in range(full):
+                doc.insert_pdf(block)
+            if rest:
+                doc.insert_pdf(block, to_page=rest - 1)
+            doc.save(path, **SAVE_OPTIONS)
+    finally:
+        if os.path.exists(block_path):
+            os.remove(block_path)
+    return path
+
+
+def corpus_path(corpus_dir, kind, num_pages, seed=0):
+    return os.path.join(corpus_dir, f"{kind}_{num_pages}p_s{seed}.pdf")
+
+
+def ensure_corpus(corpus_dir, kind, num_pages, seed=0):
+    """Percorso del documento nel corpus, generato solo se non esiste già"""
+    path = corpus_path(corpus_dir, kind, num_pages, seed)
+    if not os.path.exists(path):
+        os.makedirs(corpus_dir, exist_ok=True)
+        # Scritto con un nome temporaneo: un'interruzione non lascia file incompleti
+        generate(kind, num_pages, path + ".tmp", seed)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera un corpus PDF sintetico e deterministico")
+    parser.add_argument('kind', choices=KINDS + ('all',))
+    parser.add_argument('pages', type=int, nargs='+', help="numero di pagine (uno o più)")
+    parser.add_argument('-o', '--output', default='corpus', help="cartella del corpus")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    kinds = KINDS if args.kind == 'all' else (args.kind,)
+    for kind in kinds:
+        for num_pages in args.pages:
+            path = ensure_corpus(args.output, kind, num_pages, args.seed)
+            print(f"{path}: {os.path.getsize(path) / 1024:.0f} KB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
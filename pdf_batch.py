@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF Editor - Elaborazione batch senza interfaccia grafica
+Avvia batch_cli (vedi src/batch_cli.py per operazioni ed esempi)
+"""
+
+import multiprocessing
+import sys
+from pathlib import Path
+
+# Aggiungi il percorso src
+current_dir = Path(__file__).parent
+src_dir = current_dir / "src"
+if src_dir.exists():
+    sys.path.insert(0, str(src_dir))
+
+from batch_cli import main
+
+if __name__ == "__main__":
+    # Eseguibile PyInstaller: i processi del pool non devono rieseguire il programma
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -9,6 +9,7 @@ from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                                QPushButton, QLabel, QMessageBox, QFileDialog, QDialog)
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QFont
+import multiprocessing
 import sys
 import os
 from pathlib import Path
@@ -27,6 +28,7 @@ try:
     from pdf_security import SecurityGUI
     from user_config import user_config
     from theme_manager import theme_manager
+    from instrumentation import configure_logging
     
     ADVANCED_FEATURES = True
 except ImportError as e:
@@ -191,6 +193,7 @@ class FeatureSelectionDialog(QDialog):
         self.accept()
         
         if ADVANCED_FEATURES:
+            configure_logging()
             window = AcrobatLikeGUI()
             window.show()
             # Keep window reference alive
@@ -296,4 +299,6 @@ def main():
     return 0
 
 if __name__ == "__main__":
+    # Eseguibile PyInstaller: i processi del pool dei render non devono riaprire l'interfaccia
+    multiprocessing.freeze_support()
     sys.exit(main())
@@ -3,17 +3,143 @@ from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                                QListWidget, QSpinBox, QRadioButton, QButtonGroup,
                                QGroupBox, QScrollArea, QColorDialog, QInputDialog,
                                QMenuBar, QMenu, QToolBar, QSplitter, QDialog, QTextEdit,
-                               QComboBox, QGridLayout)
-from PySide6.QtCore import Qt, QPoint, QRect as QtRect, Signal
+                               QComboBox, QGridLayout, QListView)
+from PySide6.QtCore import Qt, QPoint, QRect as QtRect, QSize, Signal, QTimer
 from PySide6.QtGui import QPixmap, QImage, QPainter, QPen, QColor, QFont, QAction
 from PIL import Image
+import functools
 import io
 import os
-from advanced_pdf_editor import AdvancedPDFEditor
+import time
+from advanced_pdf_editor import AdvancedPDFEditor, TILE_SIZE
+from page_renderer import PageRenderer
+from thumbnail_model import THUMBNAIL_WIDTH, ThumbnailModel
 from theme_manager import theme_manager
 from user_config import user_config
+from instrumentation import metrics
 import fitz
 
+
+def pixmap_to_qimage(pix):
+    """QImage costruito direttamente sui pixel di un fitz.Pixmap, senza codifiche
+
+    Il QImage non copia i dati: il pixmap deve restare vivo finché il
+    QImage è in uso (QPixmap.fromImage ne fa una copia). Restituisce None
+    per i formati che Qt non può leggere così come sono (es. CMYK).
+    """
+    if pix.n == 3 and not pix.alpha:
+        image_format = QImage.Format_RGB888
+    elif pix.n == 4 and pix.alpha:
+        image_format = QImage.Format_RGBA8888
+    elif pix.n == 1 and not pix.alpha:
+        image_format = QImage.Format_Grayscale8
+    else:
+        return None
+    return QImage(pix.samples_mv, pix.width, pix.height, pix.stride, image_format)
+
+
+def pil_to_qimage(image):
+    """Converte un'immagine PIL in QImage passando da PNG (percorso di riserva)"""
+    img_byte_arr = io.BytesIO()
+    image.save(img_byte_arr, format='PNG')
+    qimage = QImage()
+    qimage.loadFromData(img_byte_arr.getvalue())
+    return qimage
+
+
+# Riquadri renderizzati in anticipo attorno a quelli visibili
+TILE_MARGIN = 1
+
+# Dimensione massima di un widget Qt (QWIDGETSIZE_MAX)
+WIDGET_SIZE_MAX = 16777215
+
+
+class PageCanvas(QLabel):
+    """Area della pagina: un render intero o, agli zoom elevati, solo i riquadri visibili
+
+    I riquadri non vengono renderizzati durante il disegno: quelli non
+    ancora pronti sono mostrati come segnaposto e richiesti (con quelli
+    del margine attorno) a PageRenderer; tile_ready li ridisegna all'arrivo.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tile_source = None  # funzione (colonna, riga) -> fitz.Pixmap in cache, o None
+        self.tile_request = None  # funzione (visibili, margine) che richiede i riquadri
+        self.tile_size = TILE_SIZE
+        self._request_timer = QTimer(self)
+        self._request_timer.setSingleShot(True)
+        self._request_timer.timeout.connect(self._request_tiles)
+
+    def show_pixmap(self, pixmap):
+        """Mostra il render dell'intera pagina"""
+        self.tile_source = self.tile_request = None
+        self.setMinimumSize(0, 0)
+        self.setMaximumSize(WIDGET_SIZE_MAX, WIDGET_SIZE_MAX)
+        self.setPixmap(pixmap)
+
+    def show_tiles(self, width, height, tile_source, tile_request, tile_size=TILE_SIZE):
+        """Mostra una pagina di width x height pixel disegnando solo i riquadri visibili"""
+        self.clear()
+        self.tile_source = tile_source
+        self.tile_request = tile_request
+        self.tile_size = tile_size
+        self.setFixedSize(width, height)
+        self.update()
+
+    def tile_ready(self, column, row):
+        """Riquadro arrivato in cache: ridisegna solo la sua zona"""
+        if self.tile_source is not None:
+            size = self.tile_size
+            self.update(QtRect(column * size, row * size, size, size))
+
+    def _tile_range(self, rect, margin=0):
+        """Colonne e righe dei riquadri che coprono rect, più margin riquadri per lato"""
+        size = self.tile_size
+        last_column = (self.width() - 1) // size
+        last_row = (self.height() - 1) // size
+        columns = range(max(0, rect.left() // size - margin),
+                        min(last_column, rect.right() // size + margin) + 1)
+        rows = range(max(0, rect.top() // size - margin),
+                     min(last_row, rect.bottom() // size + margin) + 1)
+        return columns, rows
+
+    def paintEvent(self, event):
+        if self.tile_source is None:
+            super().paintEvent(event)
+            return
+        # Con lo scorrimento Qt ridisegna solo la parte visibile
+        painter = QPainter(self)
+        size = self.tile_size
+        columns, rows = self._tile_range(event.rect())
+        for row in rows:
+            for column in columns:
+                pix = self.tile_source(column, row)
+                image = pixmap_to_qimage(pix) if pix is not None else None
+                if image is not None:
+                    painter.drawImage(column * size, row * size, image)
+                else:
+                    # Segnaposto finché il riquadro non arriva da PageRenderer
+                    painter.fillRect(column * size, row * size, size, size, QColor(225, 225, 225))
+        painter.end()
+        # Dopo il disegno: richieste aggiornate alla zona ora visibile
+        self._request_timer.start(0)
+
+    def _request_tiles(self):
+        """Richiede a PageRenderer i riquadri visibili e, dopo, quelli attorno"""
+        if self.tile_request is None:
+            return
+        visible_rect = self.visibleRegion().boundingRect()
+        if visible_rect.isEmpty():
+            return
+        columns, rows = self._tile_range(visible_rect)
+        visible = [(column, row) for row in rows for column in columns]
+        columns, rows = self._tile_range(visible_rect, TILE_MARGIN)
+        margin = [(column, row) for row in rows for column in columns
+                  if (column, row) not in visible]
+        self.tile_request(visible, margin)
+
+
 class AcrobatLikeGUI(QMainWindow):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -31,6 +157,14 @@ class AcrobatLikeGUI(QMainWindow):
         
         # Editor PDF avanzato
         self.pdf_editor = AdvancedPDFEditor()
+        # Render in background: navigazione e zoom non bloccano l'interfaccia
+        self.renderer = PageRenderer(self.pdf_editor, parent=self)
+        self.renderer.page_ready.connect(self.on_page_rendered)
+        self.renderer.preview_ready.connect(self.on_preview_rendered)
+        self.renderer.tile_ready.connect(self.on_tile_rendered)
+        self.renderer.page_failed.connect(self.on_page_render_failed)
+        # (pagina, zoom, inizio) della visualizzazione in attesa del render definitivo
+        self._pending_display = None
         
         # Variabili di stato
         self.current_tool = "select"
@@ -309,7 +443,19 @@ class AcrobatLikeGUI(QMainWindow):
         thumb_group = QGroupBox("Miniature")
         thumb_layout = QVBoxLayout(thumb_group)
         
-        self.thumb_listbox = QListWidget()
+        # Vista virtualizzata: le miniature vengono create solo per le pagine visibili
+        self.thumbnail_model = ThumbnailModel(self.pdf_editor, self.renderer, cache=True,
+                                              parent=self)
+        self.thumb_listbox = QListView()
+        self.thumb_listbox.setModel(self.thumbnail_model)
+        self.thumb_listbox.setViewMode(QListView.IconMode)
+        self.thumb_listbox.setFlow(QListView.TopToBottom)
+        self.thumb_listbox.setWrapping(False)
+        self.thumb_listbox.setMovement(QListView.Static)
+        self.thumb_listbox.setUniformItemSizes(True)
+        self.thumb_listbox.setIconSize(QSize(THUMBNAIL_WIDTH, round(THUMBNAIL_WIDTH * 1.414)))
+        self.thumb_listbox.clicked.connect(self.on_thumbnail_clicked)
+        self.thumb_listbox.verticalScrollBar().valueChanged.connect(self.on_thumbnails_scrolled)
         thumb_layout.addWidget(self.thumb_listbox)
         
         layout.addWidget(thumb_group, 1)  # Stretch factor 1
@@ -376,7 +522,7 @@ class AcrobatLikeGUI(QMainWindow):
         scroll_area.setWidgetResizable(True)
         scroll_area.setStyleSheet(theme_manager.get_panel_style("center"))
         
-        self.canvas_label = QLabel()
+        self.canvas_label = PageCanvas()
         self.canvas_label.setAlignment(Qt.AlignCenter)
         self.canvas_label.setStyleSheet(theme_manager.get_panel_style("center"))
         
@@ -445,6 +591,31 @@ class AcrobatLikeGUI(QMainWindow):
         self.doc_info_label = QLabel("")
         status_bar.addPermanentWidget(self.doc_info_label)
         
+        # Ultima operazione misurata (vedi instrumentation), aggiornata periodicamente
+        self.metrics_label = QLabel("")
+        status_bar.addPermanentWidget(self.metrics_label)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(self.update_metrics_label)
+        self.metrics_timer.start(1000)
+        
+    def update_metrics_label(self):
+        """Mostra durata e memoria dell'ultima operazione dei motori"""
+        last = metrics.last
+        if not last:
+            return
+        operation = last['operation'].split('.', 1)[-1]
+        text = f"{operation}: {last['seconds'] * 1000:.0f} ms"
+        if last.get('peak_rss_mb'):
+            text += f" · {last['peak_rss_mb']:.0f} MB"
+        if last['status'] != 'ok':
+            text += " · errore"
+        self.metrics_label.setText(text)
+        render = self.pdf_editor.render_cache.info()
+        self.metrics_label.setToolTip(f"{metrics.counter('calls')} operazioni, "
+                                      f"{metrics.counter('errors')} errori\n"
+                                      f"Cache render: {render['hit_rate']:.0%} hit, "
+                                      f"{render['size'] / 1024 / 1024:.0f} MB")
+        
     def open_pdf(self):
         """Apre un file PDF"""
         file_path, _ = QFileDialog.getOpenFileName(
@@ -456,7 +627,7 @@ class AcrobatLikeGUI(QMainWindow):
         
         if file_path:
             if self.pdf_editor.open_pdf(file_path):
-                self.update_display()
+                self.update_display(background=True)
                 self.update_thumbnails()
                 self.status_label.setText(f"PDF aperto: {os.path.basename(file_path)}")
                 
@@ -510,43 +681,141 @@ class AcrobatLikeGUI(QMainWindow):
             self.color_button.setStyleSheet(f"background-color: {color.name()};")
 
     
-    def update_display(self):
-        """Aggiorna la visualizzazione della pagina corrente"""
+    def update_display(self, background=False):
+        """Aggiorna la visualizzazione della pagina corrente
+
+        Con background=True, se la pagina non è già renderizzata, il render
+        avviene nel pool di PageRenderer e la pagina viene mostrata
+        all'arrivo (on_page_rendered); intanto resta la precedente o, con
+        l'impostazione "progressive_render", viene mostrata l'anteprima
+        veloce renderizzata nel pool prima della pagina (on_preview_rendered).
+        I tempi al primo pixel e alla qualità piena finiscono nelle metriche
+        seconds.display.first_pixel e seconds.display.full_quality.
+        """
         if not self.pdf_editor.current_doc:
             return
             
-        image = self.pdf_editor.get_page_image()
-        if image:
-            # Converti PIL Image a QPixmap
-            img_byte_arr = io.BytesIO()
-            image.save(img_byte_arr, format='PNG')
-            img_byte_arr = img_byte_arr.getvalue()
+        page_num, zoom = self.pdf_editor.page_num, self.pdf_editor.zoom_level
+        if self.pdf_editor.needs_tiles(page_num, zoom):
+            # Zoom elevato: solo i riquadri visibili, renderizzati nel pool di PageRenderer
+            width, height = self.pdf_editor.page_pixel_size(page_num, zoom)
+            self.canvas_label.show_tiles(
+                width, height,
+                functools.partial(self.pdf_editor.get_page_tile, page_num, zoom, render=False),
+                functools.partial(self.renderer.request_tiles, page_num, zoom))
+            self.canvas_pixmap = None
+            self.zoom_label.setText(f"{int(zoom * 100)}%")
+            self.status_label.setText("Pronto")
+            return
+        start_time = time.perf_counter()
+        self._pending_display = None
+        preview = user_config.get("progressive_render", True)
+        if background and not self.renderer.request(page_num, zoom, preview=preview):
+            self.status_label.setText(f"Rendering pagina {page_num + 1}...")
+            self._pending_display = (page_num, round(zoom, 4), start_time)
+            return
             
-            qimage = QImage()
-            qimage.loadFromData(img_byte_arr)
+        # Pixel del render passati direttamente a Qt; PIL solo se non è possibile
+        pix = self.pdf_editor.get_page_pixmap()
+        qimage = pixmap_to_qimage(pix) if pix is not None else None
+        if qimage is None:
+            image = self.pdf_editor.get_page_image()
+            qimage = pil_to_qimage(image) if image else None
+        if qimage is not None:
             self.canvas_pixmap = QPixmap.fromImage(qimage)
             
             # Mostra l'immagine
-            self.canvas_label.setPixmap(self.canvas_pixmap)
+            self.canvas_label.show_pixmap(self.canvas_pixmap)
             
             # Aggiorna label zoom
             zoom_percent = int(self.pdf_editor.zoom_level * 100)
             self.zoom_label.setText(f"{zoom_percent}%")
+        if background:
+            # Render già pronto: primo pixel e qualità piena coincidono
+            elapsed = time.perf_counter() - start_time
+            metrics.observe("seconds.display.first_pixel", elapsed)
+            metrics.observe("seconds.display.full_quality", elapsed)
+        else:
+            # Pagina appena renderizzata qui: prepara in background le vicine
+            self.renderer.request(page_num, zoom)
+            self.thumbnail_model.refresh()
+    
+    def show_preview(self, page_num, zoom):
+        """Mostra l'anteprima veloce della pagina, ingrandita alla dimensione finale"""
+        pix = self.pdf_editor.get_page_preview(page_num, zoom)
+        qimage = pixmap_to_qimage(pix) if pix is not None else None
+        if qimage is None:
+            return
+        width, height = self.pdf_editor.page_pixel_size(page_num, zoom)
+        self.canvas_pixmap = QPixmap.fromImage(qimage.scaled(width, height))
+        self.canvas_label.show_pixmap(self.canvas_pixmap)
+        self.zoom_label.setText(f"{int(zoom * 100)}%")
+    
+    def on_preview_rendered(self, page_num, zoom):
+        """Anteprima arrivata dal pool: mostrala se la pagina è ancora in attesa"""
+        pending = self._pending_display
+        if (pending and pending[:2] == (page_num, round(zoom, 4))
+                and page_num == self.pdf_editor.page_num
+                and round(zoom, 4) == round(self.pdf_editor.zoom_level, 4)):
+            self.show_preview(page_num, zoom)
+            metrics.observe("seconds.display.first_pixel", time.perf_counter() - pending[2])
+    
+    def on_page_rendered(self, page_num, zoom):
+        """Render arrivato dal pool: mostralo se è la pagina visualizzata"""
+        if (page_num == self.pdf_editor.page_num
+                and round(zoom, 4) == round(self.pdf_editor.zoom_level, 4)):
+            pending, self._pending_display = self._pending_display, None
+            self.update_display()
+            self.status_label.setText("Pronto")
+            if pending and pending[:2] == (page_num, round(zoom, 4)):
+                metrics.observe("seconds.display.full_quality", time.perf_counter() - pending[2])
+    
+    def on_tile_rendered(self, page_num, zoom, column, row):
+        """Riquadro arrivato dal pool: ridisegnalo se è della pagina visualizzata"""
+        if (page_num == self.pdf_editor.page_num
+                and round(zoom, 4) == round(self.pdf_editor.zoom_level, 4)):
+            self.canvas_label.tile_ready(column, row)
+    
+    def on_page_render_failed(self, page_num, zoom, error):
+        """Render non riuscito nel pool: riprova in questo processo"""
+        if page_num == self.pdf_editor.page_num:
+            print(f"Errore nel render in background: {error}")
+            self.update_display()
+    
+    def closeEvent(self, event):
+        """Chiude il pool dei render prima di uscire"""
+        self.renderer.shutdown()
+        super().closeEvent(event)
     
     def update_thumbnails(self):
         """Aggiorna la lista delle miniature"""
-        self.thumb_listbox.clear()
-        
-        if self.pdf_editor.current_doc:
-            page_count = self.pdf_editor.get_page_count()
-            for i in range(page_count):
-                self.thumb_listbox.addItem(f"Pagina {i+1}")
+        self.thumbnail_model.reload()
+    
+    def on_thumbnails_scrolled(self):
+        """Annulla le miniature in coda delle pagine uscite dalla vista"""
+        viewport = self.thumb_listbox.viewport()
+        first = self.thumb_listbox.indexAt(QPoint(5, 5)).row()
+        last = self.thumb_listbox.indexAt(QPoint(5, viewport.height() - 5)).row()
+        if first < 0:
+            return
+        if last < 0:
+            last = self.thumbnail_model.rowCount() - 1
+        self.thumbnail_model.set_visible_rows(first, last)
+    
+    def on_thumbnail_clicked(self, index):
+        """Vai alla pagina della miniatura selezionata"""
+        if not self.pdf_editor.current_doc:
+            return
+        self.pdf_editor.page_num = index.row()
+        self.update_display(background=True)
+        page_count = self.pdf_editor.get_page_count()
+        self.page_label.setText(f"{self.pdf_editor.page_num + 1} / {page_count}")
     
     def prev_page(self):
         """Vai alla pagina precedente"""
         if self.pdf_editor.current_doc and self.pdf_editor.page_num > 0:
             self.pdf_editor.page_num -= 1
-            self.update_display()
+            self.update_display(background=True)
             page_count = self.pdf_editor.get_page_count()
             self.page_label.setText(f"{self.pdf_editor.page_num + 1} / {page_count}")
     
@@ -555,19 +824,19 @@ class AcrobatLikeGUI(QMainWindow):
         if (self.pdf_editor.current_doc and 
             self.pdf_editor.page_num < self.pdf_editor.get_page_count() - 1):
             self.pdf_editor.page_num += 1
-            self.update_display()
+            self.update_display(background=True)
             page_count = self.pdf_editor.get_page_count()
             self.page_label.setText(f"{self.pdf_editor.page_num + 1} / {page_count}")
     
     def zoom_in(self):
         """Aumenta lo zoom"""
         self.pdf_editor.zoom_level = min(3.0, self.pdf_editor.zoom_level * 1.2)
-        self.update_display()
+        self.update_display(background=True)
     
     def zoom_out(self):
         """Diminuisce lo zoom"""
         self.pdf_editor.zoom_level = max(0.2, self.pdf_editor.zoom_level / 1.2)
-        self.update_display()
+        self.update_display(background=True)
     
     def fit_to_window(self):
         """Adatta il PDF alla finestra"""
@@ -587,7 +856,7 @@ class AcrobatLikeGUI(QMainWindow):
             zoom_y = canvas_height / page_rect.height
             
             self.pdf_editor.zoom_level = min(zoom_x, zoom_y) * 0.9  # 90% per margini
-            self.update_display()
+            self.update_display(background=True)
     
     def on_canvas_click(self, event):
         """Gestisce click sul canvas"""
@@ -5,29 +5,145 @@ import os
 import json
 from pathlib import Path
 import base64
+import functools
+import inspect
+import itertools
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from page_selector import PageSelection, PageSelector
+from result_cache import ResultCache
+from instrumentation import instrumented
+from render_cache import RenderCache
+from user_config import user_config
 
+# Identificativi dei documenti aperti, per distinguerli in una RenderCache condivisa
+_document_ids = itertools.count(1)
+
+# Render a riquadri (get_page_tile): lato dei riquadri in pixel e
+# dimensione della pagina renderizzata oltre la quale conviene usarli
+TILE_SIZE = 512
+TILED_RENDER_MIN_PIXELS = 12_000_000
+
+
+def tile_clip(zoom, column, row, tile_size=TILE_SIZE):
+    """Zona della pagina (in punti) coperta dal riquadro (column, row) a questo zoom"""
+    return fitz.Rect(column * tile_size, row * tile_size,
+                     (column + 1) * tile_size, (row + 1) * tile_size) / zoom
+
+
+def render_preview(page, zoom, scale, grayscale, antialias):
+    """Render veloce a bassa risoluzione di una pagina (vedi get_page_preview)"""
+    # Il livello di antialiasing di MuPDF è globale: va ripristinato
+    previous = fitz.TOOLS.show_aa_level()['graphics']
+    fitz.TOOLS.set_aa_level(antialias)
+    try:
+        return page.get_pixmap(matrix=fitz.Matrix(zoom * scale, zoom * scale),
+                               colorspace=fitz.csGRAY if grayscale else fitz.csRGB)
+    finally:
+        fitz.TOOLS.set_aa_level(previous)
+
+
+def modifies_pages(argument='page_num'):
+    """Decoratore dei metodi che modificano le pagine del documento aperto
+
+    Dopo la chiamata i render in memoria delle pagine indicate
+    dall'argomento (tutto il documento con argument=None) non vengono più
+    usati. Vale anche per le classi che lavorano sul documento di un
+    editor tramite l'attributo pdf_editor (form, sicurezza).
+    """
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            pages = None
+            if argument is not None:
+                pages = signature.bind(self, *args, **kwargs).arguments.get(argument)
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                # Anche se il metodo fallisce la pagina può essere già cambiata
+                editor = getattr(self, 'pdf_editor', self)
+                try:
+                    editor.invalidate_render(pages)
+                except TypeError:
+                    editor.invalidate_render()  # Selezione non valida: tutto il documento
+        return wrapper
+    return decorator
+
+
+@instrumented('AdvancedPDFEditor', whole_document=('search_text',),
+              exclude=('get_page_count',))
 class AdvancedPDFEditor:
-    def __init__(self):
+    def __init__(self, cache=None, render_cache=None):
+        """
+        Args:
+            cache: ResultCache per i render delle pagine (vedi
+                get_page_image); True = cache nella cartella predefinita
+            render_cache: RenderCache in memoria, anche condivisa tra più
+                editor (default: una nuova, con il limite "render_cache_mb"
+                della configurazione utente)
+        """
         self.current_doc = None
         self.current_page = None
         self.page_num = 0
         self.zoom_level = 1.0
         self.annotations = []
         self.current_tool = "select"
+        self.encryption = None
+        self.cache = ResultCache.coerce(cache)
+        self._source_digest = None
+        if render_cache is None:
+            render_cache = RenderCache(int(user_config.get("render_cache_mb", 128)) * 1024 * 1024)
+        self.render_cache = render_cache
+        self._document_id = None
+        self._doc_revision = 0
+        self._page_revisions = {}
+        # Cambia a ogni apertura e a ogni modifica: identifica il contenuto in memoria
+        self.revision = 0
+        self._pdf_path = None
+        self._opened_path = None  # File aperto, anche dopo le modifiche (vedi page_source)
+        self._display_list = None  # (pagina e revisione, fitz.DisplayList)
         
     def open_pdf(self, pdf_path):
         """Apre un PDF per l'editing avanzato"""
         try:
             self.current_doc = fitz.open(pdf_path)
+            self.encryption = None
             self.page_num = 0
+            self._forget_renders()
+            self._document_id = next(_document_ids)
+            self.revision += 1
+            self._pdf_path = pdf_path
+            self._opened_path = pdf_path
+            # Chiave dei render in cache: vale finché il documento non viene modificato
+            self._source_digest = self.cache.file_digest(pdf_path) if self.cache else None
             return True
         except Exception as e:
             print(f"Errore nell'apertura del PDF: {e}")
             return False
     
+    def _page_indices(self, page_num):
+        """Indici (da 0) delle pagine indicate da un intero o da una selezione
+
+        Un intero è l'indice della pagina (da 0, come nel resto della
+        classe); stringhe ed espressioni PageSelector usano i numeri di
+        pagina da 1. Liste, tuple e range di interi non sono accettati:
+        PDFManager (PageSelector.coerce) li legge come numeri di pagina da
+        1, qui sarebbero confusi con gli indici. Per più pagine usare una
+        stringa ("1,3") o un PageSelector.
+
+        Raises:
+            TypeError: selezione di un tipo non accettato
+        """
+        if isinstance(page_num, int):
+            return [page_num]
+        if not isinstance(page_num, (str, PageSelector, PageSelection)):
+            raise TypeError(f"Selezione di pagine non accettata: {page_num!r}; usare un indice "
+                            f"(da 0), una stringa come \"1,3\" o un PageSelector (pagine da 1)")
+        return PageSelector.coerce(page_num).bind(len(self.current_doc)).indices()
+    
     def get_page_count(self):
         """Restituisce il numero di pagine del PDF"""
         if self.current_doc:
@@ -35,7 +151,17 @@ class AdvancedPDFEditor:
         return 0
     
     def get_page_image(self, page_num=None, zoom=None):
-        """Restituisce l'immagine della pagina corrente"""
+        """Restituisce l'immagine della pagina corrente
+
+        I render restano in memoria (render_cache) finché la pagina non
+        viene modificata; viene restituita una copia, che il chiamante può
+        modificare (es. disegnandoci sopra) senza alterare la cache.
+
+        Con una cache su disco attiva i render del documento così come è
+        stato aperto vengono riusati anche tra sessioni diverse; dopo la
+        prima modifica la cache su disco non viene più usata per questo
+        documento.
+        """
         if not self.current_doc:
             return None
             
@@ -45,15 +171,217 @@ class AdvancedPDFEditor:
             zoom = self.zoom_level
             
         try:
-            page = self.current_doc[page_num]
-            mat = fitz.Matrix(zoom, zoom)
-            pix = page.get_pixmap(matrix=mat)
-            img_data = pix.tobytes("ppm")
-            return Image.open(io.BytesIO(img_data))
+            render_key = self.render_key('image', page_num, zoom)
+            image = self.render_cache.get(render_key)
+            if image is not None:
+                return image.copy()
+            cache_key = self._render_cache_key(page_num, zoom)
+            img_data = self.cache.get_bytes(cache_key) if cache_key else None
+            if img_data is not None:
+                image = Image.open(io.BytesIO(img_data))
+                image.load()
+            else:
+                page = self.current_doc[page_num]
+                mat = fitz.Matrix(zoom, zoom)
+                pix = page.get_pixmap(matrix=mat)
+                if cache_key:
+                    self.cache.put_bytes(cache_key, 'get_page_image', pix.tobytes("ppm"),
+                                         "page.ppm")
+                # Pixel copiati direttamente, senza codifica e decodifica PPM
+                image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+            self.render_cache.put(render_key, image)
+            return image.copy()
+        except Exception as e:
+            print(f"Errore nel caricamento della pagina: {e}")
+            return None
+    
+    def get_page_pixmap(self, page_num=None, zoom=None):
+        """Restituisce il render della pagina come fitz.Pixmap RGB
+
+        Come get_page_image ma senza conversione in PIL: i pixel
+        (pixmap.samples_mv) possono essere passati direttamente a Qt.
+        Il pixmap è condiviso con la cache in memoria e non va modificato;
+        la cache su disco non viene usata.
+        """
+        if not self.current_doc:
+            return None
+            
+        if page_num is None:
+            page_num = self.page_num
+        if zoom is None:
+            zoom = self.zoom_level
+            
+        try:
+            render_key = self.render_key('pixmap', page_num, zoom)
+            pix = self.render_cache.get(render_key)
+            if pix is None:
+                pix = self.current_doc[page_num].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+                self.render_cache.put(render_key, pix)
+            return pix
         except Exception as e:
             print(f"Errore nel caricamento della pagina: {e}")
             return None
     
+    def get_page_preview(self, page_num=None, zoom=None, scale=None, grayscale=None,
+                         antialias=None):
+        """Render veloce a bassa risoluzione, da mostrare in attesa di quello definitivo
+
+        Il pixmap è renderizzato a zoom * scale, con antialiasing ridotto e
+        facoltativamente in scala di grigi: va ingrandito per essere mostrato.
+        I valori non indicati vengono dalla configurazione utente
+        (preview_scale, preview_grayscale, preview_antialias).
+        """
+        if not self.current_doc:
+            return None
+            
+        if page_num is None:
+            page_num = self.page_num
+        if zoom is None:
+            zoom = self.zoom_level
+        options = self.preview_options(scale, grayscale, antialias)
+            
+        try:
+            render_key = self.render_key(('preview',) + options, page_num, zoom)
+            pix = self.render_cache.get(render_key)
+            if pix is None:
+                pix = render_preview(self.current_doc[page_num], zoom, *options)
+                self.render_cache.put(render_key, pix)
+            return pix
+        except Exception as e:
+            print(f"Errore nell'anteprima della pagina: {e}")
+            return None
+    
+    def preview_options(self, scale=None, grayscale=None, antialias=None):
+        """(scala, grigi, antialiasing) dell'anteprima; i valori non indicati dalla configurazione"""
+        if scale is None:
+            scale = float(user_config.get("preview_scale", 0.25))
+        if grayscale is None:
+            grayscale = bool(user_config.get("preview_grayscale", False))
+        if antialias is None:
+            antialias = int(user_config.get("preview_antialias", 0))
+        return scale, grayscale, antialias
+    
+    def get_page_tile(self, page_num, zoom, column, row, tile_size=TILE_SIZE, render=True):
+        """Render di un riquadro della pagina come fitz.Pixmap
+
+        Il riquadro (column, row) copre i pixel da column * tile_size a
+        (column + 1) * tile_size della pagina renderizzata a questo zoom
+        (più piccolo sul bordo destro e inferiore). Serve agli zoom elevati,
+        dove il render dell'intera pagina occuperebbe troppa memoria: si
+        renderizzano solo i riquadri visibili, tenuti in render_cache.
+        Con render=False il riquadro viene solo cercato in cache (None se
+        non è pronto, es. ancora in render in PageRenderer).
+        """
+        if not self.current_doc:
+            return None
+            
+        try:
+            render_key = self.render_key(('tile', column, row, tile_size), page_num, zoom)
+            pix = self.render_cache.get(render_key)
+            if pix is None and render:
+                zoom = render_key[2]  # Zoom arrotondato come nella chiave
+                pix = self._page_display_list(page_num).get_pixmap(
+                    matrix=fitz.Matrix(zoom, zoom), clip=tile_clip(zoom, column, row, tile_size))
+                self.render_cache.put(render_key, pix)
+            return pix
+        except Exception as e:
+            print(f"Errore nel render del riquadro: {e}")
+            return None
+    
+    def _page_display_list(self, page_num):
+        """DisplayList della pagina: il contenuto viene interpretato una sola
+        volta per tutti i riquadri, non a ogni riquadro"""
+        key = self.render_key('display_list', page_num, 0)
+        if self._display_list is None or self._display_list[0] != key:
+            self._display_list = (key, self.current_doc[page_num].get_displaylist())
+        return self._display_list[1]
+    
+    def page_pixel_size(self, page_num=None, zoom=None):
+        """(larghezza, altezza) in pixel della pagina renderizzata allo zoom"""
+        if page_num is None:
+            page_num = self.page_num
+        if zoom is None:
+            zoom = self.zoom_level
+        zoom = round(float(zoom), 4)  # Come nei riquadri (vedi render_key)
+        rect = self.current_doc[page_num].rect * fitz.Matrix(zoom, zoom)
+        return rect.irect.width, rect.irect.height
+    
+    def needs_tiles(self, page_num=None, zoom=None):
+        """True se a questo zoom la pagina va renderizzata a riquadri"""
+        width, height = self.page_pixel_size(page_num, zoom)
+        return width * height > TILED_RENDER_MIN_PIXELS
+    
+    def render_key(self, kind, page_num, zoom):
+        """Chiave di un render ("image", "pixmap", anteprima o riquadro) nella cache in memoria
+
+        Documento e pagina restano ai primi due posti (vedi invalidate_render).
+        """
+        return (self._document_id, page_num, round(float(zoom), 4), self._doc_revision,
+                self._page_revisions.get(page_num, 0), kind)
+    
+    def invalidate_render(self, page_num=None):
+        """Scarta i render in memoria delle pagine indicate (None = tutte)
+
+        I metodi dell'editor lo fanno da soli; va chiamato dopo aver
+        modificato current_doc direttamente.
+        """
+        if not self.current_doc:
+            return
+        self.revision += 1
+        self._pdf_path = None
+        document_id = self._document_id
+        if page_num is None:
+            self._doc_revision += 1
+            self.render_cache.discard(lambda key: key[0] == document_id)
+            return
+        indices = set(self._page_indices(page_num))
+        for index in indices:
+            self._page_revisions[index] = self._page_revisions.get(index, 0) + 1
+        self.render_cache.discard(lambda key: key[0] == document_id and key[1] in indices)
+    
+    def is_page_modified(self, page_num):
+        """True se la pagina (indice da 0) è cambiata dall'apertura del documento"""
+        return self._doc_revision > 0 or self._page_revisions.get(page_num, 0) > 0
+    
+    def source_path(self):
+        """Percorso del file aperto, o None se il documento in memoria è cambiato"""
+        if not self.current_doc or self.current_doc.is_dirty:
+            return None
+        return self._pdf_path
+    
+    def page_source(self, page_num):
+        """(documento, percorso) del file da cui renderizzare la pagina così com'è in memoria
+
+        Anche con il documento modificato le pagine non toccate si possono
+        leggere dal file aperto; None se la pagina (indice da 0) è cambiata
+        e va renderizzata dal documento in memoria.
+        """
+        if not self.current_doc or self._opened_path is None or self.is_page_modified(page_num):
+            return None
+        return self._document_id, self._opened_path
+    
+    def _forget_renders(self):
+        """Libera i render in memoria del documento aperto"""
+        if self._document_id is not None:
+            document_id = self._document_id
+            self.render_cache.discard(lambda key: key[0] == document_id)
+        self._document_id = None
+        self._doc_revision = 0
+        self._page_revisions = {}
+        self._display_list = None
+    
+    def _render_cache_key(self, page_num, zoom):
+        """Chiave del render in cache, o None se la cache non è utilizzabile"""
+        if self.cache is None or self._source_digest is None:
+            return None
+        if self.current_doc.is_dirty:
+            # Il documento in memoria non corrisponde più al file di partenza
+            self._source_digest = None
+            return None
+        return self.cache.key('get_page_image', [self._source_digest],
+                              {'page': page_num, 'zoom': round(float(zoom), 4)})
+    
+    @modifies_pages()
     def add_text(self, page_num, x, y, text, font_size=12, color=(0, 0, 0), font_name="helv", width=200, height=None):
         """Aggiunge testo modificabile alla pagina usando FreeText annotation"""
         if not self.current_doc:
@@ -84,6 +412,7 @@ class AdvancedPDFEditor:
             print(f"Errore nell'aggiunta del testo: {e}")
             return False
     
+    @modifies_pages()
     def add_highlight(self, page_num, rect, color=(1, 1, 0)):
         """Aggiunge evidenziazione"""
         if not self.current_doc:
@@ -99,6 +428,7 @@ class AdvancedPDFEditor:
             print(f"Errore nell'evidenziazione: {e}")
             return False
     
+    @modifies_pages()
     def add_note(self, page_num, x, y, content, icon="Note"):
         """Aggiunge una nota adesiva"""
         if not self.current_doc:
@@ -114,6 +444,7 @@ class AdvancedPDFEditor:
             print(f"Errore nell'aggiunta della nota: {e}")
             return False
     
+    @modifies_pages()
     def add_rectangle(self, page_num, rect, color=(0, 0, 1), fill_color=None, width=1):
         """Aggiunge un rettangolo"""
         if not self.current_doc:
@@ -130,6 +461,7 @@ class AdvancedPDFEditor:
             print(f"Errore nell'aggiunta del rettangolo: {e}")
             return False
     
+    @modifies_pages()
     def add_circle(self, page_num, rect, color=(0, 0, 1), fill_color=None, width=1):
         """Aggiunge un cerchio"""
         if not self.current_doc:
@@ -146,6 +478,7 @@ class AdvancedPDFEditor:
             print(f"Errore nell'aggiunta del cerchio: {e}")
             return False
     
+    @modifies_pages()
     def add_line(self, page_num, start_point, end_point, color=(0, 0, 1), width=1):
         """Aggiunge una linea"""
         if not self.current_doc:
@@ -162,6 +495,7 @@ class AdvancedPDFEditor:
             print(f"Errore nell'aggiunta della linea: {e}")
             return False
     
+    @modifies_pages()
     def add_arrow(self, page_num, start_point, end_point, color=(0, 0, 1), width=1):
         """Aggiunge una freccia"""
         if not self.current_doc:
@@ -180,6 +514,7 @@ class AdvancedPDFEditor:
             print(f"Errore nell'aggiunta della freccia: {e}")
             return False
     
+    @modifies_pages()
     def add_freehand_drawing(self, page_num, points, color=(0, 0, 1), width=2):
         """Aggiunge disegno a mano libera"""
         if not self.current_doc:
@@ -196,19 +531,21 @@ class AdvancedPDFEditor:
             print(f"Errore nel disegno a mano libera: {e}")
             return False
     
+    @modifies_pages()
     def add_image(self, page_num, rect, image_path):
-        """Inserisce un'immagine nella pagina"""
+        """Inserisce un'immagine nella pagina (o in ogni pagina della selezione)"""
         if not self.current_doc:
             return False
             
         try:
-            page = self.current_doc[page_num]
-            page.insert_image(rect, filename=image_path)
+            for index in self._page_indices(page_num):
+                self.current_doc[index].insert_image(rect, filename=image_path)
             return True
         except Exception as e:
             print(f"Errore nell'inserimento dell'immagine: {e}")
             return False
     
+    @modifies_pages()
     def delete_annotation(self, page_num, annot_index):
         """Elimina un'annotazione"""
         if not self.current_doc:
@@ -229,35 +566,34 @@ class AdvancedPDFEditor:
             return ""
             
         try:
-            page = self.current_doc[page_num]
-            return page.get_text("text", clip=rect)
+            return "".join(self.current_doc[index].get_text("text", clip=rect)
+                           for index in self._page_indices(page_num))
         except Exception as e:
             print(f"Errore nell'estrazione del testo: {e}")
             return ""
     
     def search_text(self, text, page_num=None):
-        """Cerca testo nel documento"""
+        """Cerca testo nel documento (tutte le pagine, una pagina o una selezione)"""
         if not self.current_doc:
             return []
             
         results = []
         try:
-            if page_num is not None:
-                page = self.current_doc[page_num]
+            if page_num is None:
+                indices = range(len(self.current_doc))
+            else:
+                indices = self._page_indices(page_num)
+            for index in indices:
+                page = self.current_doc[index]
                 text_instances = page.search_for(text)
                 for inst in text_instances:
-                    results.append((page_num, inst))
-            else:
-                for page_num in range(len(self.current_doc)):
-                    page = self.current_doc[page_num]
-                    text_instances = page.search_for(text)
-                    for inst in text_instances:
-                        results.append((page_num, inst))
+                    results.append((index, inst))
             return results
         except Exception as e:
             print(f"Errore nella ricerca: {e}")
             return []
     
+    @modifies_pages()
     def add_form_field(self, page_num, field_type, rect, field_name, **kwargs):
         """Aggiunge un campo form"""
         if not self.current_doc:
@@ -295,30 +631,41 @@ class AdvancedPDFEditor:
             print(f"Errore nell'aggiunta del campo form: {e}")
             return False
     
-    def encrypt_pdf(self, password, permissions=None):
-        """Cripta il PDF con password"""
+    def encrypt_pdf(self, password, permissions=None, owner_password=None):
+        """Cripta il PDF con password
+
+        La cifratura (AES-256) viene applicata al successivo save_pdf.
+        """
         if not self.current_doc:
             return False
             
         try:
-            perm = permissions or fitz.PDF_PERM_PRINT | fitz.PDF_PERM_COPY | fitz.PDF_PERM_EDIT
-            self.current_doc.authenticate(password)
-            self.current_doc.set_metadata({
-                "encryption": True,
+            perm = permissions or fitz.PDF_PERM_PRINT | fitz.PDF_PERM_COPY | fitz.PDF_PERM_MODIFY
+            self.encryption = {
+                "encryption": fitz.PDF_ENCRYPT_AES_256,
+                "user_pw": password,
+                "owner_pw": owner_password or password,
                 "permissions": perm
-            })
+            }
             return True
         except Exception as e:
             print(f"Errore nella crittografia: {e}")
             return False
     
-    def save_pdf(self, output_path, incremental=False):
-        """Salva il PDF modificato"""
+    def save_pdf(self, output_path, incremental=False, garbage=0):
+        """Salva il PDF modificato
+
+        garbage > 0 elimina dal file gli oggetti non più usati (necessario
+        dopo una redaction, perché il contenuto rimosso non resti nel file).
+        """
         if not self.current_doc:
             return False
             
         try:
-            self.current_doc.save(output_path, incremental=incremental)
+            self.current_doc.save(output_path, incremental=incremental, garbage=garbage,
+                                  **(self.encryption or {}))
+            self._source_digest = None
+            self._pdf_path = None
             return True
         except Exception as e:
             print(f"Errore nel salvataggio: {e}")
@@ -330,16 +677,16 @@ class AdvancedPDFEditor:
             return []
             
         try:
-            page = self.current_doc[page_num]
             annotations = []
-            for annot in page.annots():
-                annot_info = {
-                    "type": annot.type[1],
-                    "rect": list(annot.rect),
-                    "content": annot.content,
-                    "page": page_num
-                }
-                annotations.append(annot_info)
+            for index in self._page_indices(page_num):
+                for annot in self.current_doc[index].annots():
+                    annot_info = {
+                        "type": annot.type[1],
+                        "rect": list(annot.rect),
+                        "content": annot.info.get("content", ""),
+                        "page": index
+                    }
+                    annotations.append(annot_info)
             return annotations
         except Exception as e:
             print(f"Errore nel recupero delle annotazioni: {e}")
@@ -350,37 +697,45 @@ class AdvancedPDFEditor:
         if self.current_doc:
             self.current_doc.close()
             self.current_doc = None
+            self.encryption = None
+            self._source_digest = None
+            self._pdf_path = None
+            self._opened_path = None
+            self._forget_renders()
             self.page_num = 0
             self.zoom_level = 1.0
     
+    @modifies_pages()
     def redact_text(self, page_num, rect):
         """Rimuove testo in una regione specifica usando redaction"""
         if not self.current_doc:
             return False
             
         try:
-            page = self.current_doc[page_num]
-            # Aggiungi area di redaction
-            page.add_redact_annot(rect)
-            # Applica redaction
-            page.apply_redactions()
+            for index in self._page_indices(page_num):
+                page = self.current_doc[index]
+                # Aggiungi area di redaction
+                page.add_redact_annot(rect)
+                # Applica redaction
+                page.apply_redactions()
             return True
         except Exception as e:
             print(f"Errore nella redaction del testo: {e}")
             return False
     
+    @modifies_pages()
     def cover_text_with_white(self, page_num, rect):
         """Copre testo con un rettangolo bianco"""
         if not self.current_doc:
             return False
             
         try:
-            page = self.current_doc[page_num]
-            # Disegna un rettangolo bianco sopra il testo
-            shape = page.new_shape()
-            shape.draw_rect(rect)
-            shape.finish(fill=(1, 1, 1), color=None)  # Bianco
-            shape.commit()
+            for index in self._page_indices(page_num):
+                # Disegna un rettangolo bianco sopra il testo
+                shape = self.current_doc[index].new_shape()
+                shape.draw_rect(rect)
+                shape.finish(fill=(1, 1, 1), color=None)  # Bianco
+                shape.commit()
             return True
         except Exception as e:
             print(f"Errore nella copertura del testo: {e}")
@@ -407,6 +762,7 @@ class AdvancedPDFEditor:
             print(f"Errore nel recupero delle immagini: {e}")
             return []
     
+    @modifies_pages()
     def delete_image_by_xref(self, page_num, xref):
         """Elimina un'immagine dalla pagina usando il suo xref"""
         if not self.current_doc:
@@ -421,6 +777,7 @@ class AdvancedPDFEditor:
             print(f"Errore nell'eliminazione dell'immagine: {e}")
             return False
     
+    @modifies_pages()
     def modify_text_annotation(self, page_num, annot_index, new_text):
         """Modifica il contenuto di un'annotazione di testo"""
         if not self.current_doc:
@@ -478,6 +835,7 @@ class AdvancedPDFEditor:
             print(f"Errore nel recupero delle annotazioni di testo: {e}")
             return []
     
+    @modifies_pages()
     def modify_text_properties(self, page_num, annot_index, **kwargs):
         """
         Modifica tutte le proprietà di un'annotazione di testo
@@ -0,0 +1,318 @@
+"""
+PDF Editor - Interfaccia asyncio per i motori PDF
+
+I metodi di PDFManager e AdvancedPDFEditor sono sincroni e impegnano la
+CPU per secondi: chiamati da un servizio asyncio bloccherebbero l'event
+loop. AsyncPDFManager li esegue in un pool di processi (o di thread)
+gestito, con un limite alle operazioni contemporanee; le operazioni
+pagina per pagina restituiscono i risultati in streaming, man mano che
+le pagine sono pronte.
+
+Uso:
+    async with AsyncPDFManager(max_concurrency=4) as apdf:
+        await apdf.merge(["a.pdf", "b.pdf"], "unito.pdf")
+        async for page_num, text in apdf.extract_text("scansione.pdf"):
+            ...
+        async for page_num, png in apdf.render_pages("doc.pdf", pages="1-5", zoom=0.5):
+            ...
+
+    editor = AsyncPDFEditor()
+    await editor.open_pdf("doc.pdf")
+    results = await editor.search_text("riservato")
+    await editor.aclose()
+
+Annullamento: annullando il task (o chiudendo il generatore asincrono) le
+pagine ancora in coda nel pool vengono annullate; quelle già in
+esecuzione in un processo terminano in background e il loro risultato
+viene scartato.
+"""
+import asyncio
+import functools
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from instrumentation import metrics
+from operation_result import OperationResult
+from page_selector import PageSelector
+from pdf_backends import get_backend
+from pdf_inventory import probe_pdf
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+# Documenti aperti tenuti in ogni worker per le operazioni pagina per pagina
+MAX_OPEN_DOCUMENTS = 4
+
+# Stato di ogni worker (processo o thread): PDFManager e documenti aperti
+_worker = threading.local()
+
+
+def _init_worker(backend, cache_dir):
+    """Inizializzatore dei worker: importa e crea il motore prima del primo job"""
+    from pdf_manager import PDFManager
+    from result_cache import ResultCache
+    _worker.manager = PDFManager(backend=backend,
+                                 cache=ResultCache(cache_dir) if cache_dir else None)
+
+
+def _manager():
+    if getattr(_worker, 'manager', None) is None:
+        _init_worker(None, None)
+    return _worker.manager
+
+
+def _open_document(backend_name, pdf_file):
+    """Documento aperto nel worker; riusato dalle pagine successive dello stesso file"""
+    documents = getattr(_worker, 'documents', None)
+    if documents is None:
+        documents = _worker.documents = OrderedDict()
+    stat = os.stat(pdf_file)
+    key = (backend_name, os.path.abspath(pdf_file), stat.st_size, stat.st_mtime)
+    if key in documents:
+        documents.move_to_end(key)
+        return documents[key]
+    backend = get_backend(backend_name)
+    documents[key] = (backend, backend.open(pdf_file))
+    while len(documents) > MAX_OPEN_DOCUMENTS:
+        old_backend, old_document = documents.popitem(last=False)[1]
+        old_backend.close(old_document)
+    return documents[key]
+
+
+def _call_manager(method_name, args, kwargs):
+    """Worker: esegue un metodo di PDFManager; restituisce (risultato, chiamate misurate)"""
+    with metrics.capture() as calls:
+        result = getattr(_manager(), method_name)(*args, **kwargs)
+    return result, calls
+
+
+def _page_text(backend_name, pdf_file, page_index):
+    backend, document = _open_document(backend_name, pdf_file)
+    return backend.page_text(document, page_index)
+
+
+def _render_page(pdf_file, zoom, fmt, page_index):
+    _, document = _open_document('pymupdf', pdf_file)
+    pix = document[page_index].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    return pix.tobytes(fmt)
+
+
+class AsyncPDFManager:
+    """PDFManager per codice asyncio: il lavoro gira in un pool di worker"""
+
+    def __init__(self, max_concurrency=None, use_processes=True, backend=None, cache_dir=None,
+                 executor=None):
+        """
+        Args:
+            max_concurrency: operazioni (o pagine) in esecuzione contemporanea
+                (default: numero di core)
+            use_processes: True = pool di processi (nessun limite del GIL),
+                False = pool di thread (nessun costo di avvio e serializzazione)
+            backend: motore di PDFManager nei worker (vedi pdf_backends)
+            cache_dir: cartella di una ResultCache condivisa dai worker
+            executor: executor già esistente da usare al posto del pool interno
+                (non viene chiuso da aclose)
+        """
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self.use_processes = use_processes
+        self.backend = backend
+        self.cache_dir = cache_dir
+        self._executor = executor
+        self._own_executor = executor is None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    def _ensure_executor(self):
+        if self._executor is None:
+            pool = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            self._executor = pool(max_workers=self.max_concurrency, initializer=_init_worker,
+                                  initargs=(self.backend, self.cache_dir))
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._executor
+
+    async def aclose(self):
+        """Chiude il pool annullando il lavoro ancora in coda"""
+        executor, self._executor = self._executor, None
+        if executor is not None and self._own_executor:
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+    async def _submit(self, function, *args):
+        """Esegue function nel pool rispettando il limite di concorrenza"""
+        executor = self._ensure_executor()
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+
+    async def call(self, method_name, *args, **kwargs):
+        """Esegue un qualsiasi metodo di PDFManager nel pool e ne restituisce il risultato"""
+        result, calls = await self._submit(_call_manager, method_name, args, kwargs)
+        if self.use_processes:
+            # Chiamate misurate in un altro processo: confluiscono nelle metriche locali
+            for call in calls:
+                metrics.record(call)
+        return result
+
+    async def merge(self, pdf_files, output_path, **kwargs):
+        return await self.call('merge_pdfs', list(pdf_files), output_path, **kwargs)
+
+    async def split(self, pdf_file, output_dir, **kwargs):
+        return await self.call('split_pdf_pages', pdf_file, output_dir, **kwargs)
+
+    async def rotate(self, pdf_file, output_path, rotation_angle, **kwargs):
+        return await self.call('rotate_pdf', pdf_file, output_path, rotation_angle, **kwargs)
+
+    async def extract_pages(self, pdf_file, output_path, pages, **kwargs):
+        return await self.call('extract_pages', pdf_file, output_path, pages, **kwargs)
+
+    async def add_watermark(self, pdf_file, output_path, watermark_text, **kwargs):
+        return await self.call('add_watermark', pdf_file, output_path, watermark_text, **kwargs)
+
+    async def extract_text_to_file(self, pdf_file, output_path, **kwargs):
+        return await self.call('extract_text', pdf_file, output_path, **kwargs)
+
+    async def get_pdf_info(self, pdf_file):
+        return await self.call('get_pdf_info', pdf_file)
+
+    async def _stream_pages(self, page_indices, function, args, ordered, result):
+        """Esegue function(*args, indice) per ogni pagina e restituisce (numero pagina, valore)
+
+        Al massimo 2 * max_concurrency pagine sono in coda o in esecuzione.
+        Con ordered=False le pagine vengono restituite appena pronte.
+        """
+        executor = self._ensure_executor()
+        loop = asyncio.get_running_loop()
+        window = 2 * self.max_concurrency
+        pending = iter(page_indices)
+        in_flight = OrderedDict()  # future -> numero pagina
+
+        async def submit_next():
+            index = next(pending, None)
+            if index is None:
+                return
+            await self._semaphore.acquire()
+            future = loop.run_in_executor(executor, function, *args, index)
+            future.add_done_callback(lambda _: self._semaphore.release())
+            in_flight[future] = index + 1
+
+        def finish(future):
+            page_num = in_flight.pop(future)
+            value = None
+            with result.page(page_num):
+                value = future.result()
+            return page_num, value
+
+        try:
+            for _ in range(window):
+                await submit_next()
+            while in_flight:
+                if ordered:
+                    future = next(iter(in_flight))
+                    await asyncio.wait([future])
+                else:
+                    done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    future = next(iter(done))
+                page_num, value = finish(future)
+                await submit_next()
+                if value is not None:
+                    yield page_num, value
+        finally:
+            # Consumatore fermato o task annullato: le pagine in coda non servono più
+            for future in in_flight:
+                future.cancel()
+
+    async def _page_indices(self, pdf_file, pages):
+        info = await asyncio.to_thread(probe_pdf, pdf_file)
+        return PageSelector.coerce(pages).bind(info['num_pages']).indices()
+
+    async def extract_text(self, pdf_file, pages=None, backend=None, ordered=True,
+                           skip_bad_pages=False, result=None):
+        """Generatore asincrono di tuple (numero pagina, testo)
+
+        Args:
+            ordered: False = pagine restituite appena estratte, non in ordine
+            skip_bad_pages: le pagine che non si riescono a leggere vengono
+                saltate invece di interrompere il generatore
+            result: OperationResult in cui registrare l'esito di ogni pagina
+        """
+        if result is None:
+            result = OperationResult('extract_text', skip_bad_pages)
+        backend_name = _manager()._backend_for('text', [pdf_file], backend or self.backend).name
+        indices = await self._page_indices(pdf_file, pages)
+        async for item in self._stream_pages(indices, _page_text, (backend_name, pdf_file),
+                                             ordered, result):
+            yield item
+
+    async def render_pages(self, pdf_file, pages=None, zoom=1.0, fmt="png", ordered=True,
+                           skip_bad_pages=False, result=None):
+        """Generatore asincrono di tuple (numero pagina, immagine codificata in fmt)"""
+        if fitz is None:
+            raise RuntimeError("Il render delle pagine richiede PyMuPDF")
+        if result is None:
+            result = OperationResult('render', skip_bad_pages)
+        indices = await self._page_indices(pdf_file, pages)
+        async for item in self._stream_pages(indices, _render_page, (pdf_file, zoom, fmt),
+                                             ordered, result):
+            yield item
+
+
+class AsyncPDFEditor:
+    """AdvancedPDFEditor per codice asyncio
+
+    Il documento aperto vive in un solo thread dedicato (PyMuPDF non
+    consente di usare lo stesso documento da più thread): tutte le
+    chiamate vengono eseguite lì, in ordine, senza bloccare l'event loop.
+    Ogni metodo di AdvancedPDFEditor è disponibile come coroutine.
+    """
+
+    def __init__(self, editor=None, semaphore=None):
+        """
+        Args:
+            editor: AdvancedPDFEditor da usare (default: uno nuovo)
+            semaphore: asyncio.Semaphore condiviso per limitare le
+                operazioni contemporanee di più editor
+        """
+        if editor is None:
+            from advanced_pdf_editor import AdvancedPDFEditor
+            editor = AdvancedPDFEditor()
+        self.editor = editor
+        self._semaphore = semaphore
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf_editor")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    async def _run(self, method, *args, **kwargs):
+        call = functools.partial(method, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None:
+            return await loop.run_in_executor(self._thread, call)
+        async with self._semaphore:
+            return await loop.run_in_executor(self._thread, call)
+
+    def __getattr__(self, name):
+        attribute = getattr(self.editor, name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        async def method(*args, **kwargs):
+            return await self._run(attribute, *args, **kwargs)
+        return method
+
+    async def aclose(self):
+        """Chiude il documento aperto e il thread dell'editor"""
+        if self.editor.current_doc is not None:
+            await self._run(self.editor.close_pdf)
+        await asyncio.to_thread(self._thread.shutdown, wait=True, cancel_futures=True)
@@ -0,0 +1,547 @@
+"""
+PDF Editor - Elaborazione batch da riga di comando
+
+Esegue un'operazione di PDFManager su tutti i file di una o più cartelle
+(ricorsivamente), file singoli o pattern glob, distribuendo i file su un
+pool di processi. Durante l'esecuzione mostra il throughput (file/s e
+pagine/s).
+
+Ogni file completato viene registrato in un manifest JSON-lines: se
+l'elaborazione si interrompe, rilanciando lo stesso comando vengono
+saltati i file già elaborati (con stessa operazione, stessi parametri,
+stessa dimensione e data di modifica).
+
+Esempi:
+    python pdf_batch.py rotate archivio/ -o ruotati/ --angle 90 --workers 8
+    python pdf_batch.py extract-text "scansioni/**/*.pdf" -o testi/
+    python pdf_batch.py watermark archivio/ -o bozze/ --text "BOZZA"
+    python pdf_batch.py info archivio/ --manifest inventario.jsonl
+    python pdf_batch.py merge capitoli/ -o libro.pdf
+    python pdf_batch.py pipeline archivio/ -o pubblicati/ --recipe ricetta.yaml
+
+Con --cache i risultati vengono memorizzati in una cache indirizzata per
+contenuto (vedi result_cache): un file identico già elaborato con gli
+stessi parametri, anche con un altro nome o in un'altra cartella, viene
+copiato dalla cache invece di essere rielaborato.
+
+Prima dell'esecuzione ogni job viene valutato dal budget di memoria (vedi
+memory_budget): i file oltre max_file_size_mb vengono registrati come
+errore senza elaborarli, quelli troppo grandi per il budget vengono
+elaborati a blocchi di pagine e i job in parallelo non superano mai,
+sommati, il budget complessivo.
+
+Con --skip-bad-pages le pagine che non si riescono a elaborare vengono
+saltate (vedi operation_result): il file viene registrato come "partial"
+con l'elenco delle pagine fallite e, alla ripresa, la divisione in pagine
+rielabora soltanto quelle.
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from instrumentation import configure_logging, metrics
+from memory_budget import BudgetExceeded, MemoryBudget
+from operation_result import OperationResult
+from pdf_manager import PDFManager
+from pdf_inventory import probe_pdf
+from result_cache import ResultCache
+from pdf_pipeline import PDFPipeline, load_recipe
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tif', '.tiff', '.jp2')
+
+MANIFEST_NAME = ".pdf_batch_manifest.jsonl"
+
+# Opzioni che identificano un job: cambiandole i file vengono rielaborati
+OPERATION_OPTIONS = {
+    'split': ('backend',),
+    'rotate': ('angle', 'pages', 'backend'),
+    'extract-pages': ('pages',),
+    'watermark': ('text', 'pages', 'font_size', 'opacity', 'watermark_angle'),
+    'extract-text': ('pages', 'backend'),
+    'images': ('target_dpi',),
+    'info': (),
+    'merge': (),
+    'pipeline': ('recipe',),
+}
+
+# PDFManager creato una sola volta in ogni processo worker
+_worker_manager = None
+
+
+def _output_path(operation, output_dir, relative_path):
+    """Percorso di output di un file (la struttura delle cartelle viene mantenuta)"""
+    if operation == 'info':
+        return None
+    stem, extension = os.path.splitext(relative_path)
+    if operation == 'split':
+        return os.path.join(output_dir, os.path.dirname(relative_path))
+    if operation == 'extract-text':
+        return os.path.join(output_dir, stem + ".txt")
+    if operation == 'images':
+        return os.path.join(output_dir, stem + ".pdf")
+    return os.path.join(output_dir, relative_path)
+
+
+def _glob_root(pattern):
+    """Parte iniziale del pattern senza caratteri jolly (es: "in/**/*.pdf" -> "in")"""
+    root = pattern
+    while glob.has_magic(root):
+        root = os.path.dirname(root)
+    return root or os.curdir
+
+
+def collect_inputs(inputs, extensions=('.pdf',)):
+    """Espande cartelle (ricorsivamente), file e pattern glob
+
+    Il percorso relativo dei file trovati da un pattern glob parte dalla
+    cartella che precede il primo carattere jolly: "in/**/*.pdf" produce
+    "a/report.pdf" e "b/report.pdf", non due volte "report.pdf".
+
+    Returns:
+        Lista ordinata di tuple (percorso, percorso relativo per l'output)
+    """
+    found = {}
+    for item in inputs:
+        if os.path.isdir(item):
+            for dirpath, dirnames, filenames in os.walk(item):
+                dirnames.sort()
+                for name in filenames:
+                    if name.lower().endswith(extensions):
+                        path = os.path.join(dirpath, name)
+                        found.setdefault(os.path.abspath(path), os.path.relpath(path, item))
+        else:
+            if glob.has_magic(item):
+                matches, root = glob.glob(item, recursive=True), _glob_root(item)
+            else:
+                matches, root = [item], os.path.dirname(item) or os.curdir
+            for path in matches:
+                if os.path.isfile(path) and path.lower().endswith(extensions):
+                    found.setdefault(os.path.abspath(path), os.path.relpath(path, root))
+    return sorted(found.items())
+
+
+def _run_job(job):
+    """Worker: esegue un job e restituisce il record da scrivere nel manifest"""
+    global _worker_manager
+    if _worker_manager is None:
+        _worker_manager = PDFManager(cache=ResultCache(job['cache']) if job.get('cache') else None)
+    manager = _worker_manager
+    options = job['options']
+    start_time = time.perf_counter()
+    record = {key: job[key] for key in ('key', 'operation', 'input', 'output', 'signature')}
+
+    # PDFManager stampa i propri errori: vengono catturati nel record
+    messages = io.StringIO()
+    try:
+        with metrics.capture() as calls, contextlib.redirect_stdout(messages):
+            result = _dispatch(manager, job, options)
+        if isinstance(result, OperationResult):
+            ok = bool(result)
+        else:
+            ok = result is not None and result is not False
+        if job['operation'] == 'info' and ok:
+            record['info'] = result
+        if job['operation'] == 'pipeline' and ok:
+            record['stages'] = result
+    except Exception as e:
+        ok = False
+        messages.write(str(e))
+
+    record['status'] = 'ok' if ok else 'error'
+    if not ok:
+        record['error'] = messages.getvalue().strip() or "Operazione non riuscita"
+    record['pages'] = _count_pages(job) if ok else 0
+    if ok and isinstance(result, OperationResult) and result.status == 'partial':
+        record.update(status='partial', error=result.summary(), failed_pages=result.failed_pages,
+                      pages=len(result.completed_pages))
+    record['seconds'] = round(time.perf_counter() - start_time, 4)
+    # Misure della strumentazione: non vanno nel manifest (vedi run_batch)
+    record['calls'] = calls
+    return record
+
+
+def _dispatch(manager, job, options):
+    """Chiama il metodo di PDFManager corrispondente all'operazione"""
+    operation, source, output = job['operation'], job['input'], job['output']
+    if output and operation not in ('split', 'merge'):
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+
+    # Pagine per finestra se il documento supera il budget di memoria
+    chunk_pages = job.get('chunk_pages')
+    skip = job.get('skip_bad_pages', False)
+
+    if operation == 'split':
+        os.makedirs(output, exist_ok=True)
+        # Alla ripresa di un file "partial" si rielaborano solo le pagine fallite
+        return manager.split_pdf_pages(source, output, backend=options['backend'],
+                                       chunk_pages=chunk_pages, pages=job.get('retry_pages'),
+                                       skip_bad_pages=skip)
+    if operation == 'rotate':
+        return manager.rotate_pdf(source, output, options['angle'], pages=options['pages'],
+                                  backend=options['backend'], chunk_pages=chunk_pages,
+                                  skip_bad_pages=skip)
+    if operation == 'extract-pages':
+        return manager.extract_pages(source, output, options['pages'] or "all",
+                                     chunk_pages=chunk_pages, skip_bad_pages=skip)
+    if operation == 'watermark':
+        return manager.add_watermark(source, output, options['text'], pages=options['pages'],
+                                     font_size=options['font_size'], opacity=options['opacity'],
+                                     angle=options['watermark_angle'], chunk_pages=chunk_pages,
+                                     skip_bad_pages=skip)
+    if operation == 'extract-text':
+        return manager.extract_text(source, output, pages=options['pages'],
+                                    backend=options['backend'], chunk_pages=chunk_pages,
+                                    skip_bad_pages=skip)
+    if operation == 'images':
+        return manager.convert_images_to_pdf([source], output, target_dpi=options['target_dpi'],
+                                             workers=1)
+    if operation == 'info':
+        return manager.get_pdf_info(source)
+    if operation == 'pipeline':
+        return PDFPipeline.from_recipe(options['recipe']).run(source, output)
+    if operation == 'merge':
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        return manager.merge_pdfs(job['sources'], output, streaming=True)
+    raise ValueError(f"Operazione sconosciuta: {operation}")
+
+
+def _count_pages(job):
+    """Pagine elaborate dal job (per il calcolo delle pagine/s)
+
+    Usa il conteggio già calcolato dal controllo di ammissione (vedi
+    _admit); alla ripresa di uno split "partial" solo le pagine rielaborate.
+    """
+    try:
+        if job['operation'] == 'images':
+            return 1
+        if job.get('retry_pages'):
+            return len(job['retry_pages'])
+        if job.get('num_pages') is not None:
+            return job['num_pages']
+        sources = job.get('sources') or [job['input']]
+        return sum(probe_pdf(source)['num_pages'] or 0 for source in sources)
+    except Exception:
+        return 0
+
+
+def _rejected(job, error):
+    """Record di errore di un job che non viene eseguito"""
+    record = {key: job[key] for key in ('key', 'operation', 'input', 'output', 'signature')}
+    record.update(status='error', error=error, pages=0, seconds=0.0)
+    return record
+
+
+def _admit(budget, job):
+    """Valuta il job prima di eseguirlo
+
+    Imposta job['chunk_pages'] (modalità a blocchi) e job['num_pages'] (pagine
+    stimate, riusate da _count_pages), che non fanno parte della firma del
+    job, e restituisce i byte da riservare; se il job non si può
+    eseguire (output già usato da un altro file, BudgetExceeded) restituisce
+    invece il record di errore da scrivere nel manifest.
+    """
+    if job.get('output_taken_by'):
+        return _rejected(job, f"Output {job['output']} già prodotto da {job['output_taken_by']}")
+    try:
+        plan = budget.plan(job.get('sources') or [job['input']])
+    except BudgetExceeded as e:
+        return _rejected(job, f"Job rifiutato: {e}")
+    job['chunk_pages'] = plan['chunk_pages']
+    job['num_pages'] = plan['cost']['num_pages']
+    return plan['reserve']
+
+
+def _mark_output_conflicts(jobs):
+    """Segna i job che scriverebbero sullo stesso file di output di un job precedente
+
+    Succede ad esempio con due file omonimi passati da cartelle diverse: il
+    primo viene elaborato, gli altri vengono registrati come errore invece
+    di sovrascriverne il risultato.
+    """
+    owners = {}
+    for job in jobs:
+        if job['output'] is None or job['operation'] == 'merge':
+            continue
+        output = job['output']
+        if job['operation'] == 'split':
+            # Le pagine vengono scritte come <nome>_page_N.pdf nella cartella di output
+            output = os.path.join(output, os.path.splitext(os.path.basename(job['input']))[0])
+        output = os.path.normcase(os.path.abspath(output))
+        owner = owners.setdefault(output, job['input'])
+        if owner != job['input']:
+            job['output_taken_by'] = owner
+
+
+class JobManifest:
+    """Manifest JSON-lines dei job completati, letto alla ripresa"""
+
+    def __init__(self, path):
+        self.path = path
+        self.completed = {}
+        self.partial = {}  # chiave -> (firma, pagine fallite)
+        truncated = False
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    truncated = not line.endswith("\n")
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Riga troncata da un'interruzione
+                    if record.get('status') == 'ok':
+                        self.completed[record['key']] = record['signature']
+                        self.partial.pop(record['key'], None)
+                    else:
+                        self.completed.pop(record.get('key'), None)
+                        if record.get('status') == 'partial':
+                            self.partial[record['key']] = (record['signature'],
+                                                           record['failed_pages'])
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        if truncated:
+            # Chiude la riga incompleta per non fonderla con il record successivo
+            self._file.write("\n")
+
+    def is_done(self, job):
+        return self.completed.get(job['key']) == job['signature']
+
+    def failed_pages(self, job):
+        """Pagine fallite nell'esecuzione precedente del job (None se non parziale)"""
+        signature, pages = self.partial.get(job['key'], (None, None))
+        return pages if signature == job['signature'] else None
+
+    def record(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        # Ogni riga arriva su disco prima di passare al job successivo
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def build_jobs(args):
+    """Crea la lista dei job a partire dagli argomenti della riga di comando"""
+    extensions = IMAGE_EXTENSIONS if args.operation == 'images' else ('.pdf',)
+    inputs = collect_inputs(args.inputs, extensions)
+    options = {name: getattr(args, name) for name in OPERATION_OPTIONS[args.operation]}
+    if args.operation == 'pipeline':
+        # Il contenuto della ricetta (non il percorso) identifica il job
+        options['recipe'] = load_recipe(args.recipe)
+
+    def signature(path):
+        stat = os.stat(path)
+        return json.dumps([args.operation, options, stat.st_size, stat.st_mtime], sort_keys=True)
+
+    if args.operation == 'merge':
+        sources = [path for path, _ in inputs]
+        if not sources:
+            return []
+        merged_signature = json.dumps([signature(path) for path in sources])
+        return [{
+            'key': os.path.abspath(args.output), 'operation': 'merge', 'input': None,
+            'sources': sources, 'output': args.output, 'options': options,
+            'signature': merged_signature, 'cache': args.cache,
+        }]
+
+    # Come la cache, non fa parte della firma: non cambia i file prodotti
+    skip_bad_pages = getattr(args, 'skip_bad_pages', False)
+    return [{
+        'key': path, 'operation': args.operation, 'input': path,
+        'output': _output_path(args.operation, args.output, relative_path),
+        'options': options, 'signature': signature(path), 'cache': args.cache,
+        'skip_bad_pages': skip_bad_pages,
+    } for path, relative_path in inputs]
+
+
+def run_batch(args, out=sys.stdout):
+    """Esegue il batch descritto da args
+
+    Returns:
+        dict con il riepilogo: file totali, saltati, completati, errori,
+        pagine, secondi, file/s e pagine/s
+    """
+    jobs = build_jobs(args)
+    _mark_output_conflicts(jobs)
+    manifest_path = args.manifest
+    if manifest_path is None:
+        if args.operation == 'merge':
+            manifest_dir = os.path.dirname(os.path.abspath(args.output))
+        else:
+            manifest_dir = args.output or '.'
+        manifest_path = os.path.join(manifest_dir, MANIFEST_NAME)
+    if not args.resume and os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    manifest = JobManifest(manifest_path)
+    budget = MemoryBudget.from_config()
+    if getattr(args, 'memory_budget', None):
+        budget.budget = int(args.memory_budget * 1024 * 1024)
+    if getattr(args, 'chunk_pages', None):
+        budget.chunk_pages = args.chunk_pages
+
+    pending = [job for job in jobs if not manifest.is_done(job)]
+    for job in pending:
+        if job['operation'] == 'split' and manifest.failed_pages(job):
+            job['retry_pages'] = manifest.failed_pages(job)
+    summary = {'files': len(jobs), 'skipped': len(jobs) - len(pending),
+               'done': 0, 'partial': 0, 'errors': 0, 'pages': 0}
+    if summary['skipped']:
+        print(f"Ripresa: {summary['skipped']} file già elaborati (manifest {manifest_path})", file=out)
+
+    start_time = time.perf_counter()
+    last_report = start_time
+
+    def report(final=False):
+        elapsed = max(time.perf_counter() - start_time, 1e-9)
+        processed = summary['done'] + summary['partial'] + summary['errors']
+        print(f"[{processed}/{len(pending)}] {processed / elapsed:.1f} file/s, "
+              f"{summary['pages'] / elapsed:.1f} pagine/s, {summary['errors']} errori"
+              + (f" in {elapsed:.1f}s" if final else ""), file=out)
+
+    def collect(record, remote=False):
+        nonlocal last_report
+        calls = record.pop('calls', [])
+        if remote:
+            # Chiamate misurate in un processo worker
+            for call in calls:
+                metrics.record(call)
+        manifest.record(record)
+        if record['status'] == 'ok':
+            summary['done'] += 1
+            summary['pages'] += record['pages']
+        elif record['status'] == 'partial':
+            summary['partial'] += 1
+            summary['pages'] += record['pages']
+            print(f"Pagine saltate in {record['input']}: {record['error']}", file=out)
+        else:
+            summary['errors'] += 1
+            print(f"Errore su {record['input'] or record['output']}: {record['error']}", file=out)
+        if time.perf_counter() - last_report >= args.progress:
+            last_report = time.perf_counter()
+            report()
+
+    try:
+        if args.workers == 1 or len(pending) <= 1:
+            for job in pending:
+                reserve = _admit(budget, job)
+                collect(reserve if isinstance(reserve, dict) else _run_job(job))
+        else:
+            with ProcessPoolExecutor(max_workers=args.workers) as executor:
+                # Finestra limitata: non si creano decine di migliaia di future
+                window = 4 * (args.workers or os.cpu_count() or 1)
+                in_flight = deque()  # (future, byte riservati)
+
+                def collect_oldest():
+                    future, reserved = in_flight.popleft()
+                    try:
+                        collect(future.result(), remote=True)
+                    finally:
+                        budget.release(reserved)
+
+                for job in pending:
+                    reserve = _admit(budget, job)
+                    if isinstance(reserve, dict):
+                        collect(reserve)
+                        continue
+                    # Attende i job in corso finché il nuovo job non rientra nel budget
+                    # (senza job in corso la prenotazione riesce sempre: reserve()
+                    # limita la richiesta al budget)
+                    while not budget.reserve(reserve, block=False):
+                        collect_oldest()
+                    in_flight.append((executor.submit(_run_job, job), reserve))
+                    if len(in_flight) >= window:
+                        collect_oldest()
+                while in_flight:
+                    collect_oldest()
+    finally:
+        manifest.close()
+
+    report(final=True)
+    summary['seconds'] = time.perf_counter() - start_time
+    processed = summary['done'] + summary['partial'] + summary['errors']
+    summary['files_per_second'] = processed / max(summary['seconds'], 1e-9)
+    summary['pages_per_second'] = summary['pages'] / max(summary['seconds'], 1e-9)
+    summary['metrics'] = metrics.snapshot()
+    if getattr(args, 'metrics', None):
+        with open(args.metrics, 'w', encoding='utf-8') as f:
+            json.dump(summary['metrics'], f, indent=2)
+    return summary
+
+
+def build_parser():
+    """Parser della riga di comando con un sottocomando per operazione"""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('inputs', nargs='+', help="cartelle, file o pattern glob (es: \"**/*.pdf\")")
+    common.add_argument('-o', '--output', help="cartella di output (file di output per merge)")
+    common.add_argument('-w', '--workers', type=int, default=None,
+                        help="processi worker (default: tutti i core)")
+    common.add_argument('--manifest', help=f"manifest dei job (default: <output>/{MANIFEST_NAME})")
+    common.add_argument('--no-resume', dest='resume', action='store_false',
+                        help="ignora il manifest esistente e rielabora tutti i file")
+    common.add_argument('--progress', type=float, default=2.0,
+                        help="intervallo in secondi tra i report di throughput")
+    common.add_argument('--metrics', metavar='FILE', default=None,
+                        help="salva in JSON tempi, pagine e byte di ogni operazione")
+    common.add_argument('--cache', metavar='DIR', default=None,
+                        help="cartella della cache dei risultati (default: nessuna cache)")
+    common.add_argument('--memory-budget', metavar='MB', type=float, default=None,
+                        help="memoria per i job in parallelo (default: memory_budget_mb in config.ini)")
+    common.add_argument('--skip-bad-pages', action='store_true',
+                        help="salta le pagine che non si riescono a elaborare e prosegue")
+    common.add_argument('--chunk-pages', type=int, default=None,
+                        help="pagine per blocco per i documenti oltre il budget (default: config.ini)")
+
+    parser = argparse.ArgumentParser(prog="pdf_batch",
+                                     description="Elaborazione batch di PDF senza interfaccia grafica")
+    subparsers = parser.add_subparsers(dest='operation', required=True)
+
+    backend = argparse.ArgumentParser(add_help=False)
+    backend.add_argument('--backend', choices=['auto', 'pypdf', 'pymupdf'], default=None,
+                         help="motore PDF (default: configurazione utente)")
+    pages = argparse.ArgumentParser(add_help=False)
+    pages.add_argument('--pages', default=None, help="selezione pagine (es: \"1-3,odd,z\")")
+
+    subparsers.add_parser('split', parents=[common, backend], help="divide in pagine singole")
+    rotate = subparsers.add_parser('rotate', parents=[common, backend, pages], help="ruota le pagine")
+    rotate.add_argument('--angle', type=int, required=True, help="angolo (multiplo di 90)")
+    subparsers.add_parser('extract-pages', parents=[common, pages], help="estrae pagine")
+    watermark = subparsers.add_parser('watermark', parents=[common, pages], help="aggiunge un watermark")
+    watermark.add_argument('--text', required=True, help="testo del watermark")
+    watermark.add_argument('--font-size', type=int, default=50)
+    watermark.add_argument('--opacity', type=float, default=0.3)
+    watermark.add_argument('--watermark-angle', type=float, default=45)
+    subparsers.add_parser('extract-text', parents=[common, backend, pages], help="estrae il testo")
+    images = subparsers.add_parser('images', parents=[common], help="converte immagini in PDF")
+    images.add_argument('--target-dpi', type=int, default=None)
+    subparsers.add_parser('info', parents=[common], help="raccoglie le informazioni nel manifest")
+    subparsers.add_parser('merge', parents=[common], help="unisce tutti i file in uno solo")
+    pipeline = subparsers.add_parser('pipeline', parents=[common],
+                                     help="esegue una ricetta di operazioni in memoria")
+    pipeline.add_argument('--recipe', required=True, help="ricetta JSON o YAML (vedi pdf_pipeline)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.output is None and args.operation != 'info':
+        parser.error(f"l'operazione {args.operation} richiede --output")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers deve essere almeno 1")
+
+    configure_logging()
+    summary = run_batch(args)
+    print(f"Completati {summary['done']}, parziali {summary['partial']}, "
+          f"saltati {summary['skipped']}, errori {summary['errors']} su {summary['files']} file")
+    return 1 if summary['errors'] or summary['partial'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,430 @@
+"""
+PDF Editor - Strumentazione delle operazioni
+
+Misura ogni chiamata ai metodi pubblici dei motori (PDFManager,
+AdvancedPDFEditor, PDFFormEditor, PDFSecurity): tempo, pagine
+elaborate, byte letti e scritti, picco di memoria ed esito.
+
+Le misure sono disponibili in due forme:
+  - metrics: contatori e istogrammi in memoria, letti dalla barra di
+    stato dell'interfaccia e dagli strumenti batch (metrics.snapshot())
+  - log JSON strutturati (una riga per chiamata) sul logger
+    "pdf_editor.operations", attivati da configure_logging() secondo la
+    sezione [logging] di config.ini
+
+Le chiamate annidate (un metodo pubblico che ne chiama un altro) sono
+misurate una sola volta, nella chiamata più esterna.
+"""
+import configparser
+import contextlib
+import functools
+import inspect
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from operation_result import OperationResult
+from page_selector import PageSelector
+from pdf_inventory import probe_pdf
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+CONFIG_FILE = Path(__file__).parent.parent / "config.ini"
+LOG_DIR = Path.home() / ".pdf_editor_pro"
+
+# Limiti superiori (secondi) dei bucket degli istogrammi dei tempi
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60, float('inf'))
+MEMORY_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, float('inf'))
+
+# Argomenti che indicano file o cartelle di output (tutti gli altri percorsi sono input)
+OUTPUT_ARGUMENTS = ('output_path', 'output_dir', 'output_file')
+PAGE_ARGUMENTS = ('page_num', 'page_index')
+
+logger = logging.getLogger("pdf_editor.operations")
+logger.addHandler(logging.NullHandler())
+
+
+class Histogram:
+    """Distribuzione a bucket fissi con conteggio, somma, minimo e massimo"""
+
+    def __init__(self, buckets=SECONDS_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def percentile(self, fraction):
+        """Stima del percentile: limite superiore del bucket che lo contiene"""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.sum / self.count if self.count else None,
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'buckets': {str(bound): count for bound, count in zip(self.buckets, self.counts)},
+        }
+
+
+class Metrics:
+    """Contatori e istogrammi delle operazioni, condivisi da tutto il processo"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+            self.last = None
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value, buckets=SECONDS_BUCKETS):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def counter(self, name):
+        return self.counters.get(name, 0)
+
+    def histogram(self, name):
+        """Riepilogo di un istogramma (None se non ci sono osservazioni)"""
+        with self._lock:
+            histogram = self.histograms.get(name)
+            return histogram.summary() if histogram else None
+
+    def record(self, call):
+        """Registra una chiamata (dict prodotto dalla strumentazione)
+
+        Usato anche per riportare nel processo principale le chiamate
+        avvenute nei processi worker (vedi capture).
+        """
+        operation = call['operation']
+        self.increment('calls')
+        self.increment(f"calls.{operation}")
+        if call['status'] == 'partial':
+            # Operazione completata saltando alcune pagine (vedi operation_result)
+            self.increment('partial')
+            self.increment(f"partial.{operation}")
+            self.increment('failed_pages', len(call.get('failed_pages', ())))
+        elif call['status'] != 'ok':
+            self.increment('errors')
+            self.increment(f"errors.{operation}")
+        for name in ('pages', 'bytes_in', 'bytes_out'):
+            if call.get(name):
+                self.increment(name, call[name])
+                self.increment(f"{name}.{operation}", call[name])
+        self.observe(f"seconds.{operation}", call['seconds'])
+        if call.get('peak_rss_mb') is not None:
+            self.observe('peak_rss_mb', call['peak_rss_mb'], MEMORY_BUCKETS)
+        with self._lock:
+            self.last = call
+            for calls in getattr(self._local, 'captures', ()):
+                calls.append(call)
+
+    @contextlib.contextmanager
+    def capture(self):
+        """Raccoglie in una lista le chiamate registrate dal thread corrente
+
+        Esempio (processo worker):
+            with metrics.capture() as calls:
+                manager.rotate_pdf(...)
+            return calls   # il processo principale chiama metrics.record()
+        """
+        calls = []
+        captures = getattr(self._local, 'captures', None)
+        if captures is None:
+            captures = self._local.captures = []
+        captures.append(calls)
+        try:
+            yield calls
+        finally:
+            captures.remove(calls)
+
+    def snapshot(self):
+        """Stato corrente in forma serializzabile in JSON"""
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'histograms': {name: histogram.summary()
+                               for name, histogram in self.histograms.items()},
+                'last': self.last,
+            }
+
+
+metrics = Metrics()
+
+_tracking = threading.local()
+_peak_reset_available = True
+
+
+def _reset_peak_rss():
+    """Azzera il picco di memoria del processo, dove il sistema lo consente (Linux)"""
+    global _peak_reset_available
+    if not _peak_reset_available:
+        return
+    try:
+        with open("/proc/self/clear_refs", 'w') as f:
+            f.write("5")
+    except OSError:
+        _peak_reset_available = False
+
+
+def peak_rss_mb():
+    """Picco di memoria residente del processo in MB (None se non misurabile)"""
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux riporta KB, macOS byte
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _paths(value):
+    if isinstance(value, (str, os.PathLike)):
+        return [value]
+    if isinstance(value, (list, tuple)) and value and all(isinstance(v, (str, os.PathLike)) for v in value):
+        return list(value)
+    return []
+
+
+def _size(path):
+    """Dimensione di un file o del contenuto (non ricorsivo) di una cartella"""
+    try:
+        if os.path.isdir(path):
+            with os.scandir(path) as entries:
+                return sum(entry.stat().st_size for entry in entries if entry.is_file())
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _document(instance):
+    """Documento PyMuPDF aperto dall'editor (direttamente o tramite pdf_editor)"""
+    editor = getattr(instance, 'pdf_editor', instance)
+    return getattr(editor, 'current_doc', None)
+
+
+def _count_pages(instance, arguments, inputs, whole_document):
+    for name in PAGE_ARGUMENTS:
+        if name in arguments:
+            value = arguments[name]
+            if isinstance(value, int) or (value is None and not whole_document):
+                return 1
+            doc = _document(instance)
+            if value is None:
+                return doc.page_count if doc else 0
+            return len(PageSelector.coerce(value).bind(doc.page_count).indices()) if doc else 0
+    pdf_inputs = [path for path in inputs if str(path).lower().endswith('.pdf')]
+    if pdf_inputs:
+        return sum(probe_pdf(path).get('num_pages') or 0 for path in pdf_inputs)
+    if inputs:
+        return len(inputs)  # Immagini: una pagina ciascuna
+    doc = _document(instance)
+    return doc.page_count if doc else 0
+
+
+def _failed(result):
+    # I motori segnalano gli errori con False o con una tupla (False, messaggio)
+    return result is False or (isinstance(result, tuple) and bool(result) and result[0] is False)
+
+
+def _instrument(method, component, whole_document):
+    signature = inspect.signature(method)
+    operation = f"{component}.{method.__name__}"
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if getattr(_tracking, 'active', False):
+            return method(self, *args, **kwargs)
+
+        _tracking.active = True
+        try:
+            try:
+                arguments = signature.bind(self, *args, **kwargs).arguments
+            except TypeError:
+                arguments = {}
+            inputs = [path for name, value in arguments.items() if name not in OUTPUT_ARGUMENTS
+                      for path in _paths(value) if os.path.isfile(path)]
+            outputs = [path for name in OUTPUT_ARGUMENTS for path in _paths(arguments.get(name))]
+            bytes_in = sum(_size(path) for path in inputs)
+            out_before = sum(_size(path) for path in outputs)
+
+            _reset_peak_rss()
+            status, error, failed_pages = 'ok', None, None
+            start_time = time.perf_counter()
+            try:
+                result = method(self, *args, **kwargs)
+                if isinstance(result, OperationResult):
+                    status = result.status
+                    if status != 'ok':
+                        error, failed_pages = result.summary(), result.failed_pages
+                elif _failed(result):
+                    status = 'error'
+                    if isinstance(result, tuple) and len(result) > 1:
+                        error = str(result[1])
+                return result
+            except Exception as e:
+                status, error = 'error', f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                seconds = time.perf_counter() - start_time
+                _report(operation, arguments, inputs, outputs, out_before, bytes_in,
+                        seconds, status, error, self, method.__name__ in whole_document,
+                        failed_pages)
+        finally:
+            _tracking.active = False
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def _report(operation, arguments, inputs, outputs, out_before, bytes_in, seconds, status, error,
+            instance, whole_document, failed_pages=None):
+    # La strumentazione non deve mai far fallire l'operazione misurata
+    try:
+        try:
+            pages = _count_pages(instance, arguments, inputs, whole_document)
+        except Exception:
+            pages = None
+        call = {
+            'operation': operation,
+            'status': status,
+            'seconds': round(seconds, 6),
+            'pages': pages,
+            'bytes_in': bytes_in,
+            'bytes_out': max(sum(_size(path) for path in outputs) - out_before, 0)
+                         if outputs else 0,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+        if error:
+            call['error'] = error
+        if failed_pages:
+            call['failed_pages'] = failed_pages
+        metrics.record(call)
+        logger.log(logging.INFO if status == 'ok' else logging.WARNING, operation,
+                   extra={'operation_metrics': call})
+    except Exception as e:
+        print(f"Errore nella strumentazione di {operation}: {e}")
+
+
+def instrumented(component, whole_document=(), exclude=()):
+    """Decoratore di classe: misura tutti i metodi pubblici definiti nella classe
+
+    Args:
+        component: nome del motore usato nei nomi delle metriche
+        whole_document: metodi in cui page_num=None indica tutto il
+            documento (negli altri indica la pagina corrente)
+        exclude: metodi da non misurare (es. semplici letture di stato)
+    """
+    def decorator(cls):
+        for name, member in list(vars(cls).items()):
+            if name.startswith('_') or name in exclude or not inspect.isfunction(member):
+                continue
+            if inspect.isgeneratorfunction(member):
+                continue  # Il tempo di un generatore dipende dal consumatore
+            setattr(cls, name, _instrument(member, component, set(whole_document)))
+        return cls
+    return decorator
+
+
+class JsonFormatter(logging.Formatter):
+    """Una riga JSON per record, con le misure dell'operazione se presenti"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'operation_metrics', {}))
+        return json.dumps(entry, ensure_ascii=False)
+
+
+_configured_handler = None
+
+
+def configure_logging(config_path=None, stream=None):
+    """Attiva i log JSON secondo la sezione [logging] di config.ini
+
+    Chiavi lette: log_level (default INFO), log_file (relativo alla
+    cartella ~/.pdf_editor_pro), max_log_size_mb, log_format ("json" o
+    "text"). Con stream i log vanno sullo stream invece che su file.
+
+    Returns:
+        L'handler installato (chiamate successive lo sostituiscono)
+    """
+    global _configured_handler
+    parser = configparser.ConfigParser()
+    parser.read(config_path or CONFIG_FILE, encoding='utf-8')
+    section = parser['logging'] if parser.has_section('logging') else {}
+    level = str(section.get('log_level', 'INFO')).upper()
+    log_format = str(section.get('log_format', 'json')).lower()
+
+    if stream is not None:
+        handler = logging.StreamHandler(stream)
+    else:
+        log_file = Path(section.get('log_file', 'pdf_editor.log')).expanduser()
+        if not log_file.is_absolute():
+            log_file = LOG_DIR / log_file
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        max_bytes = int(float(section.get('max_log_size_mb', 10)) * 1024 * 1024)
+        handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes,
+                                                       backupCount=3, encoding='utf-8')
+    handler.setFormatter(JsonFormatter() if log_format == 'json'
+                         else logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+
+    root = logging.getLogger("pdf_editor")
+    if _configured_handler is not None:
+        root.removeHandler(_configured_handler)
+        _configured_handler.close()
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, level, logging.INFO))
+    _configured_handler = handler
+    return handler
@@ -0,0 +1,590 @@
+"""
+PDF Editor - Servizio locale a coda di job
+
+Un processo di lunga durata che espone i motori dell'editor (PDFManager e
+AdvancedPDFEditor) via HTTP su localhost: gli strumenti che lo usano non
+pagano a ogni chiamata il costo di import e avvio.
+
+I job vengono accodati con priorità (più alta = eseguito prima) ed
+eseguiti da un pool di processi già avviato e con i moduli importati.
+Quando la coda è piena il servizio risponde 429 (503 durante lo
+spegnimento): il client deve riprovare più tardi.
+
+I job passano dal budget di memoria (vedi memory_budget): i file oltre
+max_file_size_mb vengono rifiutati con 413, i documenti troppo grandi
+vengono elaborati a blocchi di pagine e un job parte solo quando la
+memoria stimata dei job in esecuzione lascia spazio al suo costo.
+
+Con il parametro skip_bad_pages (split, watermark, extract, extract-text)
+le pagine che non si riescono a elaborare vengono saltate: il job termina
+comunque e ne riporta l'elenco in failed_pages.
+
+API:
+    GET    /health                  stato del servizio
+    GET    /metrics                 contatori e istogrammi delle operazioni eseguite
+    POST   /jobs                    {"operation", "params", "priority"} -> 202 + job
+    GET    /jobs/<id>               stato del job (queued, running, done, error, cancelled)
+    GET    /jobs/<id>/result[/<n>]  file n-esimo prodotto dal job, in streaming
+    DELETE /jobs/<id>               annulla un job in coda o elimina i risultati
+
+Operazioni e parametri (i percorsi sono file locali del servizio):
+    merge         inputs, [backend]
+    split         input, [backend, skip_bad_pages]
+    watermark     input, text, [pages, font_size, opacity, angle, skip_bad_pages]
+    extract       input, pages, [skip_bad_pages]
+    extract-text  input, [pages, backend, skip_bad_pages]
+    redact        input, [terms], [areas: [{"pages", "rect"}]]
+    encrypt       input, password, [owner_password, permissions]
+
+Avvio: python pdf_service.py --port 8765 --workers 4
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import queue
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import error as urllib_error
+from urllib import request as urllib_request
+
+from instrumentation import configure_logging, metrics
+from memory_budget import BudgetExceeded, MemoryBudget
+from operation_result import OperationResult
+
+OPERATIONS = ('merge', 'split', 'watermark', 'extract', 'extract-text', 'redact', 'encrypt')
+
+CHUNK_SIZE = 64 * 1024
+
+# Motori creati una sola volta in ogni processo worker
+_worker_manager = None
+_worker_editor_class = None
+
+
+def _warm_worker():
+    """Inizializzatore dei worker: importa i motori prima del primo job"""
+    global _worker_manager, _worker_editor_class
+    from pdf_manager import PDFManager
+    from advanced_pdf_editor import AdvancedPDFEditor
+    _worker_manager = PDFManager()
+    _worker_editor_class = AdvancedPDFEditor
+
+
+def _ping():
+    return os.getpid()
+
+
+def _natural_key(path):
+    """Ordina "pagina_2" prima di "pagina_10\""""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', path)]
+
+
+def _execute_job(operation, params, output_dir):
+    """Worker: esegue un job
+
+    Returns:
+        dict con i percorsi dei file prodotti (outputs), le chiamate
+        misurate dalla strumentazione (calls), le pagine saltate
+        (failed_pages) ed eventuale errore
+    """
+    # I motori stampano i propri errori: diventano il messaggio del job
+    messages = io.StringIO()
+    with metrics.capture() as calls, contextlib.redirect_stdout(messages):
+        try:
+            ok = _dispatch(operation, params, output_dir)
+        except Exception as e:
+            ok = False
+            messages.write(str(e))
+    if not ok:
+        return {'outputs': [], 'calls': calls,
+                'error': messages.getvalue().strip() or "Operazione non riuscita"}
+    outputs = sorted((os.path.join(output_dir, name) for name in os.listdir(output_dir)),
+                     key=_natural_key)
+    failed_pages = ok.failed_pages if isinstance(ok, OperationResult) else []
+    return {'outputs': outputs, 'calls': calls, 'failed_pages': failed_pages, 'error': None}
+
+
+def _dispatch(operation, params, output_dir):
+    """Chiama il motore corrispondente all'operazione"""
+    manager = _worker_manager
+    source = params.get('input')
+    stem = os.path.splitext(os.path.basename(source))[0] if source else "merged"
+    backend = params.get('backend')
+    # Impostato dal servizio per i documenti oltre il budget di memoria
+    chunk_pages = params.get('chunk_pages')
+    skip = bool(params.get('skip_bad_pages'))
+
+    if operation == 'merge':
+        return manager.merge_pdfs(params['inputs'], os.path.join(output_dir, "merged.pdf"),
+                                  backend=backend)
+    if operation == 'split':
+        return manager.split_pdf_pages(source, output_dir, backend=backend,
+                                       chunk_pages=chunk_pages, skip_bad_pages=skip)
+    if operation == 'watermark':
+        return manager.add_watermark(source, os.path.join(output_dir, f"{stem}_watermark.pdf"),
+                                     params['text'], pages=params.get('pages'),
+                                     font_size=params.get('font_size', 50),
+                                     opacity=params.get('opacity', 0.3),
+                                     angle=params.get('angle', 45), chunk_pages=chunk_pages,
+                                     skip_bad_pages=skip)
+    if operation == 'extract':
+        return manager.extract_pages(source, os.path.join(output_dir, f"{stem}_extract.pdf"),
+                                     params['pages'], chunk_pages=chunk_pages, skip_bad_pages=skip)
+    if operation == 'extract-text':
+        return manager.extract_text(source, os.path.join(output_dir, f"{stem}.txt"),
+                                    pages=params.get('pages'), backend=backend,
+                                    chunk_pages=chunk_pages, skip_bad_pages=skip)
+
+    editor = _worker_editor_class()
+    if not editor.open_pdf(source):
+        return False
+    try:
+        if operation == 'redact':
+            for term in params.get('terms', []):
+                for page_index, rect in editor.search_text(term):
+                    if not editor.redact_text(page_index, rect):
+                        return False
+            for area in params.get('areas', []):
+                # Selezione di pagine da 1 (un intero sarebbe un indice da 0)
+                if not editor.redact_text(str(area.get('pages', 'all')), area['rect']):
+                    return False
+            # garbage rimuove dal file il contenuto redatto
+            return editor.save_pdf(os.path.join(output_dir, f"{stem}_redacted.pdf"), garbage=2)
+        if operation == 'encrypt':
+            if not editor.encrypt_pdf(params['password'], params.get('permissions'),
+                                      params.get('owner_password')):
+                return False
+            return editor.save_pdf(os.path.join(output_dir, f"{stem}_encrypted.pdf"))
+        raise ValueError(f"Operazione sconosciuta: {operation}")
+    finally:
+        editor.close_pdf()
+
+
+class ServiceError(Exception):
+    """Errore restituito dal servizio (status = codice HTTP)"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class ServiceBusy(ServiceError):
+    """Coda piena (429) o servizio in chiusura (503): riprovare più tardi"""
+
+
+class Job:
+    """Job accodato nel servizio"""
+
+    def __init__(self, operation, params, priority, output_dir):
+        self.id = uuid.uuid4().hex
+        self.operation = operation
+        self.params = params
+        self.priority = priority
+        self.output_dir = output_dir
+        self.status = 'queued'
+        self.outputs = []
+        self.failed_pages = []
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        # Piano del budget di memoria (vedi PDFJobService.submit)
+        self.reserve = 0
+        self.chunk_pages = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'operation': self.operation,
+            'priority': self.priority,
+            'status': self.status,
+            'outputs': [os.path.basename(path) for path in self.outputs],
+            'failed_pages': self.failed_pages,
+            'error': self.error,
+            'submitted': self.submitted,
+            'started': self.started,
+            'finished': self.finished,
+            'seconds': (self.finished - self.started) if self.finished and self.started else None,
+        }
+
+
+class PDFJobService:
+    """Servizio HTTP locale con coda a priorità e pool di worker pre-avviato"""
+
+    def __init__(self, host="127.0.0.1", port=0, workers=None, max_queue=64, work_dir=None,
+                 budget=None):
+        """
+        Args:
+            budget: MemoryBudget condiviso dai job (None = limiti di config.ini)
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self._own_work_dir = work_dir is None
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix="pdf_service_")
+        self.budget = budget or MemoryBudget.from_config()
+
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._queued = 0
+        self._slots = threading.Semaphore(self.workers)
+        self._stopping = False
+        self._executor = None
+        self._server = None
+        self._threads = []
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """Avvia il pool (già pronto a ricevere job), il dispatcher e il server HTTP"""
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        for future in [self._executor.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+        handler = type("PDFJobRequestHandler", (_RequestHandler,), {'service': self})
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        self._threads = [
+            threading.Thread(target=self._dispatch_loop, daemon=True),
+            threading.Thread(target=self._server.serve_forever, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Ferma il servizio: i job in esecuzione terminano, quelli in coda vengono annullati"""
+        with self._lock:
+            self._stopping = True
+        self._queue.put((float('-inf'), next(self._sequence), None))
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status == 'queued':
+                    job.status = 'cancelled'
+        if self._own_work_dir:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def submit(self, operation, params, priority=0):
+        """Accoda un job
+
+        Raises:
+            ValueError: operazione o parametri non validi
+            ServiceError: file oltre i limiti di memoria (413)
+            ServiceBusy: coda piena o servizio in chiusura
+        """
+        self._validate(operation, params)
+        sources = params['inputs'] if operation == 'merge' else [params['input']]
+        try:
+            plan = self.budget.plan(sources)
+        except BudgetExceeded as e:
+            raise ServiceError(str(e), status=413) from None
+        with self._lock:
+            if self._stopping:
+                raise ServiceBusy("Servizio in chiusura", status=503)
+            if self._queued >= self.max_queue:
+                raise ServiceBusy(f"Coda piena ({self.max_queue} job in attesa)", status=429)
+            output_dir = os.path.join(self.work_dir, uuid.uuid4().hex)
+            job = Job(operation, params, int(priority), output_dir)
+            job.reserve, job.chunk_pages = plan['reserve'], plan['chunk_pages']
+            self._jobs[job.id] = job
+            self._queued += 1
+        self._queue.put((-job.priority, next(self._sequence), job.id))
+        return job
+
+    def get_job(self, job_id):
+        return self._jobs.get(job_id)
+
+    def delete_job(self, job_id):
+        """Annulla un job in coda o elimina un job terminato con i suoi risultati"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status == 'running':
+                raise ServiceError("Job in esecuzione", status=409)
+            if job.status == 'queued':
+                job.status = 'cancelled'
+                self._queued -= 1
+            del self._jobs[job_id]
+        shutil.rmtree(job.output_dir, ignore_errors=True)
+        return job
+
+    def health(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            'status': 'stopping' if self._stopping else 'ok',
+            'workers': self.workers,
+            'max_queue': self.max_queue,
+            'queued': statuses.count('queued'),
+            'running': statuses.count('running'),
+            'done': statuses.count('done'),
+            'errors': statuses.count('error'),
+            'memory': self.budget.info(),
+        }
+
+    def _validate(self, operation, params):
+        if operation not in OPERATIONS:
+            raise ValueError(f"Operazione sconosciuta: {operation}")
+        if not isinstance(params, dict):
+            raise ValueError("params deve essere un oggetto JSON")
+        sources = params.get('inputs') if operation == 'merge' else [params.get('input')]
+        if not sources or not all(isinstance(source, str) for source in sources):
+            raise ValueError("Parametro 'input' (o 'inputs' per merge) mancante")
+        for source in sources:
+            if not os.path.isfile(source):
+                raise ValueError(f"File non trovato: {source}")
+        required = {'watermark': 'text', 'extract': 'pages', 'encrypt': 'password'}.get(operation)
+        if required and not params.get(required):
+            raise ValueError(f"Parametro '{required}' mancante")
+
+    def _dispatch_loop(self):
+        """Passa i job al pool in ordine di priorità, al massimo uno per worker"""
+        while True:
+            self._slots.acquire()
+            _, _, job_id = self._queue.get()
+            if job_id is None:
+                return
+            job = self._jobs.get(job_id)
+            # Attende che i job in esecuzione lascino memoria sufficiente
+            reserved = job.reserve if job is not None else 0
+            self.budget.reserve(reserved)
+            with self._lock:
+                if job is None or job.status != 'queued':
+                    self.budget.release(reserved)
+                    self._slots.release()
+                    continue  # Annullato mentre era in coda
+                self._queued -= 1
+                job.status = 'running'
+                job.started = time.time()
+            os.makedirs(job.output_dir, exist_ok=True)
+            params = dict(job.params, chunk_pages=job.chunk_pages)
+            future = self._executor.submit(_execute_job, job.operation, params, job.output_dir)
+            future.add_done_callback(lambda f, job=job: self._finish(job, f))
+
+    def _finish(self, job, future):
+        try:
+            result = future.result()
+            # Le misure dei worker confluiscono nelle metriche del servizio
+            for call in result['calls']:
+                metrics.record(call)
+            if result['error']:
+                raise RuntimeError(result['error'])
+            job.outputs = result['outputs']
+            job.failed_pages = result['failed_pages']
+            job.status = 'done'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'error'
+        job.finished = time.time()
+        self.budget.release(job.reserve)
+        self._slots.release()
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """Gestore HTTP del servizio (service viene impostato da PDFJobService)"""
+
+    service = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Nessun log per richiesta: il servizio può gestire migliaia di job
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self):
+        parts = [part for part in self.path.split('?')[0].split('/') if part]
+        job = None
+        if len(parts) >= 2 and parts[0] == 'jobs':
+            job = self.service.get_job(parts[1])
+        return parts, job
+
+    def do_GET(self):
+        parts, job = self._route()
+        if parts == ['health']:
+            return self._send_json(200, self.service.health())
+        if parts == ['metrics']:
+            return self._send_json(200, metrics.snapshot())
+        if len(parts) < 2 or parts[0] != 'jobs' or job is None:
+            return self._send_json(404, {'error': "Job non trovato"})
+        if len(parts) == 2:
+            return self._send_json(200, job.to_dict())
+        if parts[2] != 'result' or len(parts) > 4:
+            return self._send_json(404, {'error': "Percorso non valido"})
+        if job.status != 'done':
+            return self._send_json(409, {'error': f"Job non completato ({job.status})"})
+        index = int(parts[3]) if len(parts) == 4 and parts[3].isdigit() else 0
+        if index >= len(job.outputs):
+            return self._send_json(404, {'error': "Risultato non trovato"})
+        self._send_file(job.outputs[index])
+
+    def _send_file(self, path):
+        """Invia un file a blocchi, senza caricarlo in memoria"""
+        content_type = "application/pdf" if path.endswith(".pdf") else "text/plain; charset=utf-8"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(path)}"')
+        self.end_headers()
+        with open(path, 'rb') as f:
+            shutil.copyfileobj(f, self.wfile, CHUNK_SIZE)
+
+    def do_POST(self):
+        parts, _ = self._route()
+        if parts != ['jobs']:
+            return self._send_json(404, {'error': "Percorso non valido"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            job = self.service.submit(request.get('operation'), request.get('params', {}),
+                                      request.get('priority', 0))
+        except ServiceBusy as e:
+            return self._send_json(e.status, {'error': str(e)}, {"Retry-After": "1"})
+        except ServiceError as e:
+            return self._send_json(e.status, {'error': str(e)})
+        except (ValueError, TypeError, AttributeError) as e:
+            return self._send_json(400, {'error': str(e)})
+        self._send_json(202, job.to_dict(), {"Location": f"/jobs/{job.id}"})
+
+    def do_DELETE(self):
+        parts, job = self._route()
+        if len(parts) != 2 or job is None:
+            return self._send_json(404, {'error': "Job non trovato"})
+        try:
+            job = self.service.delete_job(job.id)
+        except ServiceError as e:
+            return self._send_json(e.status, {'error': str(e)})
+        self._send_json(200, job.to_dict())
+
+
+class PDFServiceClient:
+    """Client del servizio: invio dei job, attesa e download dei risultati"""
+
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, method, path, payload=None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        request = urllib_request.Request(self.url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib_request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib_error.HTTPError as e:
+            message = json.loads(e.read() or b"{}").get('error', str(e))
+            if e.code in (429, 503):
+                raise ServiceBusy(message, status=e.code) from None
+            raise ServiceError(message, status=e.code) from None
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def metrics(self):
+        """Contatori e istogrammi delle operazioni (vedi instrumentation)"""
+        return self._request("GET", "/metrics")
+
+    def submit(self, operation, priority=0, **params):
+        """Accoda un job; solleva ServiceBusy se il servizio applica backpressure"""
+        return self._request("POST", "/jobs", {
+            'operation': operation, 'params': params, 'priority': priority})
+
+    def status(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def wait(self, job_id, timeout=None, interval=0.05):
+        """Attende la fine del job (polling dello stato) e ne restituisce lo stato"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.status(job_id)
+            if job['status'] in ('done', 'error', 'cancelled'):
+                return job
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Job {job_id} non completato in {timeout}s")
+            time.sleep(interval)
+
+    def fetch(self, job_id, index=0, destination=None):
+        """Scarica il file index-esimo del job
+
+        Senza destination restituisce i byte; altrimenti scrive il file a
+        blocchi e ne restituisce il percorso.
+        """
+        url = f"{self.url}/jobs/{job_id}/result/{index}"
+        try:
+            with urllib_request.urlopen(url, timeout=self.timeout) as response:
+                if destination is None:
+                    return response.read()
+                with open(destination, 'wb') as f:
+                    shutil.copyfileobj(response, f, CHUNK_SIZE)
+                return destination
+        except urllib_error.HTTPError as e:
+            raise ServiceError(json.loads(e.read() or b"{}").get('error', str(e)),
+                               status=e.code) from None
+
+    def delete(self, job_id):
+        return self._request("DELETE", f"/jobs/{job_id}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servizio locale a coda di job per PDF Editor")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="processi worker (default: tutti i core)")
+    parser.add_argument('--max-queue', type=int, default=64,
+                        help="job in attesa oltre i quali si risponde 429")
+    parser.add_argument('--memory-budget', metavar='MB', type=float, default=None,
+                        help="memoria per i job in esecuzione (default: memory_budget_mb in config.ini)")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    budget = MemoryBudget.from_config()
+    if args.memory_budget:
+        budget.budget = int(args.memory_budget * 1024 * 1024)
+    service = PDFJobService(args.host, args.port, args.workers, args.max_queue, budget=budget)
+    service.start()
+    print(f"Servizio PDF in ascolto su {service.url} ({service.workers} worker)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("Arresto del servizio...")
+    finally:
+        service.stop()
+    return 0
@@ -366,7 +366,7 @@ class PDFEditor(QMainWindow):
             pages_str, ok = QInputDialog.getText(
                 self,
                 "Pagine da estrarre",
-                "Inserisci i numeri delle pagine (es: 1,3,5-8):"
+                "Inserisci le pagine (es: 1,3,5-8 oppure odd, z-1, 10-, !4):"
             )
             
             if not ok or not pages_str:
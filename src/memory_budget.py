@@ -0,0 +1,217 @@
+"""
+PDF Editor - Budget di memoria e controllo di ammissione dei job
+
+Prima di eseguire un job gli strumenti batch (pdf_batch, pdf_service)
+ne stimano il costo in memoria a partire da dimensione del file, numero
+di pagine e byte delle immagini incorporate (nel controllo di
+ammissione limitati dalla dimensione del file, senza leggerne gli
+oggetti), poi:
+  - rifiutano i file oltre max_file_size_mb (sezione [pdf] di config.ini)
+  - elaborano "a blocchi" (finestre di chunk_pages pagine, vedi
+    PDFManager) i documenti il cui costo supera da solo il budget
+  - mettono in attesa i job finché la somma dei costi in esecuzione non
+    rientra nel budget complessivo (memory_budget_mb, 0 = metà della RAM)
+
+Così un'unica scansione da 2 GB non può esaurire la memoria della
+macchina che esegue il batch.
+"""
+import configparser
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from pdf_inventory import probe_pdf
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+CONFIG_FILE = Path(__file__).parent.parent / "config.ini"
+
+DEFAULT_MAX_FILE_SIZE_MB = 500
+DEFAULT_CHUNK_PAGES = 200
+FALLBACK_MEMORY = 4 * 1024 ** 3
+
+# Modello di costo (stima prudente, pensata per pypdf che materializza il
+# documento): circa il doppio del file, più una quota fissa per pagina e
+# i byte delle immagini, che alcune operazioni devono decodificare
+FILE_FACTOR = 2.0
+PAGE_OVERHEAD = 32 * 1024
+BASE_COST = 64 * 1024 * 1024
+
+
+class BudgetExceeded(Exception):
+    """Il job non può essere eseguito entro i limiti configurati"""
+
+
+def physical_memory():
+    """RAM fisica della macchina in byte (None se non determinabile)"""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def load_limits(config_path=None):
+    """Limiti dalla sezione [pdf] di config.ini
+
+    Returns:
+        dict con max_file_size (byte), budget (byte) e chunk_pages
+    """
+    parser = configparser.ConfigParser()
+    parser.read(config_path or CONFIG_FILE, encoding='utf-8')
+    section = parser['pdf'] if parser.has_section('pdf') else {}
+    max_file_size_mb = float(section.get('max_file_size_mb', DEFAULT_MAX_FILE_SIZE_MB))
+    budget_mb = float(section.get('memory_budget_mb', 0))
+    if budget_mb > 0:
+        budget = int(budget_mb * 1024 * 1024)
+    else:
+        budget = (physical_memory() or FALLBACK_MEMORY) // 2
+    return {
+        'max_file_size': int(max_file_size_mb * 1024 * 1024),
+        'budget': budget,
+        'chunk_pages': int(section.get('chunk_pages', DEFAULT_CHUNK_PAGES)),
+    }
+
+
+def image_bytes(pdf_file):
+    """Byte (compressi) degli stream immagine del PDF, senza decodificarli"""
+    if fitz is None:
+        return 0
+    total = 0
+    with fitz.open(pdf_file) as doc:
+        for xref in range(1, doc.xref_length()):
+            if doc.xref_get_key(xref, "Subtype") != ('name', '/Image'):
+                continue
+            kind, length = doc.xref_get_key(xref, "Length")
+            if kind == 'int':
+                total += int(length)
+    return total
+
+
+@lru_cache(maxsize=4096)
+def _page_count(pdf_file, mtime, size):
+    """Pagine del PDF lette dal trailer; riusate finché il file non cambia"""
+    return probe_pdf(pdf_file).get('num_pages') or 0
+
+
+def estimate_cost(pdf_files, scan_images=True):
+    """Stima della memoria necessaria per elaborare i file indicati
+
+    Args:
+        scan_images: se False i byte delle immagini non vengono misurati
+            (lettura di tutti gli oggetti del file) ma stimati pari alla
+            dimensione del file, che ne è il limite superiore: è la stima
+            usata dal controllo di ammissione, che valuta un job alla volta
+
+    Returns:
+        dict con file_size, num_pages, image_bytes e estimated (byte)
+    """
+    if isinstance(pdf_files, (str, os.PathLike)):
+        pdf_files = [pdf_files]
+    cost = {'file_size': 0, 'num_pages': 0, 'image_bytes': 0}
+    for pdf_file in pdf_files:
+        stat = os.stat(pdf_file)
+        cost['file_size'] += stat.st_size
+        if str(pdf_file).lower().endswith('.pdf'):
+            try:
+                num_pages = _page_count(os.path.abspath(pdf_file), stat.st_mtime, stat.st_size)
+                images = image_bytes(pdf_file) if scan_images else stat.st_size
+            except Exception:
+                # File danneggiato: il costo resta stimato dalla sola dimensione
+                # (l'errore verrà riportato dall'operazione)
+                continue
+            cost['num_pages'] += num_pages
+            cost['image_bytes'] += images
+    cost['estimated'] = int(BASE_COST + cost['file_size'] * FILE_FACTOR
+                            + cost['num_pages'] * PAGE_OVERHEAD + cost['image_bytes'])
+    return cost
+
+
+class MemoryBudget:
+    """Budget di memoria condiviso tra i job in esecuzione"""
+
+    def __init__(self, budget=None, max_file_size=None, chunk_pages=DEFAULT_CHUNK_PAGES):
+        """
+        Args:
+            budget: byte disponibili per i job contemporanei
+                (None = metà della RAM fisica)
+            max_file_size: dimensione massima di un file in byte
+                (None = nessun limite)
+            chunk_pages: pagine per finestra nella modalità a blocchi
+        """
+        self.budget = budget or (physical_memory() or FALLBACK_MEMORY) // 2
+        self.max_file_size = max_file_size
+        self.chunk_pages = chunk_pages
+        self.in_use = 0
+        self._condition = threading.Condition()
+
+    @classmethod
+    def from_config(cls, config_path=None):
+        limits = load_limits(config_path)
+        return cls(limits['budget'], limits['max_file_size'], limits['chunk_pages'])
+
+    def plan(self, input_files):
+        """Decide come eseguire un job sui file indicati
+
+        La stima usa solo dimensione e numero di pagine (vedi estimate_cost
+        con scan_images=False): viene calcolata prima di ogni job, nel
+        ciclo che li distribuisce ai worker.
+
+        Returns:
+            dict con cost (stima, vedi estimate_cost), chunk_pages (None o
+            pagine per finestra) e reserve (byte da riservare nel budget)
+
+        Raises:
+            BudgetExceeded: file oltre max_file_size o job che non rientra
+                nel budget neanche a blocchi
+        """
+        if self.max_file_size:
+            for path in input_files:
+                size = os.path.getsize(path)
+                if size > self.max_file_size:
+                    raise BudgetExceeded(
+                        f"{os.path.basename(path)}: {size / 1024 ** 2:.0f} MB, oltre il limite di "
+                        f"{self.max_file_size / 1024 ** 2:.0f} MB (max_file_size_mb)")
+
+        cost = estimate_cost(input_files, scan_images=False)
+        reserve, chunk_pages = cost['estimated'], None
+        if reserve > self.budget and cost['num_pages'] > self.chunk_pages:
+            # A blocchi resta in memoria una finestra di pagine alla volta
+            chunk_pages = self.chunk_pages
+            fraction = chunk_pages / cost['num_pages']
+            reserve = int(BASE_COST + (reserve - BASE_COST) * fraction)
+        if reserve > self.budget:
+            raise BudgetExceeded(
+                f"Memoria stimata {reserve / 1024 ** 2:.0f} MB, oltre il budget di "
+                f"{self.budget / 1024 ** 2:.0f} MB")
+        return {'cost': cost, 'chunk_pages': chunk_pages, 'reserve': reserve}
+
+    def reserve(self, amount, block=True, timeout=None):
+        """Riserva amount byte; con block=True attende che si liberino
+
+        Returns:
+            True se la memoria è stata riservata
+        """
+        amount = min(amount, self.budget)
+        with self._condition:
+            if not block:
+                if self.in_use + amount > self.budget:
+                    return False
+            elif not self._condition.wait_for(lambda: self.in_use + amount <= self.budget,
+                                              timeout):
+                return False
+            self.in_use += amount
+            return True
+
+    def release(self, amount):
+        amount = min(amount, self.budget)
+        with self._condition:
+            self.in_use = max(self.in_use - amount, 0)
+            self._condition.notify_all()
+
+    def info(self):
+        return {'budget': self.budget, 'in_use': self.in_use,
+                'max_file_size': self.max_file_size, 'chunk_pages': self.chunk_pages}
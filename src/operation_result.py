@@ -0,0 +1,118 @@
+"""
+PDF Editor - Esito pagina per pagina delle operazioni
+
+Le operazioni pagina per pagina di PDFManager (divisione, rotazione,
+estrazione di pagine e testo, watermark) restituiscono un
+OperationResult: per ogni pagina stato, tempo ed eventuale errore.
+
+Per default la prima pagina che fallisce interrompe l'operazione, come
+prima. Con skip_bad_pages=True la pagina viene registrata come fallita,
+esclusa dall'output e l'elaborazione prosegue: l'output contiene tutto
+ciò che è riuscito e failed_pages indica le sole pagine da rielaborare.
+
+Il risultato è vero se l'operazione è arrivata in fondo (anche con
+pagine saltate): il codice che controlla "if manager.rotate_pdf(...)"
+continua a funzionare.
+"""
+import contextlib
+import time
+
+
+class OperationResult:
+    """Esito di un'operazione con il dettaglio delle pagine elaborate"""
+
+    def __init__(self, operation=None, skip_bad_pages=False):
+        self.operation = operation
+        self.skip_bad_pages = skip_bad_pages
+        self.pages = []     # dict per pagina: page (da 1), status, seconds, error
+        self.error = None   # errore che ha interrotto l'operazione
+        self.cached = False
+
+    @contextlib.contextmanager
+    def page(self, page_num):
+        """Elabora una pagina registrandone esito e tempo
+
+        Con skip_bad_pages l'eccezione viene registrata e non si propaga.
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.pages.append({'page': page_num, 'status': 'error',
+                               'seconds': time.perf_counter() - start_time,
+                               'error': f"{type(e).__name__}: {e}"})
+            if not self.skip_bad_pages:
+                raise
+        else:
+            self.pages.append({'page': page_num, 'status': 'ok',
+                               'seconds': time.perf_counter() - start_time})
+
+    def record_pages(self, page_nums, seconds=0.0):
+        """Registra come elaborate pagine eseguite in un'unica passata
+
+        Per le modalità che non elaborano una pagina alla volta (a blocchi,
+        aggiornamento incrementale): il tempo viene diviso in parti uguali.
+        """
+        page_nums = list(page_nums)
+        for page_num in page_nums:
+            self.pages.append({'page': page_num, 'status': 'ok',
+                               'seconds': seconds / len(page_nums)})
+
+    def fail(self, error):
+        """Registra l'errore che ha interrotto l'operazione"""
+        self.error = str(error)
+        return self
+
+    @property
+    def status(self):
+        """"ok", "partial" (pagine saltate) o "error" (operazione interrotta)"""
+        if self.error is not None:
+            return 'error'
+        return 'partial' if self.failed_pages else 'ok'
+
+    @property
+    def ok(self):
+        return self.status == 'ok'
+
+    @property
+    def failed_pages(self):
+        return sorted(entry['page'] for entry in self.pages if entry['status'] == 'error')
+
+    @property
+    def completed_pages(self):
+        return sorted(entry['page'] for entry in self.pages if entry['status'] == 'ok')
+
+    @property
+    def seconds(self):
+        return sum(entry['seconds'] for entry in self.pages)
+
+    def page_errors(self):
+        """{numero pagina: errore} delle pagine fallite"""
+        return {entry['page']: entry['error'] for entry in self.pages if entry['status'] == 'error'}
+
+    def summary(self):
+        """Descrizione breve dell'esito, per log e messaggi"""
+        if self.error is not None:
+            return self.error
+        failed = self.failed_pages
+        if not failed:
+            return f"{len(self.pages)} pagine elaborate"
+        return (f"{len(self.pages) - len(failed)} pagine elaborate, "
+                f"{len(failed)} saltate ({', '.join(map(str, failed))})")
+
+    def to_dict(self):
+        return {'operation': self.operation, 'status': self.status, 'error': self.error,
+                'failed_pages': self.failed_pages, 'pages': self.pages}
+
+    @classmethod
+    def from_dict(cls, data):
+        result = cls(data.get('operation'))
+        result.pages = [dict(entry) for entry in data.get('pages', [])]
+        result.error = data.get('error')
+        return result
+
+    def __bool__(self):
+        return self.error is None
+
+    def __repr__(self):
+        return f"<OperationResult {self.operation} {self.status}: {self.summary()}>"
@@ -0,0 +1,378 @@
+"""
+PDF Editor - Render delle pagine in background per l'interfaccia
+
+PyMuPDF non rilascia il GIL durante il render: un thread non basta a
+tenere reattiva l'interfaccia mentre si rasterizza una pagina vettoriale
+pesante. PageRenderer esegue i render in un pool di processi, avviato
+alla prima richiesta, che apre il documento dal file originale.
+
+Il render richiesto e le pagine vicine (N±1, N±2 allo stesso zoom)
+finiscono nella RenderCache dell'editor; il segnale page_ready avvisa
+l'interfaccia, che li mostra con get_page_pixmap senza attendere. Con
+preview=True prima del render della pagina viene messa in coda la sua
+anteprima veloce (segnale preview_ready, vedi get_page_preview).
+Cambiando pagina le richieste ancora in coda che non servono più
+vengono annullate. Lo stesso pool crea le miniature del pannello
+laterale (request_thumbnail, vedi thumbnail_model) e, agli zoom elevati,
+i riquadri delle pagine (request_tiles, segnale tile_ready).
+
+Le pagine modificate dopo l'apertura non sono nel file: vengono
+renderizzate in questo processo dal documento in memoria (e non
+preparate in anticipo), senza riscrivere l'intero documento per il pool.
+
+Negli eseguibili creati con PyInstaller il punto di ingresso deve
+chiamare multiprocessing.freeze_support() prima di ogni altra cosa.
+
+Uso:
+    renderer = PageRenderer(editor, parent=window)
+    renderer.page_ready.connect(on_page_ready)
+    if renderer.request(page_num, zoom):
+        ...  # già in cache: mostra subito
+"""
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz
+from PySide6.QtCore import QObject, Signal
+
+from advanced_pdf_editor import TILE_SIZE, render_preview, tile_clip
+
+# Documenti aperti e DisplayList delle pagine a riquadri tenuti in ogni processo del pool
+MAX_OPEN_DOCUMENTS = 2
+MAX_DISPLAY_LISTS = 2
+
+_documents = OrderedDict()
+_display_lists = OrderedDict()
+
+
+def _open_document(document_id, path):
+    """Documento aperto nel processo; riusato dalle richieste successive"""
+    key = (document_id, path)
+    document = _documents.get(key)
+    if document is None:
+        document = _documents[key] = fitz.open(path)
+        while len(_documents) > MAX_OPEN_DOCUMENTS:
+            closed, old = _documents.popitem(last=False)
+            for list_key in [list_key for list_key in _display_lists if list_key[:2] == closed]:
+                del _display_lists[list_key]
+            old.close()
+    else:
+        _documents.move_to_end(key)
+    return document
+
+
+def _pixmap_data(pix):
+    """Dati del pixmap da passare all'interfaccia: (componenti, x, y, larghezza, altezza, pixel)"""
+    return pix.n, pix.x, pix.y, pix.width, pix.height, pix.samples
+
+
+def _render_page(document_id, path, page_index, zoom):
+    """Processo del pool: render RGB della pagina (vedi _pixmap_data)"""
+    pix = _open_document(document_id, path)[page_index].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    return _pixmap_data(pix)
+
+
+def _render_preview(document_id, path, page_index, zoom, scale, grayscale, antialias):
+    """Processo del pool: anteprima veloce della pagina, come _render_page"""
+    pix = render_preview(_open_document(document_id, path)[page_index], zoom, scale, grayscale,
+                         antialias)
+    return _pixmap_data(pix)
+
+
+def _render_tile(document_id, path, page_index, zoom, column, row, tile_size):
+    """Processo del pool: riquadro della pagina, come get_page_tile; la DisplayList
+    della pagina viene riusata per i riquadri successivi"""
+    key = (document_id, path, page_index)
+    display_list = _display_lists.get(key)
+    if display_list is None:
+        page = _open_document(document_id, path)[page_index]
+        display_list = _display_lists[key] = page.get_displaylist()
+        while len(_display_lists) > MAX_DISPLAY_LISTS:
+            _display_lists.popitem(last=False)
+    else:
+        _display_lists.move_to_end(key)
+    pix = display_list.get_pixmap(matrix=fitz.Matrix(zoom, zoom),
+                                  clip=tile_clip(zoom, column, row, tile_size))
+    return _pixmap_data(pix)
+
+
+def _pixmap(data):
+    """fitz.Pixmap ricostruito dai dati di _pixmap_data"""
+    components, x, y, width, height, samples = data
+    pix = fitz.Pixmap(fitz.csGRAY if components == 1 else fitz.csRGB, width, height, samples, 0)
+    pix.set_origin(x, y)
+    return pix
+
+
+def thumbnail_png(document, page_index, width):
+    """Miniatura PNG della pagina, larga width pixel"""
+    page = document[page_index]
+    zoom = width / page.rect.width
+    return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes("png")
+
+
+def _render_thumbnail(document_id, path, page_index, width):
+    """Processo del pool: miniatura PNG della pagina"""
+    return thumbnail_png(_open_document(document_id, path), page_index, width)
+
+
+class PageRenderer(QObject):
+    """Pool di processi che renderizza le pagine di un AdvancedPDFEditor"""
+
+    page_ready = Signal(int, float)        # pagina (da 0), zoom: render in cache
+    preview_ready = Signal(int, float)     # pagina (da 0), zoom: anteprima in cache
+    page_failed = Signal(int, float, str)  # pagina (da 0), zoom, errore
+    thumbnail_ready = Signal(object, int, bytes)  # chiave del render, pagina (da 0), PNG
+    tile_ready = Signal(int, float, int, int)      # pagina (da 0), zoom, colonna, riga
+    _finished = Signal(object, int, float, bool, object)
+    _thumbnail_finished = Signal(object, int, object)
+    _tile_finished = Signal(object, int, float, int, int, object)
+
+    def __init__(self, editor, workers=2, prefetch=2, executor=None, parent=None):
+        """
+        Args:
+            editor: AdvancedPDFEditor di cui renderizzare le pagine
+            workers: processi del pool
+            prefetch: pagine vicine da preparare prima e dopo quella richiesta
+            executor: Executor da usare al posto del pool di processi (es. nei test)
+        """
+        super().__init__(parent)
+        self.editor = editor
+        self.workers = workers
+        self.prefetch = prefetch
+        self._pending = {}  # chiave del render -> future
+        self._thumbnails_pending = {}
+        self._tiles_pending = {}
+        self._executor = executor  # Se None creato alla prima richiesta (vedi _pool)
+        self._broken = False
+        self._finished.connect(self._on_finished)
+        self._thumbnail_finished.connect(self._on_thumbnail_finished)
+        self._tile_finished.connect(self._on_tile_finished)
+
+    def request(self, page_num, zoom, preview=False):
+        """Richiede il render di una pagina e prepara le vicine
+
+        Restituisce True se il render è già in cache (da mostrare subito);
+        altrimenti page_ready verrà emesso quando è pronto. Con preview=True
+        l'anteprima veloce della pagina viene renderizzata per prima
+        (preview_ready). Le richieste in coda per pagine diverse da queste
+        vengono annullate. Una pagina modificata viene renderizzata subito
+        in questo processo; le vicine modificate non vengono preparate.
+        """
+        editor = self.editor
+        if not editor.current_doc:
+            return False
+        if editor.current_doc.needs_pass or self._broken:
+            # Il pool non può aprire un documento cifrato (o non è più
+            # utilizzabile): render in questo processo
+            return editor.get_page_pixmap(page_num, zoom) is not None
+        page_count = len(editor.current_doc)
+        wanted = [page_num]
+        for distance in range(1, self.prefetch + 1):
+            wanted += [page_num + distance, page_num - distance]
+        # (chiave, pagina, funzione del pool, argomenti dopo la pagina, anteprima)
+        jobs = [(editor.render_key('pixmap', index, zoom), index, _render_page, (zoom,), False)
+                for index in wanted if 0 <= index < page_count]
+        if preview and jobs[0][0] not in editor.render_cache:
+            options = editor.preview_options()
+            # In coda prima del render definitivo: il pool esegue le richieste in ordine
+            jobs.insert(0, (editor.render_key(('preview',) + options, page_num, zoom), page_num,
+                            _render_preview, (zoom,) + options, True))
+
+        keys = {job[0] for job in jobs}
+        for key, future in list(self._pending.items()):
+            if key not in keys and future.cancel():
+                self._pending.pop(key, None)
+
+        for key, index, function, arguments, is_preview in jobs:
+            if key in editor.render_cache or key in self._pending:
+                continue
+            source = editor.page_source(index)
+            if source is None:
+                # Pagina modificata: solo quella richiesta, dal documento in memoria
+                if index == page_num and not is_preview:
+                    editor.get_page_pixmap(page_num, zoom)
+                continue
+            try:
+                self._submit(function, source + (index,) + arguments, key, index, zoom, is_preview)
+            except BrokenProcessPool as e:
+                print(f"Errore nel pool dei render, render nell'interfaccia: {e}")
+                self._broken = True
+                return editor.get_page_pixmap(page_num, zoom) is not None
+        return editor.render_key('pixmap', page_num, zoom) in editor.render_cache
+
+    def pending(self):
+        """Pagine in coda o in render (anche solo l'anteprima), come (pagina, zoom)"""
+        return sorted({(key[1], key[2]) for key in self._pending})
+
+    def request_thumbnail(self, page_num, width):
+        """Richiede la miniatura PNG di una pagina
+
+        Il risultato arriva con thumbnail_ready; se il pool non è
+        utilizzabile o la pagina è stata modificata la miniatura viene
+        creata subito e restituita.
+        """
+        editor = self.editor
+        if not editor.current_doc:
+            return None
+        source = editor.page_source(page_num)
+        if editor.current_doc.needs_pass or self._broken or source is None:
+            return thumbnail_png(editor.current_doc, page_num, width)
+        key = editor.render_key(('thumbnail', width), page_num, 0)
+        if key in self._thumbnails_pending:
+            return None
+        try:
+            future = self._pool().submit(_render_thumbnail, *source, page_num, width)
+        except BrokenProcessPool as e:
+            print(f"Errore nel pool dei render, render nell'interfaccia: {e}")
+            self._broken = True
+            return thumbnail_png(editor.current_doc, page_num, width)
+        self._thumbnails_pending[key] = future
+        future.add_done_callback(lambda f: self._notify_thumbnail(key, page_num, f))
+        return None
+
+    def cancel_thumbnails(self, keep_pages=()):
+        """Annulla le miniature in coda delle pagine non in keep_pages (es. non più visibili)"""
+        keep_pages = set(keep_pages)
+        for key, future in list(self._thumbnails_pending.items()):
+            if key[1] not in keep_pages and future.cancel():
+                self._thumbnails_pending.pop(key, None)
+
+    def pending_thumbnails(self):
+        """Pagine con la miniatura in coda o in render"""
+        return sorted(key[1] for key in self._thumbnails_pending)
+
+    def request_tiles(self, page_num, zoom, visible, margin=(), tile_size=TILE_SIZE):
+        """Richiede i riquadri (colonna, riga) di una pagina a riquadri
+
+        I riquadri visibili vengono renderizzati per primi, poi quelli del
+        margine attorno; ognuno, quando è in cache, viene annunciato da
+        tile_ready (vedi get_page_tile con render=False). Le richieste in
+        coda per altri riquadri vengono annullate. Per una pagina
+        modificata i riquadri visibili vengono renderizzati subito in
+        questo processo e quelli del margine non vengono preparati.
+        """
+        editor = self.editor
+        if not editor.current_doc:
+            return
+        jobs = [(editor.render_key(('tile', column, row, tile_size), page_num, zoom), column, row,
+                 True) for column, row in visible]
+        jobs += [(editor.render_key(('tile', column, row, tile_size), page_num, zoom), column, row,
+                  False) for column, row in margin]
+
+        keys = {job[0] for job in jobs}
+        for key, future in list(self._tiles_pending.items()):
+            if key not in keys and future.cancel():
+                self._tiles_pending.pop(key, None)
+
+        source = None
+        if not editor.current_doc.needs_pass and not self._broken:
+            source = editor.page_source(page_num)
+        for key, column, row, is_visible in jobs:
+            if key in editor.render_cache or key in self._tiles_pending:
+                continue
+            if source is not None:
+                try:
+                    future = self._pool().submit(_render_tile, *source, page_num, key[2], column,
+                                                 row, tile_size)
+                except BrokenProcessPool as e:
+                    print(f"Errore nel pool dei render, render nell'interfaccia: {e}")
+                    self._broken = True
+                    source = None
+                else:
+                    self._tiles_pending[key] = future
+                    future.add_done_callback(
+                        lambda f, key=key, column=column, row=row:
+                        self._notify_tile(key, page_num, zoom, column, row, f))
+                    continue
+            # Pagina modificata (o pool non utilizzabile): solo i visibili, in questo processo
+            if is_visible and editor.get_page_tile(page_num, zoom, column, row, tile_size):
+                self.tile_ready.emit(page_num, zoom, column, row)
+
+    def pending_tiles(self):
+        """Riquadri in coda o in render, come (pagina, colonna, riga)"""
+        return sorted((key[1], key[5][1], key[5][2]) for key in self._tiles_pending)
+
+    def _notify_tile(self, key, page_num, zoom, column, row, future):
+        try:
+            self._tile_finished.emit(key, page_num, zoom, column, row, future)
+        except RuntimeError:
+            pass  # Renderer già distrutto
+
+    def _on_tile_finished(self, key, page_num, zoom, column, row, future):
+        if self._tiles_pending.get(key) is future:
+            del self._tiles_pending[key]
+        if future.cancelled():
+            return
+        try:
+            pix = _pixmap(future.result())
+        except Exception as e:
+            print(f"Errore nel riquadro ({column}, {row}) della pagina {page_num + 1}: {e}")
+            return
+        self.editor.render_cache.put(key, pix)
+        self.tile_ready.emit(page_num, zoom, column, row)
+
+    def _notify_thumbnail(self, key, page_num, future):
+        try:
+            self._thumbnail_finished.emit(key, page_num, future)
+        except RuntimeError:
+            pass  # Renderer già distrutto
+
+    def _on_thumbnail_finished(self, key, page_num, future):
+        if self._thumbnails_pending.get(key) is future:
+            del self._thumbnails_pending[key]
+        if future.cancelled():
+            return
+        try:
+            png = future.result()
+        except Exception as e:
+            print(f"Errore nella miniatura della pagina {page_num + 1}: {e}")
+            return
+        self.thumbnail_ready.emit(key, page_num, png)
+
+    def _pool(self):
+        """Pool dei render, avviato alla prima richiesta"""
+        if self._executor is None:
+            # spawn: un fork del processo con Qt avviato non è sicuro
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _submit(self, function, arguments, key, page_num, zoom, preview):
+        future = self._pool().submit(function, *arguments)
+        self._pending[key] = future
+        future.add_done_callback(lambda f: self._notify(key, page_num, zoom, preview, f))
+
+    def _notify(self, key, page_num, zoom, preview, future):
+        """Thread del pool: passa il risultato al thread dell'interfaccia"""
+        try:
+            self._finished.emit(key, page_num, zoom, preview, future)
+        except RuntimeError:
+            pass  # Renderer già distrutto
+
+    def _on_finished(self, key, page_num, zoom, preview, future):
+        if self._pending.get(key) is future:
+            del self._pending[key]
+        if future.cancelled():
+            return
+        try:
+            pix = _pixmap(future.result())
+        except Exception as e:
+            if not preview:  # Senza anteprima si attende comunque il render definitivo
+                self.page_failed.emit(page_num, zoom, str(e))
+            return
+        # Chiave calcolata alla richiesta: se nel frattempo la pagina è
+        # cambiata il render resta in cache sotto una chiave non più usata
+        self.editor.render_cache.put(key, pix)
+        (self.preview_ready if preview else self.page_ready).emit(page_num, zoom)
+
+    def shutdown(self):
+        """Annulla le richieste in coda e chiude il pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self._pending.clear()
+        self._thumbnails_pending.clear()
+        self._tiles_pending.clear()
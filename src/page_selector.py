@@ -0,0 +1,187 @@
+"""
+PDF Editor - Selezione delle pagine
+
+Compila espressioni come "1,3,5-8", "odd", "z-1", "-5..", "1-z:2,!4"
+in una lista di progressioni aritmetiche: test di appartenenza e
+iterazione costano O(intervalli), senza mai espandere l'elenco delle pagine.
+
+Sintassi (elementi separati da virgola, numeri di pagina da 1):
+    7           pagina singola
+    5-8, 5..8   intervallo; "10-" / "10.." fino all'ultima pagina
+    z, last     ultima pagina; "-3" = terzultima
+    z-1         intervallo discendente (ordine inverso)
+    -5..        ultime cinque pagine
+    1-z:2       intervallo con passo
+    odd, even   pagine dispari / pari
+    all, *      tutte le pagine
+    !4, !odd    esclusione (se ci sono solo esclusioni si parte da tutte)
+"""
+import re
+
+_BOUND = r"(?:z|last|-?\d+)"
+_RANGE_RE = re.compile(
+    rf"^(?P<start>{_BOUND})(?:(?P<sep>\.\.|-)(?P<end>{_BOUND})?)?(?::(?P<step>\d+))?$")
+_KEYWORD_RE = re.compile(r"^(?P<keyword>all|\*|odd|even)(?::(?P<step>\d+))?$")
+
+
+class PageSelector:
+    """Espressione di selezione pagine compilata, indipendente dal documento"""
+
+    def __init__(self, expression):
+        self.expression = str(expression).strip()
+        self._terms = self._compile(self.expression)
+
+    def __repr__(self):
+        return f"PageSelector({self.expression!r})"
+
+    def __str__(self):
+        return self.expression
+
+    @classmethod
+    def coerce(cls, value):
+        """Converte None, int, stringhe, range e liste di int in un PageSelector
+
+        Interi, range e liste di interi sono numeri di pagina da 1, come
+        nelle stringhe. AdvancedPDFEditor, che indica le pagine con indici
+        da 0, accetta un intero singolo come indice e rifiuta liste e range
+        (vedi AdvancedPDFEditor._page_indices).
+        """
+        if isinstance(value, PageSelector):
+            return value
+        if isinstance(value, PageSelection):
+            return value.selector
+        if value is None:
+            return cls("all")
+        if isinstance(value, int):
+            return cls(str(value))
+        if isinstance(value, range):
+            if len(value) == 0:
+                return cls("!all")
+            if value.step > 0:
+                last = value.start + (len(value) - 1) * value.step
+            else:
+                last = value.start - (len(value) - 1) * -value.step
+            return cls(f"{value.start}..{last}:{abs(value.step)}")
+        if isinstance(value, str):
+            return cls(value)
+        return cls(",".join(str(int(page)) for page in value) or "!all")
+
+    def bind(self, num_pages):
+        """Risolve l'espressione per un documento di num_pages pagine"""
+        return PageSelection(self, num_pages)
+
+    def _compile(self, expression):
+        terms = []
+        for part in expression.lower().split(','):
+            part = part.strip()
+            if not part:
+                continue
+            include = not part.startswith('!')
+            body = part.lstrip('!').strip()
+
+            keyword_match = _KEYWORD_RE.match(body)
+            range_match = _RANGE_RE.match(body) if not keyword_match else None
+            if keyword_match:
+                keyword = keyword_match.group('keyword')
+                first = '2' if keyword == 'even' else '1'
+                step = 2 if keyword in ('odd', 'even') else 1
+                step *= int(keyword_match.group('step') or 1)
+                terms.append((include, first, 'z', step))
+            elif range_match:
+                start = range_match.group('start')
+                if range_match.group('sep') is None:
+                    end = start
+                else:
+                    end = range_match.group('end') or 'z'
+                step = int(range_match.group('step') or 1)
+                terms.append((include, start, end, step))
+            else:
+                raise ValueError(f"Selezione pagine non valida: '{part}'")
+
+            if terms[-1][3] < 1:
+                raise ValueError(f"Passo non valido in '{part}'")
+        return terms
+
+
+class PageSelection:
+    """Selezione risolta su un numero di pagine noto
+
+    Ogni termine è una progressione (primo, ultimo, passo) con passo
+    negativo per gli intervalli discendenti.
+    """
+
+    def __init__(self, selector, num_pages):
+        self.selector = selector
+        self.num_pages = num_pages
+        self._include = []
+        self._exclude = []
+        for include, start, end, step in selector._terms:
+            progression = self._resolve(start, end, step)
+            if progression is not None:
+                (self._include if include else self._exclude).append(progression)
+        if not any(term[0] for term in selector._terms):
+            # Solo esclusioni: si parte dall'intero documento
+            all_pages = self._resolve('1', 'z', 1)
+            if all_pages is not None:
+                self._include.append(all_pages)
+
+    def __repr__(self):
+        return f"PageSelection({self.selector.expression!r}, num_pages={self.num_pages})"
+
+    def _bound(self, token):
+        if token in ('z', 'last'):
+            return self.num_pages
+        value = int(token)
+        return self.num_pages + 1 + value if value < 0 else value
+
+    def _resolve(self, start, end, step):
+        first, last = self._bound(start), self._bound(end)
+        if first <= last:
+            if first < 1:
+                # Allinea al passo il primo elemento dentro il documento
+                first += -(-(1 - first) // step) * step
+            last = min(last, self.num_pages)
+            if first > last:
+                return None
+            last -= (last - first) % step
+            return (first, last, step)
+        if first > self.num_pages:
+            first -= -(-(first - self.num_pages) // step) * step
+        last = max(last, 1)
+        if first < last:
+            return None
+        last += (first - last) % step
+        return (first, last, -step)
+
+    @staticmethod
+    def _in_progression(page, progression):
+        first, last, step = progression
+        low, high = (first, last) if step > 0 else (last, first)
+        return low <= page <= high and (page - first) % step == 0
+
+    def __contains__(self, page):
+        return (any(self._in_progression(page, term) for term in self._include)
+                and not any(self._in_progression(page, term) for term in self._exclude))
+
+    def __iter__(self):
+        """Pagine (da 1) nell'ordine dell'espressione, senza duplicati"""
+        for index, (first, last, step) in enumerate(self._include):
+            earlier = self._include[:index]
+            for page in range(first, last + (1 if step > 0 else -1), step):
+                if any(self._in_progression(page, term) for term in self._exclude):
+                    continue
+                if any(self._in_progression(page, term) for term in earlier):
+                    continue
+                yield page
+
+    def indices(self):
+        """Indici di pagina (da 0) nell'ordine dell'espressione"""
+        return (page - 1 for page in self)
+
+    def count(self):
+        """Numero di pagine selezionate (richiede una scansione della selezione)"""
+        return sum(1 for _ in self)
+
+    def intervals(self):
+        """Progressioni incluse come tuple (primo, ultimo, passo)"""
+        return list(self._include)
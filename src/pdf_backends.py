@@ -0,0 +1,387 @@
+"""
+PDF Editor - Motori PDF intercambiabili
+
+PDFManager esegue unione, divisione, rotazione ed estrazione del testo
+tramite un backend: PypdfBackend (puro Python, sempre disponibile) o
+PyMuPDFBackend (fitz, molto più veloce sui file grandi). I due motori
+producono documenti equivalenti: stesse pagine, stesso contenuto,
+stessa rotazione.
+
+Con backend "auto" la scelta avviene per operazione e dimensione dei
+file in base alla tabella di calibrazione scritta da
+benchmarks/bench_backends.py --save in
+~/.pdf_editor_pro/backend_calibration.json. Finché la macchina non è
+stata calibrata "auto" usa pypdf, il motore storico di PDFManager.
+"""
+import functools
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from pypdf import PdfReader, PdfWriter
+
+from operation_result import OperationResult
+from page_selector import PageSelector
+from pdf_stream_writer import StreamingPDFWriter
+
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+OPERATIONS = ('merge', 'split', 'rotate', 'text')
+
+CALIBRATION_FILE = Path.home() / ".pdf_editor_pro" / "backend_calibration.json"
+
+# Per ogni operazione: lista di [dimensione massima in byte (None = senza
+# limite), backend]. Senza calibrazione resta pypdf a ogni dimensione: il
+# cambio di motore avviene solo dopo aver misurato la macchina.
+DEFAULT_CALIBRATION = {operation: [[None, 'pypdf']] for operation in OPERATIONS}
+
+
+def rotation_plan(rotation_angle, pages, num_pages):
+    """Restituisce una funzione numero pagina -> angolo da applicare
+
+    rotation_angle è un angolo (applicato alle pagine in pages, None =
+    tutte) oppure un dict {numero pagina: angolo}.
+    """
+    if isinstance(rotation_angle, dict):
+        angles = {int(page): int(angle) for page, angle in rotation_angle.items()}
+    else:
+        angles = None
+        rotation_angle = int(rotation_angle)
+        selected = None if pages is None else PageSelector.coerce(pages).bind(num_pages)
+
+    for angle in (angles.values() if angles is not None else [rotation_angle]):
+        if angle % 90 != 0:
+            raise ValueError("L'angolo di rotazione deve essere un multiplo di 90")
+
+    def angle_for_page(page_number):
+        if angles is not None:
+            return angles.get(page_number, 0)
+        if selected is None or page_number in selected:
+            return rotation_angle
+        return 0
+
+    return angle_for_page
+
+
+class PDFBackend:
+    """Interfaccia comune dei motori PDF
+
+    Le operazioni pagina per pagina (divisione, testo) si basano su
+    open/write_page/page_text, usati anche dai processi worker di
+    PDFManager: la modalità parallela produce gli stessi file di quella
+    seriale con lo stesso motore.
+    """
+
+    name = None
+
+    def open(self, pdf_file):
+        """Apre un documento in lettura"""
+        raise NotImplementedError
+
+    def close(self, document):
+        """Chiude un documento aperto con open"""
+
+    def page_count(self, document):
+        raise NotImplementedError
+
+    def write_page(self, document, page_index, output_path):
+        """Scrive una pagina (indice da 0) in un nuovo file PDF"""
+        raise NotImplementedError
+
+    def page_text(self, document, page_index):
+        """Testo di una pagina (indice da 0)"""
+        raise NotImplementedError
+
+    def merge(self, pdf_files, output_path):
+        """Unisce i PDF nell'ordine indicato"""
+        raise NotImplementedError
+
+    def rotate(self, pdf_file, output_path, rotation_angle, pages=None, result=None):
+        """Ruota le pagine (vedi rotation_plan per rotation_angle e pages)
+
+        Con result (OperationResult) ogni pagina viene registrata; le
+        pagine saltate in modalità skip_bad_pages non vengono scritte.
+        """
+        raise NotImplementedError
+
+    def split_pages(self, pdf_file, path_for_page, pages=None, result=None):
+        """Scrive ogni pagina selezionata (indice da 0) nel file path_for_page(indice)"""
+        result = result if result is not None else OperationResult('split')
+        document = self.open(pdf_file)
+        try:
+            for page_num in PageSelector.coerce(pages).bind(self.page_count(document)):
+                with result.page(page_num):
+                    self.write_page(document, page_num - 1, path_for_page(page_num - 1))
+        finally:
+            self.close(document)
+        return result
+
+    def iter_text(self, pdf_file, pages=None, result=None):
+        """Generatore di tuple (numero pagina, testo); le pagine saltate non vengono restituite"""
+        result = result if result is not None else OperationResult('text')
+        document = self.open(pdf_file)
+        try:
+            for page_num in PageSelector.coerce(pages).bind(self.page_count(document)):
+                text = None
+                with result.page(page_num):
+                    text = self.page_text(document, page_num - 1)
+                if text is not None:
+                    yield page_num, text
+        finally:
+            self.close(document)
+
+
+class PypdfBackend(PDFBackend):
+    """Motore basato su pypdf"""
+
+    name = 'pypdf'
+
+    def open(self, pdf_file):
+        return PdfReader(pdf_file)
+
+    def page_count(self, document):
+        return len(document.pages)
+
+    def write_page(self, document, page_index, output_path):
+        pdf_writer = PdfWriter()
+        pdf_writer.add_page(document.pages[page_index])
+
+        with open(output_path, 'wb') as output_file:
+            pdf_writer.write(output_file)
+
+    def page_text(self, document, page_index):
+        return document.pages[page_index].extract_text()
+
+    def merge(self, pdf_files, output_path):
+        pdf_writer = PdfWriter()
+
+        for pdf_file in pdf_files:
+            pdf_reader = PdfReader(pdf_file)
+            for page in pdf_reader.pages:
+                pdf_writer.add_page(page)
+
+        with open(output_path, 'wb') as output_file:
+            pdf_writer.write(output_file)
+
+    def rotate(self, pdf_file, output_path, rotation_angle, pages=None, result=None):
+        result = result if result is not None else OperationResult('rotate')
+        pdf_reader = PdfReader(pdf_file)
+        pdf_writer = PdfWriter()
+        angle_for_page = rotation_plan(rotation_angle, pages, len(pdf_reader.pages))
+
+        for i in range(len(pdf_reader.pages)):
+            with result.page(i + 1):
+                page = pdf_reader.pages[i]
+                angle = angle_for_page(i + 1)
+                if angle:
+                    page.rotate(angle)
+                pdf_writer.add_page(page)
+
+        with open(output_path, 'wb') as output_file:
+            pdf_writer.write(output_file)
+
+
+class PyMuPDFBackend(PDFBackend):
+    """Motore basato su PyMuPDF (fitz)"""
+
+    name = 'pymupdf'
+
+    # garbage=2 elimina gli oggetti inutilizzati (garbage=3, che unisce i
+    # duplicati, ha costo quadratico nel numero di oggetti);
+    # no_new_id rende l'output riproducibile (nessun /ID casuale)
+    SAVE_OPTIONS = {'garbage': 2, 'deflate': True, 'no_new_id': True}
+
+    def open(self, pdf_file):
+        return fitz.open(pdf_file)
+
+    def close(self, document):
+        document.close()
+
+    def page_count(self, document):
+        return document.page_count
+
+    def write_page(self, document, page_index, output_path):
+        with fitz.open() as single:
+            single.insert_pdf(document, from_page=page_index, to_page=page_index)
+            single.save(output_path, **self.SAVE_OPTIONS)
+
+    def page_text(self, document, page_index):
+        # Come pypdf, senza il ritorno a capo finale dopo l'ultima riga
+        return document[page_index].get_text().rstrip('\n')
+
+    def merge(self, pdf_files, output_path):
+        with fitz.open() as merged:
+            for pdf_file in pdf_files:
+                with fitz.open(pdf_file) as source:
+                    merged.insert_pdf(source)
+            merged.save(output_path, **self.SAVE_OPTIONS)
+
+    def rotate(self, pdf_file, output_path, rotation_angle, pages=None, result=None):
+        result = result if result is not None else OperationResult('rotate')
+        with fitz.open(pdf_file) as doc:
+            angle_for_page = rotation_plan(rotation_angle, pages, doc.page_count)
+            for i in range(doc.page_count):
+                with result.page(i + 1):
+                    page = doc[i]
+                    angle = angle_for_page(i + 1)
+                    if angle:
+                        page.set_rotation((page.rotation + angle) % 360)
+            if result.failed_pages:
+                doc.delete_pages([page_num - 1 for page_num in result.failed_pages])
+
+            # Il sorgente resta aperto fino alla chiusura: si salva in memoria
+            data = doc.tobytes(**self.SAVE_OPTIONS)
+
+        with open(output_path, 'wb') as output_file:
+            output_file.write(data)
+
+    def process_windowed(self, pdf_file, output_path, page_indices, window, page_op=None):
+        """Riscrive le pagine indicate (indici da 0, nell'ordine dato) a finestre
+
+        Ogni finestra di window pagine viene copiata in un PDF temporaneo,
+        modificata da page_op(documento, indici originali) e accodata al
+        file di output in streaming: in memoria resta una finestra alla
+        volta e le risorse condivise (font, immagini) vengono scritte una
+        sola volta. Metadati (/Info) e segnalibri vengono poi ricopiati con
+        un aggiornamento incrementale; i collegamenti verso pagine di altre
+        finestre vanno persi.
+        """
+        output_dir = os.path.dirname(os.path.abspath(output_path))
+        with fitz.open(pdf_file) as source:
+            metadata = source.metadata
+            toc = source.get_toc(simple=False)
+            self._write_windows(source, output_path, output_dir, page_indices, window, page_op)
+        self._copy_document_data(output_path, metadata, toc, page_indices)
+
+    def _write_windows(self, source, output_path, output_dir, page_indices, window, page_op):
+        with tempfile.TemporaryDirectory(dir=output_dir) as parts_dir, \
+                StreamingPDFWriter(output_path) as stream_writer:
+            part_path = os.path.join(parts_dir, "finestra.pdf")
+            for start in range(0, len(page_indices), window):
+                chunk = page_indices[start:start + window]
+                with fitz.open() as part:
+                    for first, last in _page_runs(chunk):
+                        part.insert_pdf(source, from_page=first, to_page=last)
+                    if page_op is not None:
+                        page_op(part, chunk)
+                    part.save(part_path, **self.SAVE_OPTIONS)
+                with open(part_path, 'rb') as part_file:
+                    stream_writer.add_pages_from_reader(PdfReader(part_file))
+                # Libera gli oggetti del sorgente tenuti in cache da MuPDF
+                fitz.TOOLS.store_shrink(100)
+
+    @staticmethod
+    def _copy_document_data(output_path, metadata, toc, page_indices):
+        """Ricopia metadati e segnalibri del sorgente nel file scritto a finestre
+
+        I segnalibri puntano alla prima copia della pagina nell'output; quelli
+        verso pagine non incluse restano senza destinazione.
+        """
+        new_page = {}
+        for position, index in enumerate(page_indices):
+            new_page.setdefault(index + 1, position + 1)
+        outline = []
+        for level, title, page_num, *destination in toc:
+            target = new_page.get(page_num, -1)
+            outline.append([level, title, target] + (destination if target > 0 else []))
+        metadata = {key: value for key, value in metadata.items()
+                    if key not in ('format', 'encryption') and value}
+        if not metadata and not outline:
+            return
+        with fitz.open(output_path) as output:
+            if metadata:
+                output.set_metadata(metadata)
+            if outline:
+                output.set_toc(outline)
+            output.saveIncr()
+
+
+def _page_runs(indices):
+    """Raggruppa gli indici consecutivi crescenti in intervalli (primo, ultimo)"""
+    runs = []
+    for index in indices:
+        if runs and index == runs[-1][1] + 1:
+            runs[-1][1] = index
+        else:
+            runs.append([index, index])
+    return runs
+
+
+BACKENDS = {
+    PypdfBackend.name: PypdfBackend,
+    PyMuPDFBackend.name: PyMuPDFBackend,
+}
+
+
+def available_backends():
+    """Nomi dei backend utilizzabili in questo ambiente"""
+    return [name for name in BACKENDS if name != 'pymupdf' or PYMUPDF_AVAILABLE]
+
+
+def get_backend(name):
+    """Istanza del backend indicato per nome"""
+    if name not in BACKENDS:
+        raise ValueError(f"Backend PDF sconosciuto: '{name}' (disponibili: {', '.join(BACKENDS)})")
+    if name not in available_backends():
+        raise ValueError(f"Il backend '{name}' richiede PyMuPDF, che non è installato")
+    return BACKENDS[name]()
+
+
+def load_calibration(path=None):
+    """Tabella di calibrazione: file salvato dal benchmark o valori predefiniti
+
+    Il file viene letto una volta per processo e di nuovo solo se cambia
+    la data di modifica (o dopo reload_calibration).
+    """
+    path = Path(path) if path is not None else CALIBRATION_FILE
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        mtime = None  # Macchina non calibrata
+    calibration = _read_calibration(str(path), mtime)
+    return {operation: list(rules) for operation, rules in calibration.items()}
+
+
+def reload_calibration():
+    """Dimentica le tabelle di calibrazione lette: la prossima scelta rilegge il file"""
+    _read_calibration.cache_clear()
+
+
+@functools.lru_cache(maxsize=8)
+def _read_calibration(path, mtime):
+    calibration = {operation: list(rules) for operation, rules in DEFAULT_CALIBRATION.items()}
+    if mtime is None:
+        return calibration
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            calibration.update(json.load(f))
+    except Exception as e:
+        print(f"Errore nel caricamento della calibrazione dei backend: {e}")
+    return calibration
+
+
+def select_backend(operation, total_size, calibration=None):
+    """Nome del backend più veloce per l'operazione e la dimensione (byte) indicate"""
+    if calibration is None:
+        calibration = load_calibration()
+    choice = 'pypdf'
+    for max_size, name in calibration.get(operation, []):
+        if max_size is None or total_size <= max_size:
+            choice = name
+            break
+    return choice if choice in available_backends() else 'pypdf'
+
+
+def resolve_backend(choice, operation, pdf_files):
+    """Converte la scelta dell'utente (istanza, nome o "auto") in un backend"""
+    if isinstance(choice, PDFBackend):
+        return choice
+    if choice in (None, 'auto'):
+        total_size = sum(os.path.getsize(pdf_file) for pdf_file in pdf_files)
+        choice = select_backend(operation, total_size)
+    return get_backend(choice)
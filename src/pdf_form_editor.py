@@ -8,11 +8,15 @@ from PySide6.QtCore import Qt
 from PySide6.QtGui import QFont
 from theme_manager import theme_manager
 from user_config import user_config
+from instrumentation import instrumented
+from advanced_pdf_editor import modifies_pages
 
+@instrumented('PDFFormEditor', whole_document=('get_form_fields',))
 class PDFFormEditor:
     def __init__(self, pdf_editor):
         self.pdf_editor = pdf_editor
         
+    @modifies_pages()
     def create_text_field(self, page_num, rect, field_name, default_text="", multiline=False):
         """Crea un campo di testo"""
         if not self.pdf_editor.current_doc:
@@ -44,6 +48,7 @@ class PDFFormEditor:
             print(f"Errore nella creazione del campo testo: {e}")
             return False
     
+    @modifies_pages()
     def create_checkbox(self, page_num, rect, field_name, checked=False):
         """Crea una checkbox"""
         if not self.pdf_editor.current_doc:
@@ -69,6 +74,7 @@ class PDFFormEditor:
             print(f"Errore nella creazione della checkbox: {e}")
             return False
     
+    @modifies_pages()
     def create_radio_button(self, page_num, rect, group_name, value, selected=False):
         """Crea un radio button"""
         if not self.pdf_editor.current_doc:
@@ -95,6 +101,7 @@ class PDFFormEditor:
             print(f"Errore nella creazione del radio button: {e}")
             return False
     
+    @modifies_pages()
     def create_dropdown(self, page_num, rect, field_name, options, default_selection=0):
         """Crea un menu dropdown"""
         if not self.pdf_editor.current_doc:
@@ -125,6 +132,7 @@ class PDFFormEditor:
             print(f"Errore nella creazione del dropdown: {e}")
             return False
     
+    @modifies_pages()
     def create_listbox(self, page_num, rect, field_name, options, multi_select=False):
         """Crea una listbox"""
         if not self.pdf_editor.current_doc:
@@ -156,6 +164,7 @@ class PDFFormEditor:
             print(f"Errore nella creazione della listbox: {e}")
             return False
     
+    @modifies_pages()
     def create_button(self, page_num, rect, field_name, caption="Button", action=None):
         """Crea un pulsante"""
         if not self.pdf_editor.current_doc:
@@ -186,6 +195,7 @@ class PDFFormEditor:
             print(f"Errore nella creazione del pulsante: {e}")
             return False
     
+    @modifies_pages()
     def create_signature_field(self, page_num, rect, field_name):
         """Crea un campo per la firma digitale"""
         if not self.pdf_editor.current_doc:
@@ -249,6 +259,7 @@ class PDFFormEditor:
             print(f"Errore nel recupero dei campi form: {e}")
             return []
     
+    @modifies_pages(None)
     def set_field_value(self, field_name, value):
         """Imposta il valore di un campo form"""
         if not self.pdf_editor.current_doc:
@@ -285,6 +296,7 @@ class PDFFormEditor:
             print(f"Errore nel recupero del valore del campo: {e}")
             return None
     
+    @modifies_pages(None)
     def delete_field(self, field_name):
         """Elimina un campo form"""
         if not self.pdf_editor.current_doc:
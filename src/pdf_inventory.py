@@ -0,0 +1,189 @@
+"""
+PDF Editor - Inventario rapido dei PDF
+
+probe_pdf legge solo intestazione, xref, trailer e dizionari Info/XMP,
+senza costruire l'albero delle pagine. PDFInventory scansiona intere
+cartelle con un pool di processi e conserva i risultati in una cache
+SQLite indicizzata su (percorso, mtime, dimensione): le scansioni
+successive esaminano solo i file nuovi o modificati.
+"""
+import json
+import os
+import re
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader
+
+_HEADER_RE = re.compile(rb"%PDF-(\d\.\d)")
+_XMP_PRODUCER_RE = re.compile(
+    rb"pdf:Producer(?:=\"([^\"]*)\"|>([^<]*)</pdf:Producer>)")
+
+INFO_FIELDS = {
+    'title': '/Title',
+    'author': '/Author',
+    'subject': '/Subject',
+    'creator': '/Creator',
+    'producer': '/Producer',
+    'creation_date': '/CreationDate',
+}
+
+
+def probe_pdf(pdf_file):
+    """Legge le informazioni principali di un PDF senza caricarne le pagine
+
+    Returns:
+        dict con path, file_size, version, num_pages, encrypted,
+        linearized e i campi Info (title, author, ..., producer)
+    """
+    info = {
+        'path': str(pdf_file),
+        'file_size': os.path.getsize(pdf_file),
+    }
+    with open(pdf_file, 'rb') as f:
+        head = f.read(1024)
+        header = _HEADER_RE.search(head)
+        info['version'] = header.group(1).decode() if header else None
+        # Il dizionario di linearizzazione è sempre il primo oggetto del file
+        info['linearized'] = b"/Linearized" in head
+
+        f.seek(0)
+        pdf_reader = PdfReader(f)
+        info['encrypted'] = pdf_reader.is_encrypted
+        readable = not pdf_reader.is_encrypted or pdf_reader.decrypt("") != 0
+
+        info['num_pages'] = None
+        metadata = {}
+        if readable:
+            root = pdf_reader.trailer["/Root"].get_object()
+            info['num_pages'] = int(root["/Pages"].get_object()["/Count"])
+            catalog_version = root.get("/Version")
+            if catalog_version and str(catalog_version)[1:] > (info['version'] or ""):
+                info['version'] = str(catalog_version)[1:]
+
+            info_dict = pdf_reader.trailer.get("/Info")
+            if info_dict is not None:
+                metadata = info_dict.get_object()
+            if "/Producer" not in metadata and "/Metadata" in root:
+                producer = _xmp_producer(root["/Metadata"].get_object().get_data())
+                if producer:
+                    metadata = dict(metadata, **{"/Producer": producer})
+
+        for field, key in INFO_FIELDS.items():
+            value = metadata.get(key)
+            info[field] = str(value) if value is not None else 'N/A'
+    return info
+
+
+def _xmp_producer(xmp_data):
+    """Estrae pdf:Producer dal pacchetto XMP (attributo o elemento)"""
+    match = _XMP_PRODUCER_RE.search(xmp_data)
+    if not match:
+        return None
+    return (match.group(1) or match.group(2)).decode('utf-8', 'replace').strip()
+
+
+def _probe_or_error(pdf_file):
+    """Versione di probe_pdf per i worker: gli errori diventano risultati"""
+    try:
+        return probe_pdf(pdf_file)
+    except Exception as e:
+        return {'path': str(pdf_file), 'error': str(e)}
+
+
+class PDFInventory:
+    """Inventario di cartelle di PDF con cache persistente"""
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self._connection = sqlite3.connect(cache_path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS probes ("
+            "path TEXT PRIMARY KEY, mtime REAL, size INTEGER, info TEXT)")
+        self.stats = {'files': 0, 'cached': 0, 'probed': 0, 'errors': 0}
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def iter_pdf_files(self, root_dir, errors=None):
+        """Trova ricorsivamente i PDF, restituendo (percorso, mtime, dimensione)
+
+        Le cartelle che non si possono leggere e i file di cui non si
+        ottengono le informazioni (es. collegamenti simbolici interrotti)
+        vengono saltati; se errors è una lista vi si aggiunge un
+        {'path', 'error'} per ciascuno.
+        """
+        pending = [root_dir]
+        while pending:
+            directory = pending.pop()
+            try:
+                with os.scandir(directory) as scan:
+                    entries = list(scan)
+            except OSError as e:
+                if errors is not None:
+                    errors.append({'path': str(directory), 'error': str(e)})
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                        continue
+                    if not entry.name.lower().endswith('.pdf'):
+                        continue
+                    stat = entry.stat()
+                except OSError as e:
+                    if errors is not None:
+                        errors.append({'path': entry.path, 'error': str(e)})
+                    continue
+                yield entry.path, stat.st_mtime, stat.st_size
+
+    def scan(self, root_dirs, workers=None, chunksize=16):
+        """Inventario di una o più cartelle; solo i file cambiati vengono riletti
+
+        Returns:
+            Lista di dict di probe_pdf (o {'path', 'error'} per i file illeggibili)
+        """
+        if isinstance(root_dirs, (str, os.PathLike)):
+            root_dirs = [root_dirs]
+        self.stats = {'files': 0, 'cached': 0, 'probed': 0, 'errors': 0}
+
+        results = []
+        to_probe = []
+        for root_dir in root_dirs:
+            for path, mtime, size in self.iter_pdf_files(root_dir, errors=results):
+                self.stats['files'] += 1
+                row = self._connection.execute(
+                    "SELECT mtime, size, info FROM probes WHERE path = ?", (path,)).fetchone()
+                if row is not None and row[0] == mtime and row[1] == size:
+                    self.stats['cached'] += 1
+                    results.append(json.loads(row[2]))
+                else:
+                    to_probe.append((path, mtime, size))
+
+        if to_probe:
+            paths = [path for path, _, _ in to_probe]
+            if workers == 1 or len(to_probe) < chunksize:
+                probed = map(_probe_or_error, paths)
+                self._store(to_probe, probed, results)
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    probed = executor.map(_probe_or_error, paths, chunksize=chunksize)
+                    self._store(to_probe, probed, results)
+
+        self.stats['errors'] = sum(1 for info in results if 'error' in info)
+        return results
+
+    def _store(self, to_probe, probed, results):
+        with self._connection:
+            for (path, mtime, size), info in zip(to_probe, probed):
+                self.stats['probed'] += 1
+                results.append(info)
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO probes (path, mtime, size, info) VALUES (?, ?, ?, ?)",
+                    (path, mtime, size, json.dumps(info)))
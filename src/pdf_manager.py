@@ -1,219 +1,810 @@
 import pypdf
 from pypdf import PdfWriter, PdfReader
+from pypdf.generic import (ArrayObject, DecodedStreamObject, DictionaryObject,
+                           FloatObject, NameObject, NumberObject)
 from PIL import Image
 import os
+import shutil
 import subprocess
 import platform
 from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-import tempfile
+import io
+import csv
+import zlib
+from pathlib import Path
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pdf_stream_writer import StreamingPDFWriter, append_incremental_update
+from operation_result import OperationResult
+from page_selector import PageSelector
+from pdf_inventory import PDFInventory, probe_pdf
+from pdf_backends import PYMUPDF_AVAILABLE, get_backend, resolve_backend, rotation_plan
+from result_cache import ResultCache, cached_operation
+from instrumentation import instrumented
+from user_config import user_config
 
+# Spazi colore PDF dei JPEG incorporabili senza ricodifica
+_JPEG_COLORSPACES = {'L': "/DeviceGray", 'RGB': "/DeviceRGB", 'CMYK': "/DeviceCMYK"}
+
+# Backend e documento aperti una sola volta in ogni processo worker
+_worker_backend = None
+_worker_reader = None
+
+
+def _init_worker_reader(pdf_file, backend_name):
+    """Inizializzatore dei processi worker: apre il PDF sorgente una sola volta"""
+    global _worker_backend, _worker_reader
+    _worker_backend = get_backend(backend_name)
+    _worker_reader = _worker_backend.open(pdf_file)
+
+
+def _split_page_path(output_dir, filename, page_index):
+    """Percorso del file di una singola pagina (dipende solo dall'indice)"""
+    return os.path.join(output_dir, f"{filename}_page_{page_index + 1}.pdf")
+
+
+def _extract_page_text(page_index):
+    """Worker: estrae il testo di una pagina usando il reader del processo"""
+    return _worker_backend.page_text(_worker_reader, page_index)
+
+
+def _extract_page_text_timed(page_index):
+    """Worker: come _extract_page_text, restituisce anche il tempo di estrazione"""
+    start_time = time.perf_counter()
+    return _extract_page_text(page_index), time.perf_counter() - start_time
+
+
+def _load_image_page(image_file, frame, target_dpi):
+    """Prepara un'immagine come XObject PDF: (dizionario, dati, larghezza, altezza in punti)
+
+    JPEG e JPEG 2000 vengono incorporati con i byte originali; gli altri
+    formati (o le immagini da ridurre a target_dpi) vengono decodificati e
+    compressi senza perdita.
+    """
+    with Image.open(image_file) as img:
+        img.seek(frame)
+        dpi = img.info.get('dpi') or (72, 72)
+        dpi_x, dpi_y = (float(v) or 72 for v in dpi)
+        width_px, height_px = img.size
+        # Le dimensioni della pagina seguono quelle fisiche dell'immagine
+        width, height = width_px * 72 / dpi_x, height_px * 72 / dpi_y
+        
+        downscale = target_dpi is not None and max(dpi_x, dpi_y) > target_dpi
+        image_dict = DictionaryObject({
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Image"),
+            NameObject("/Width"): NumberObject(width_px),
+            NameObject("/Height"): NumberObject(height_px),
+        })
+        
+        if img.format == 'JPEG' and img.mode in _JPEG_COLORSPACES and not downscale:
+            with open(image_file, 'rb') as f:
+                data = f.read()
+            image_dict[NameObject("/ColorSpace")] = NameObject(_JPEG_COLORSPACES[img.mode])
+            image_dict[NameObject("/BitsPerComponent")] = NumberObject(8)
+            image_dict[NameObject("/Filter")] = NameObject("/DCTDecode")
+            if img.mode == 'CMYK' and 'adobe' in img.info:
+                # I JPEG CMYK di Adobe memorizzano i valori invertiti
+                image_dict[NameObject("/Decode")] = ArrayObject(
+                    [NumberObject(v) for v in (1, 0) * 4])
+            return image_dict, data, width, height
+        
+        if img.format == 'JPEG2000' and not downscale:
+            with open(image_file, 'rb') as f:
+                data = f.read()
+            image_dict[NameObject("/Filter")] = NameObject("/JPXDecode")
+            return image_dict, data, width, height
+        
+        mode = 'L' if img.mode in ('1', 'L', 'LA') else 'RGB'
+        decoded = img.convert(mode)
+        if downscale:
+            scale = target_dpi / max(dpi_x, dpi_y)
+            decoded = decoded.resize((max(1, round(width_px * scale)), max(1, round(height_px * scale))),
+                                     Image.LANCZOS)
+            image_dict[NameObject("/Width")] = NumberObject(decoded.width)
+            image_dict[NameObject("/Height")] = NumberObject(decoded.height)
+        
+        image_dict[NameObject("/ColorSpace")] = NameObject(
+            "/DeviceGray" if mode == 'L' else "/DeviceRGB")
+        image_dict[NameObject("/BitsPerComponent")] = NumberObject(8)
+        image_dict[NameObject("/Filter")] = NameObject("/FlateDecode")
+        return image_dict, zlib.compress(decoded.tobytes()), width, height
+
+
+def render_watermark(size, watermark_text, font_size=50, opacity=0.3, angle=45):
+    """PDF di una pagina (larghezza, altezza) con il solo watermark, come byte"""
+    width, height = size
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=(width, height))
+    c.setFont("Helvetica", font_size)
+    c.setFillAlpha(opacity)  # Trasparenza
+    c.translate(width / 2, height / 2)
+    c.rotate(angle)  # Rotazione diagonale attorno al centro della pagina
+    c.drawCentredString(0, -font_size / 3, watermark_text)
+    c.save()
+    return buffer.getvalue()
+
+
+def stamp_watermark(doc, page_indices, watermark_text, font_size=50, opacity=0.3, angle=45):
+    """Applica il watermark alle pagine (indici da 0) di un documento PyMuPDF aperto
+
+    Stesso risultato di PDFManager.add_watermark: il watermark segue la
+    pagina non ruotata e viene disegnato una volta per formato di pagina.
+    """
+    import fitz
+    templates = {}  # (larghezza, altezza) -> documento con il watermark
+    try:
+        for index in page_indices:
+            page = doc[index]
+            box = page.rect * page.derotation_matrix
+            size = (round(box.width, 2), round(box.height, 2))
+            if size not in templates:
+                templates[size] = fitz.open(
+                    "pdf", render_watermark(size, watermark_text, font_size, opacity, angle))
+            page.show_pdf_page(box, templates[size], 0, overlay=True)
+    finally:
+        for template in templates.values():
+            template.close()
+
+
+def _split_pages_shard(output_dir, filename, page_numbers, skip_bad_pages):
+    """Worker: scrive le pagine indicate usando il reader del processo
+
+    Returns:
+        Esiti delle pagine (vedi OperationResult.pages); senza
+        skip_bad_pages il blocco si ferma alla prima pagina fallita
+    """
+    result = OperationResult('split', skip_bad_pages)
+    try:
+        for page_num in page_numbers:
+            with result.page(page_num):
+                _worker_backend.write_page(_worker_reader, page_num - 1,
+                                           _split_page_path(output_dir, filename, page_num - 1))
+    except Exception:
+        pass  # Già registrata in result.pages
+    return result.pages
+
+
+@instrumented('PDFManager', exclude=('preview_pdf',))
 class PDFManager:
-    def __init__(self):
-        pass
+    def __init__(self, backend=None, cache=None):
+        """
+        Args:
+            backend: motore per unione, divisione, rotazione ed estrazione
+                del testo: "pypdf", "pymupdf", "auto" o un'istanza di
+                PDFBackend. None = impostazione "pdf_backend" della
+                configurazione utente (vedi pdf_backends)
+            cache: ResultCache per riusare i risultati delle operazioni
+                file -> file già eseguite sugli stessi input; True = cache
+                nella cartella predefinita (vedi result_cache)
+        """
+        self.backend = backend
+        self.cache = ResultCache.coerce(cache)
     
-    def merge_pdfs(self, pdf_files, output_path):
-        """Unisce più file PDF in uno solo"""
+    def _backend_for(self, operation, pdf_files, backend=None):
+        """Backend da usare: parametro della chiamata, dell'istanza o della configurazione"""
+        for choice in (backend, self.backend, user_config.get("pdf_backend", "auto")):
+            if choice is not None:
+                return resolve_backend(choice, operation, pdf_files)
+        return resolve_backend("auto", operation, pdf_files)
+    
+    @cached_operation(inputs=['pdf_files'], output='output_path')
+    def merge_pdfs(self, pdf_files, output_path, streaming=False, backend=None):
+        """Unisce più file PDF in uno solo
+
+        Con streaming=True le pagine vengono scritte su disco man mano che
+        vengono lette e le risorse identiche (font, profili ICC, immagini)
+        vengono scritte una sola volta: la memoria resta limitata anche
+        unendo migliaia di file.
+        """
+        if streaming:
+            return self._merge_pdfs_streaming(pdf_files, output_path)
         try:
-            pdf_writer = PdfWriter()
-            
-            for pdf_file in pdf_files:
-                pdf_reader = PdfReader(pdf_file)
-                for page in pdf_reader.pages:
-                    pdf_writer.add_page(page)
-            
-            with open(output_path, 'wb') as output_file:
-                pdf_writer.write(output_file)
+            self._backend_for('merge', pdf_files, backend).merge(pdf_files, output_path)
             
             return True
         except Exception as e:
             print(f"Errore durante l'unione dei PDF: {e}")
             return False
     
-    def split_pdf_pages(self, pdf_file, output_dir):
-        """Divide un PDF in pagine singole"""
+    def _merge_pdfs_streaming(self, pdf_files, output_path):
+        """Unione in streaming con deduplicazione delle risorse condivise
+
+        Le pagine vengono scritte in un file temporaneo nella stessa
+        cartella, che prende il posto di output_path solo a unione
+        completata: se un input fallisce non resta un output a metà.
+        """
+        part_path = f"{output_path}.{os.getpid()}.part"
         try:
-            pdf_reader = PdfReader(pdf_file)
-            filename = os.path.splitext(os.path.basename(pdf_file))[0]
-            
-            for i, page in enumerate(pdf_reader.pages):
-                pdf_writer = PdfWriter()
-                pdf_writer.add_page(page)
-                
-                output_filename = f"{filename}_page_{i+1}.pdf"
-                output_path = os.path.join(output_dir, output_filename)
-                
-                with open(output_path, 'wb') as output_file:
-                    pdf_writer.write(output_file)
+            with StreamingPDFWriter(part_path) as stream_writer:
+                for pdf_file in pdf_files:
+                    # Un solo reader alla volta: viene rilasciato appena copiato
+                    stream_writer.add_pages_from_reader(PdfReader(pdf_file))
+            os.replace(part_path, output_path)
             
             return True
         except Exception as e:
-            print(f"Errore durante la divisione del PDF: {e}")
+            print(f"Errore durante l'unione dei PDF: {e}")
+            if os.path.exists(part_path):
+                os.remove(part_path)
             return False
     
+    @cached_operation(inputs=['pdf_file'], output_dir='output_dir',
+                      ignore=['workers', 'shard_size', 'chunk_pages'])
+    def split_pdf_pages(self, pdf_file, output_dir, workers=1, shard_size=64, backend=None,
+                        chunk_pages=None, pages=None, skip_bad_pages=False):
+        """Divide un PDF in pagine singole
+
+        Con workers > 1 (o None per usare tutti i core) le pagine vengono
+        suddivise in blocchi di shard_size pagine ed elaborate da un pool di
+        processi; ogni processo apre il PDF sorgente una sola volta. I file
+        prodotti (nome e contenuto) sono identici a quelli della modalità
+        seriale con lo stesso backend.
+
+        Con chunk_pages (modalità a blocchi, vedi memory_budget) si usa
+        PyMuPDF, che legge il sorgente una pagina alla volta.
+
+        pages limita la divisione ad alcune pagine (es. le failed_pages di
+        un'esecuzione precedente). Con skip_bad_pages le pagine che non si
+        riescono a scrivere vengono saltate senza interrompere la divisione.
+
+        Returns:
+            OperationResult con l'esito di ogni pagina
+        """
+        result = OperationResult('split', skip_bad_pages)
+        try:
+            filename = os.path.splitext(os.path.basename(pdf_file))[0]
+            if chunk_pages and PYMUPDF_AVAILABLE:
+                backend = 'pymupdf'
+            engine = self._backend_for('split', [pdf_file], backend)
+            
+            if workers is None:
+                workers = os.cpu_count() or 1
+            
+            num_pages = probe_pdf(pdf_file)['num_pages'] if workers > 1 else 0
+            if workers > 1 and num_pages and num_pages > shard_size:
+                selected = list(PageSelector.coerce(pages).bind(num_pages))
+                shards = [selected[start:start + shard_size]
+                          for start in range(0, len(selected), shard_size)]
+                with ProcessPoolExecutor(max_workers=min(workers, len(shards)),
+                                         initializer=_init_worker_reader,
+                                         initargs=(pdf_file, engine.name)) as executor:
+                    futures = [executor.submit(_split_pages_shard, output_dir, filename, shard,
+                                               skip_bad_pages)
+                               for shard in shards]
+                    for future in futures:
+                        result.pages.extend(future.result())
+                errors = result.page_errors()
+                if errors and not skip_bad_pages:
+                    page_num = min(errors)
+                    raise RuntimeError(f"pagina {page_num}: {errors[page_num]}")
+                return result
+            
+            engine.split_pages(pdf_file, lambda i: _split_page_path(output_dir, filename, i),
+                               pages, result)
+            
+            return result
+        except Exception as e:
+            print(f"Errore durante la divisione del PDF: {e}")
+            return result.fail(e)
+    
+    @cached_operation(inputs=['pdf_file'], output_dir='output_dir')
     def split_pdf_range(self, pdf_file, output_dir, start_page, end_page):
         """Divide un PDF per un intervallo specifico di pagine"""
+        report = self.split_pdf_ranges(pdf_file, output_dir, [(start_page, end_page)], workers=1)
+        return report is not None
+    
+    def split_pdf_ranges(self, pdf_file, output_dir, ranges, workers=4):
+        """Divide un PDF in più intervalli di pagine con una sola lettura del sorgente
+
+        ranges può essere una lista di tuple (inizio, fine), una lista di
+        tuple (nome, selezione) dove la selezione è un'espressione di pagine
+        (es: "1-5", "odd", "10-") o un PageSelector, oppure il percorso di un
+        file CSV con righe "nome,selezione". I file vengono scritti in
+        parallelo da un pool di thread.
+
+        Returns:
+            Lista di dict (uno per intervallo) con nome, percorso, pagine e
+            tempi in secondi, oppure None in caso di errore
+        """
         try:
+            if isinstance(ranges, (str, os.PathLike)):
+                ranges = self._read_ranges_csv(ranges)
+            
             pdf_reader = PdfReader(pdf_file)
             filename = os.path.splitext(os.path.basename(pdf_file))[0]
+            num_pages = len(pdf_reader.pages)
+            
+            report = []
+            pending = []
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                for range_spec in ranges:
+                    start_time = time.perf_counter()
+                    name, selection = self._resolve_range(range_spec, num_pages, filename)
+                    
+                    pdf_writer = PdfWriter()
+                    for page_num in selection:
+                        pdf_writer.add_page(pdf_reader.pages[page_num - 1])
+                    
+                    entry = {
+                        'name': name,
+                        'output_path': os.path.join(output_dir, f"{name}.pdf"),
+                        'selection': str(selection.selector),
+                        'pages': len(pdf_writer.pages),
+                        'build_seconds': time.perf_counter() - start_time,
+                    }
+                    report.append(entry)
+                    pending.append(executor.submit(self._write_range, pdf_writer, entry))
+                    
+                    # Limita i writer in attesa di scrittura per contenere la memoria
+                    if len(pending) >= 2 * max(1, workers):
+                        pending.pop(0).result()
+                
+                for future in pending:
+                    future.result()
             
-            if end_page > len(pdf_reader.pages):
-                end_page = len(pdf_reader.pages)
-            
-            pdf_writer = PdfWriter()
-            
-            for i in range(start_page - 1, end_page):
-                pdf_writer.add_page(pdf_reader.pages[i])
-            
-            output_filename = f"{filename}_pages_{start_page}-{end_page}.pdf"
-            output_path = os.path.join(output_dir, output_filename)
+            for entry in report:
+                entry['seconds'] = entry['build_seconds'] + entry['write_seconds']
             
-            with open(output_path, 'wb') as output_file:
-                pdf_writer.write(output_file)
-            
-            return True
+            return report
         except Exception as e:
             print(f"Errore durante la divisione del PDF per intervallo: {e}")
-            return False
+            return None
+    
+    def _write_range(self, pdf_writer, entry):
+        """Scrive su disco il writer di un intervallo registrandone il tempo"""
+        start_time = time.perf_counter()
+        with open(entry['output_path'], 'wb') as output_file:
+            pdf_writer.write(output_file)
+        entry['write_seconds'] = time.perf_counter() - start_time
+    
+    def _resolve_range(self, range_spec, max_pages, filename):
+        """Converte una specifica di intervallo in (nome, PageSelection)"""
+        if len(range_spec) == 2 and isinstance(range_spec[1], (str, PageSelector)):
+            name, selector = range_spec
+            # Solo il nome del file: evita percorsi fuori dalla cartella di output
+            name = os.path.basename(name.strip())
+            if not name:
+                raise ValueError(f"Nome non valido per l'intervallo {selector}")
+            selection = PageSelector.coerce(selector).bind(max_pages)
+        else:
+            start_page, end_page = map(int, range_spec)
+            end_page = min(end_page, max_pages)
+            if start_page < 1 or start_page > end_page:
+                raise ValueError(f"Intervallo non valido: {start_page}-{end_page}")
+            name = f"{filename}_pages_{start_page}-{end_page}"
+            selection = PageSelector(f"{start_page}-{end_page}").bind(max_pages)
+        
+        return name, selection
+    
+    def _read_ranges_csv(self, csv_path):
+        """Legge un CSV con righe "nome,intervallo" (l'intestazione è opzionale)"""
+        ranges = []
+        with open(csv_path, newline='', encoding='utf-8') as csv_file:
+            for row_number, row in enumerate(csv.reader(csv_file)):
+                if len(row) < 2 or not row[0].strip():
+                    continue
+                range_string = row[1].strip()
+                try:
+                    selector = PageSelector(range_string)
+                except ValueError:
+                    if row_number == 0:
+                        continue  # Riga di intestazione
+                    raise
+                ranges.append((row[0], selector))
+        return ranges
     
-    def rotate_pdf(self, pdf_file, output_path, rotation_angle):
-        """Ruota tutte le pagine di un PDF"""
+    @cached_operation(inputs=['pdf_file'], output='output_path', ignore=['chunk_pages'])
+    def rotate_pdf(self, pdf_file, output_path, rotation_angle, pages=None, incremental=False,
+                   backend=None, chunk_pages=None, skip_bad_pages=False):
+        """Ruota le pagine di un PDF
+
+        Args:
+            pdf_file: PDF sorgente
+            output_path: PDF di destinazione (può coincidere con il sorgente
+                in modalità incrementale)
+            rotation_angle: angolo in gradi (multiplo di 90) oppure dict
+                {numero pagina: angolo} per correggere scansioni miste
+            pages: pagine da ruotare (lista, espressione o PageSelector);
+                None = tutte
+            incremental: se True aggiunge al file solo i dizionari delle
+                pagine modificate invece di riscrivere l'intero documento
+            backend: motore per la riscrittura completa (vedi __init__)
+            chunk_pages: se indicato riscrive il documento a finestre di
+                chunk_pages pagine (vedi _process_windowed)
+            skip_bad_pages: le pagine che non si riescono a elaborare
+                vengono escluse dall'output invece di interrompere la rotazione
+
+        Returns:
+            OperationResult con l'esito di ogni pagina (nelle modalità
+            incrementale e a blocchi il tempo è diviso tra le pagine)
+        """
+        result = OperationResult('rotate', skip_bad_pages)
         try:
-            pdf_reader = PdfReader(pdf_file)
-            pdf_writer = PdfWriter()
-            
-            for page in pdf_reader.pages:
-                rotated_page = page.rotate(rotation_angle)
-                pdf_writer.add_page(rotated_page)
+            if incremental and self._rotate_pdf_incremental(pdf_file, output_path, rotation_angle,
+                                                            pages, result):
+                return result
+            
+            if chunk_pages and PYMUPDF_AVAILABLE:
+                start_time = time.perf_counter()
+                num_pages = probe_pdf(pdf_file)['num_pages']
+                angle_for_page = rotation_plan(rotation_angle, pages, num_pages)
+                
+                def rotate_window(part, indices):
+                    for page, index in zip(part, indices):
+                        angle = angle_for_page(index + 1)
+                        if angle:
+                            page.set_rotation((page.rotation + angle) % 360)
+                
+                self._process_windowed(pdf_file, output_path, range(num_pages), chunk_pages,
+                                       rotate_window)
+                result.record_pages(range(1, num_pages + 1), time.perf_counter() - start_time)
+                return result
             
-            with open(output_path, 'wb') as output_file:
-                pdf_writer.write(output_file)
+            self._backend_for('rotate', [pdf_file], backend).rotate(
+                pdf_file, output_path, rotation_angle, pages, result)
             
-            return True
+            return result
         except Exception as e:
             print(f"Errore durante la rotazione del PDF: {e}")
-            return False
+            return result.fail(e)
+    
+    def _process_windowed(self, pdf_file, output_path, page_indices, chunk_pages, page_op=None):
+        """Modalità a blocchi per i documenti oltre il budget di memoria
+
+        Il documento viene riscritto chunk_pages pagine alla volta con
+        PyMuPDF e le finestre vengono unite in streaming (vedi
+        PyMuPDFBackend.process_windowed): la memoria dipende dalla
+        dimensione della finestra, non da quella del documento.
+        """
+        get_backend('pymupdf').process_windowed(pdf_file, output_path, list(page_indices),
+                                                chunk_pages, page_op)
+    
+    def _rotate_pdf_incremental(self, pdf_file, output_path, rotation_angle, pages, result):
+        """Rotazione tramite aggiornamento incrementale delle sole pagine modificate
+
+        Restituisce False se il documento non lo consente (PDF cifrato):
+        in quel caso si ricade sulla riscrittura completa.
+        """
+        start_time = time.perf_counter()
+        # Il reader su file aperto legge solo xref e dizionari delle pagine,
+        # senza caricare l'intero documento in memoria
+        with open(pdf_file, 'rb') as source:
+            pdf_reader = PdfReader(source)
+            if pdf_reader.is_encrypted:
+                return False
+            
+            num_pages = len(pdf_reader.pages)
+            angle_for_page = rotation_plan(rotation_angle, pages, num_pages)
+            changed = []
+            for i, page in enumerate(pdf_reader.pages):
+                angle = angle_for_page(i + 1)
+                if angle % 360 == 0:
+                    continue
+                page_dict = DictionaryObject(page)
+                page_dict[NameObject("/Rotate")] = NumberObject((page.rotation + angle) % 360)
+                changed.append((page.indirect_reference, page_dict))
+            trailer = pdf_reader.trailer
+        
+        if os.path.abspath(output_path) != os.path.abspath(pdf_file):
+            shutil.copyfile(pdf_file, output_path)
+        if changed:
+            append_incremental_update(output_path, trailer, changed)
+        
+        result.record_pages(range(1, num_pages + 1), time.perf_counter() - start_time)
+        return True
     
-    def extract_pages(self, pdf_file, output_path, pages_string):
-        """Estrae pagine specifiche da un PDF"""
+    @cached_operation(inputs=['pdf_file'], output='output_path', ignore=['chunk_pages'])
+    def extract_pages(self, pdf_file, output_path, pages_string, chunk_pages=None,
+                      skip_bad_pages=False):
+        """Estrae pagine specifiche da un PDF
+
+        pages_string può essere un'espressione (es: "1,3,5-8", "odd", "z-1",
+        vedi page_selector) o un PageSelector già compilato. Con
+        skip_bad_pages le pagine illeggibili vengono escluse dall'output.
+
+        Returns:
+            OperationResult con l'esito di ogni pagina
+        """
+        result = OperationResult('extract_pages', skip_bad_pages)
         try:
+            if chunk_pages and PYMUPDF_AVAILABLE:
+                start_time = time.perf_counter()
+                selection = PageSelector.coerce(pages_string).bind(probe_pdf(pdf_file)['num_pages'])
+                self._process_windowed(pdf_file, output_path, selection.indices(), chunk_pages)
+                result.record_pages(selection, time.perf_counter() - start_time)
+                return result
+            
             pdf_reader = PdfReader(pdf_file)
             pdf_writer = PdfWriter()
             
-            # Parse della stringa delle pagine (es: "1,3,5-8")
-            page_numbers = self._parse_page_range(pages_string, len(pdf_reader.pages))
-            
-            for page_num in page_numbers:
-                if 1 <= page_num <= len(pdf_reader.pages):
+            selection = PageSelector.coerce(pages_string).bind(len(pdf_reader.pages))
+            for page_num in selection:
+                with result.page(page_num):
                     pdf_writer.add_page(pdf_reader.pages[page_num - 1])
             
             with open(output_path, 'wb') as output_file:
                 pdf_writer.write(output_file)
             
-            return True
+            return result
         except Exception as e:
             print(f"Errore durante l'estrazione delle pagine: {e}")
-            return False
-    
-    def _parse_page_range(self, pages_string, max_pages):
-        """Parse della stringa delle pagine per estrarre i numeri"""
-        page_numbers = []
-        
-        for part in pages_string.split(','):
-            part = part.strip()
-            if '-' in part:
-                # Range di pagine (es: 5-8)
-                start, end = map(int, part.split('-'))
-                page_numbers.extend(range(start, min(end + 1, max_pages + 1)))
-            else:
-                # Singola pagina
-                page_num = int(part)
-                if page_num <= max_pages:
-                    page_numbers.append(page_num)
-        
-        return sorted(set(page_numbers))
+            return result.fail(e)
     
-    def add_watermark(self, pdf_file, output_path, watermark_text):
-        """Aggiunge un watermark di testo al PDF"""
+    @cached_operation(inputs=['pdf_file'], output='output_path', ignore=['chunk_pages'])
+    def add_watermark(self, pdf_file, output_path, watermark_text, pages=None,
+                      font_size=50, opacity=0.3, angle=45, chunk_pages=None,
+                      skip_bad_pages=False):
+        """Aggiunge un watermark di testo al PDF
+
+        Il watermark viene disegnato una sola volta per ogni formato di
+        pagina distinto (A4, Letter, orizzontale...) come Form XObject
+        condiviso: ogni pagina lo richiama con un riferimento, senza
+        copiarne il contenuto e senza file temporanei. Con skip_bad_pages
+        le pagine su cui il watermark non si può applicare vengono escluse
+        dall'output.
+
+        Returns:
+            OperationResult con l'esito di ogni pagina selezionata
+        """
+        result = OperationResult('watermark', skip_bad_pages)
         try:
-            # Crea un PDF temporaneo con il watermark
-            with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
-                temp_watermark_path = temp_file.name
-            
-            # Crea il watermark usando reportlab
-            c = canvas.Canvas(temp_watermark_path, pagesize=letter)
-            width, height = letter
-            
-            # Imposta il testo del watermark
-            c.setFont("Helvetica", 50)
-            c.setFillAlpha(0.3)  # Trasparenza
-            c.rotate(45)  # Rotazione diagonale
-            c.drawCentredText(width/2, height/2, watermark_text)
-            c.save()
-            
-            # Applica il watermark al PDF originale
-            pdf_reader = PdfReader(pdf_file)
-            watermark_reader = PdfReader(temp_watermark_path)
-            pdf_writer = PdfWriter()
-            
-            watermark_page = watermark_reader.pages[0]
+            if chunk_pages and PYMUPDF_AVAILABLE:
+                start_time = time.perf_counter()
+                num_pages = probe_pdf(pdf_file)['num_pages']
+                selected = set(PageSelector.coerce(pages).bind(num_pages).indices())
+                
+                def stamp_window(part, indices):
+                    stamp_watermark(part, [i for i, index in enumerate(indices) if index in selected],
+                                    watermark_text, font_size, opacity, angle)
+                
+                self._process_windowed(pdf_file, output_path, range(num_pages), chunk_pages,
+                                       stamp_window)
+                result.record_pages((index + 1 for index in sorted(selected)),
+                                    time.perf_counter() - start_time)
+                return result
             
-            for page in pdf_reader.pages:
-                page.merge_page(watermark_page)
-                pdf_writer.add_page(page)
+            pdf_reader = PdfReader(pdf_file)
+            pdf_writer = PdfWriter(clone_from=pdf_reader)
+            
+            selection = PageSelector.coerce(pages).bind(len(pdf_writer.pages))
+            style = (watermark_text, font_size, opacity, angle)
+            templates = {}  # (larghezza, altezza) -> (nome, riferimento XObject)
+            stamps = {}     # (box della pagina, nome) -> stream che disegna il watermark
+            
+            # Stream condiviso che isola lo stato grafico del contenuto originale
+            save_state = self._add_content_stream(pdf_writer, b"q\n")
+            
+            for page_num in selection:
+                with result.page(page_num):
+                    page = pdf_writer.pages[page_num - 1]
+                    x0, y0, x1, y1 = (round(float(v), 2) for v in page.cropbox)
+                    size = (x1 - x0, y1 - y0)
+                    
+                    if size not in templates:
+                        name = NameObject(f"/PdfEditorWatermark{len(templates)}")
+                        templates[size] = (name, self._watermark_template(pdf_writer, size, style))
+                    name, template_ref = templates[size]
+                    
+                    xobjects = self._own_xobjects(page)
+                    # Un watermark già presente (es. da un'esecuzione precedente) non va sovrascritto
+                    suffix = 1
+                    while name in xobjects:
+                        name = NameObject(f"{templates[size][0]}_{suffix}")
+                        suffix += 1
+                    xobjects[name] = template_ref
+                    
+                    box = (x0, y0, x1, y1)
+                    if (box, name) not in stamps:
+                        operations = f"Q\nq 1 0 0 1 {x0} {y0} cm {name} Do Q\n".encode()
+                        stamps[box, name] = self._add_content_stream(pdf_writer, operations)
+                    
+                    page[NameObject("/Contents")] = ArrayObject(
+                        [save_state] + self._content_refs(page) + [stamps[box, name]])
+            
+            # Le pagine saltate non vanno nell'output (dall'ultima per non spostare gli indici)
+            for page_num in reversed(result.failed_pages):
+                del pdf_writer.pages[page_num - 1]
             
             with open(output_path, 'wb') as output_file:
                 pdf_writer.write(output_file)
             
-            # Rimuovi il file temporaneo
-            os.unlink(temp_watermark_path)
-            
-            return True
+            return result
         except Exception as e:
             print(f"Errore durante l'aggiunta del watermark: {e}")
-            return False
+            return result.fail(e)
     
-    def extract_text(self, pdf_file, output_path):
-        """Estrae tutto il testo da un PDF"""
+    def _watermark_template(self, pdf_writer, size, style):
+        """Crea in memoria il Form XObject del watermark per un formato di pagina"""
+        width, height = size
+        template_page = PdfReader(io.BytesIO(render_watermark(size, *style))).pages[0]
+        form = DecodedStreamObject()
+        form.set_data(template_page.get_contents().get_data())
+        form = form.flate_encode()
+        form.update({
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Form"),
+            NameObject("/BBox"): ArrayObject(
+                [FloatObject(0), FloatObject(0), FloatObject(width), FloatObject(height)]),
+            NameObject("/Resources"): template_page["/Resources"].clone(pdf_writer),
+        })
+        return pdf_writer._add_object(form)
+    
+    def _own_xobjects(self, page):
+        """Dizionario /XObject della pagina, da modificare senza toccare le altre
+
+        Le risorse (anche ereditate dai nodi /Pages o condivise con altre
+        pagine) vengono copiate nella pagina insieme al loro /XObject; i
+        valori restano riferimenti agli stessi oggetti.
+        """
+        node, resources = page, None
+        while node is not None and resources is None:
+            resources = node.get(NameObject("/Resources"))
+            parent = node.get(NameObject("/Parent"))
+            node = parent.get_object() if parent is not None else None
+        resources = DictionaryObject(resources.get_object()) if resources is not None \
+            else DictionaryObject()
+        xobjects = resources.get(NameObject("/XObject"))
+        xobjects = DictionaryObject(xobjects.get_object()) if xobjects is not None \
+            else DictionaryObject()
+        resources[NameObject("/XObject")] = xobjects
+        page[NameObject("/Resources")] = resources
+        return xobjects
+    
+    def _add_content_stream(self, pdf_writer, operations):
+        """Aggiunge al writer uno stream di contenuto condivisibile tra pagine"""
+        stream = DecodedStreamObject()
+        stream.set_data(operations)
+        return pdf_writer._add_object(stream)
+    
+    def _content_refs(self, page):
+        """Riferimenti agli stream di contenuto esistenti della pagina"""
+        contents = page.get(NameObject("/Contents"))
+        if contents is None:
+            return []
+        if isinstance(contents.get_object(), ArrayObject):
+            return list(contents.get_object())
+        return [contents]
+    
+    @cached_operation(inputs=['pdf_file'], output='output_path', ignore=['workers', 'chunk_pages'])
+    def extract_text(self, pdf_file, output_path, workers=1, pages=None, backend=None,
+                     chunk_pages=None, skip_bad_pages=False):
+        """Estrae tutto il testo da un PDF
+
+        Il testo viene scritto sul file pagina per pagina, man mano che è
+        disponibile: la memoria non cresce con la dimensione del documento.
+        Con workers > 1 (o None per tutti i core) le pagine vengono estratte
+        in anticipo da un pool di processi. Con chunk_pages si usa PyMuPDF,
+        che a differenza di pypdf non conserva le pagine già lette. Con
+        skip_bad_pages le pagine illeggibili vengono omesse dal file.
+
+        Returns:
+            OperationResult con l'esito di ogni pagina
+        """
+        result = OperationResult('extract_text', skip_bad_pages)
         try:
-            pdf_reader = PdfReader(pdf_file)
-            text_content = []
-            
-            for i, page in enumerate(pdf_reader.pages):
-                page_text = page.extract_text()
-                text_content.append(f"--- PAGINA {i+1} ---\n")
-                text_content.append(page_text)
-                text_content.append("\n\n")
-            
+            if chunk_pages and PYMUPDF_AVAILABLE:
+                backend = 'pymupdf'
             with open(output_path, 'w', encoding='utf-8') as text_file:
-                text_file.writelines(text_content)
+                for page_num, page_text in self.iter_text(pdf_file, workers=workers, pages=pages,
+                                                          backend=backend, result=result):
+                    text_file.write(f"--- PAGINA {page_num} ---\n")
+                    text_file.write(page_text)
+                    text_file.write("\n\n")
             
-            return True
+            return result
         except Exception as e:
             print(f"Errore durante l'estrazione del testo: {e}")
-            return False
+            return result.fail(e)
+    
+    def iter_text(self, pdf_file, workers=1, pages=None, window=None, backend=None, result=None):
+        """Generatore di tuple (numero pagina, testo) nell'ordine delle pagine
+
+        Con workers > 1 al massimo window pagine (default 4 per worker)
+        sono in elaborazione o in attesa di essere consumate. Con result
+        (OperationResult) l'esito di ogni pagina viene registrato e, in
+        modalità skip_bad_pages, le pagine fallite vengono saltate.
+        """
+        engine = self._backend_for('text', [pdf_file], backend)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers <= 1:
+            yield from engine.iter_text(pdf_file, pages, result)
+            return
+        
+        result = result if result is not None else OperationResult('text')
+        selection = PageSelector.coerce(pages).bind(probe_pdf(pdf_file)['num_pages'])
+        
+        window = window or workers * 4
+        executor = ProcessPoolExecutor(max_workers=workers,
+                                       initializer=_init_worker_reader,
+                                       initargs=(pdf_file, engine.name))
+        try:
+            in_flight = deque()
+            
+            def next_done():
+                done_page, future = in_flight.popleft()
+                text = None
+                with result.page(done_page):
+                    text, seconds = future.result()
+                if text is not None:
+                    # Tempo di estrazione nel worker, non di attesa del risultato
+                    result.pages[-1]['seconds'] = seconds
+                return done_page, text
+            
+            for page_num in selection:
+                in_flight.append((page_num, executor.submit(_extract_page_text_timed, page_num - 1)))
+                if len(in_flight) >= window:
+                    done_page, text = next_done()
+                    if text is not None:
+                        yield done_page, text
+            while in_flight:
+                done_page, text = next_done()
+                if text is not None:
+                    yield done_page, text
+        finally:
+            # Se il consumatore si ferma prima della fine annulla le pagine in coda
+            executor.shutdown(wait=True, cancel_futures=True)
     
-    def convert_images_to_pdf(self, image_files, output_path):
-        """Converte una lista di immagini in un singolo PDF"""
+    @cached_operation(inputs=['image_files'], output='output_path', ignore=['workers'])
+    def convert_images_to_pdf(self, image_files, output_path, target_dpi=None, workers=4):
+        """Converte una lista di immagini in un singolo PDF
+
+        Le immagini JPEG e JPEG 2000 vengono incorporate così come sono,
+        senza ricodifica; gli altri formati vengono decodificati da un pool
+        di thread. Le pagine sono scritte su disco una alla volta, con al
+        massimo 2 * workers immagini in memoria. Le TIFF multipagina vengono
+        espanse fotogramma per fotogramma.
+
+        La dimensione della pagina segue i DPI salvati nell'immagine (72 se
+        assenti): una scansione a 300 dpi diventa una pagina A4, non una
+        pagina di 34×49 pollici come con il salvataggio PDF di PIL.
+
+        Args:
+            target_dpi: se indicato, le immagini con risoluzione maggiore
+                vengono ridotte a questa risoluzione (richiede ricodifica)
+        """
         try:
-            images = []
+            if not image_files:
+                return True
             
+            frames = []
             for image_file in image_files:
-                img = Image.open(image_file)
-                # Converte in RGB se necessario
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                images.append(img)
-            
-            if images:
-                # Salva il primo come PDF e aggiungi gli altri
-                images[0].save(output_path, save_all=True, append_images=images[1:])
+                with Image.open(image_file) as img:
+                    frames.extend((image_file, i) for i in range(getattr(img, 'n_frames', 1)))
+            
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor, \
+                    StreamingPDFWriter(output_path, deduplicate=False) as stream_writer:
+                in_flight = deque()
+                for image_file, frame in frames:
+                    in_flight.append(executor.submit(_load_image_page, image_file, frame, target_dpi))
+                    if len(in_flight) >= 2 * max(1, workers):
+                        self._write_image_page(stream_writer, *in_flight.popleft().result())
+                while in_flight:
+                    self._write_image_page(stream_writer, *in_flight.popleft().result())
             
             return True
         except Exception as e:
             print(f"Errore durante la conversione delle immagini: {e}")
             return False
     
+    def _write_image_page(self, stream_writer, image_dict, image_data, width, height):
+        """Scrive una pagina che contiene solo l'immagine, a tutta pagina"""
+        image_number = stream_writer.write_stream(image_dict, image_data)
+        content_number = stream_writer.write_stream(
+            DictionaryObject(), f"q {width} 0 0 {height} 0 0 cm /Im0 Do Q".encode())
+        stream_writer.add_page_dict(DictionaryObject({
+            NameObject("/Type"): NameObject("/Page"),
+            NameObject("/MediaBox"): ArrayObject(
+                [NumberObject(0), NumberObject(0), FloatObject(width), FloatObject(height)]),
+            NameObject("/Resources"): DictionaryObject({
+                NameObject("/XObject"): DictionaryObject({
+                    NameObject("/Im0"): stream_writer.ref(image_number)}),
+            }),
+            NameObject("/Contents"): stream_writer.ref(content_number),
+        }))
+    
     def preview_pdf(self, pdf_file):
         """Apre il PDF con l'applicazione predefinita del sistema"""
         try:
@@ -230,21 +821,33 @@ class PDFManager:
             return False
     
     def get_pdf_info(self, pdf_file):
-        """Ottiene informazioni sul PDF (numero pagine, metadata, ecc.)"""
+        """Ottiene informazioni sul PDF (numero pagine, metadata, ecc.)
+
+        Legge solo xref, trailer e dizionari Info/XMP (vedi probe_pdf):
+        oltre ai metadati restituisce versione, dimensione del file,
+        cifratura e linearizzazione.
+        """
         try:
-            pdf_reader = PdfReader(pdf_file)
-            
-            info = {
-                'num_pages': len(pdf_reader.pages),
-                'title': pdf_reader.metadata.get('/Title', 'N/A') if pdf_reader.metadata else 'N/A',
-                'author': pdf_reader.metadata.get('/Author', 'N/A') if pdf_reader.metadata else 'N/A',
-                'subject': pdf_reader.metadata.get('/Subject', 'N/A') if pdf_reader.metadata else 'N/A',
-                'creator': pdf_reader.metadata.get('/Creator', 'N/A') if pdf_reader.metadata else 'N/A',
-                'producer': pdf_reader.metadata.get('/Producer', 'N/A') if pdf_reader.metadata else 'N/A',
-                'creation_date': pdf_reader.metadata.get('/CreationDate', 'N/A') if pdf_reader.metadata else 'N/A'
-            }
-            
-            return info
+            return probe_pdf(pdf_file)
         except Exception as e:
             print(f"Errore durante il recupero delle informazioni PDF: {e}")
-            return None
\ No newline at end of file
+            return None
+    
+    def inventory(self, root_dirs, cache_path=None, workers=None):
+        """Inventario di tutti i PDF in una o più cartelle (ricorsivo)
+
+        I risultati sono conservati in una cache SQLite (per default in
+        ~/.pdf_editor_pro/inventory.sqlite): le scansioni successive
+        rileggono solo i file con mtime o dimensione cambiati.
+        """
+        try:
+            if cache_path is None:
+                cache_dir = Path.home() / ".pdf_editor_pro"
+                cache_dir.mkdir(exist_ok=True)
+                cache_path = cache_dir / "inventory.sqlite"
+            
+            with PDFInventory(cache_path) as pdf_inventory:
+                return pdf_inventory.scan(root_dirs, workers=workers)
+        except Exception as e:
+            print(f"Errore durante l'inventario dei PDF: {e}")
+            return None
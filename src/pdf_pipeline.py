@@ -0,0 +1,245 @@
+"""
+PDF Editor - Pipeline di operazioni in memoria
+
+Compone più operazioni su un unico documento aperto in memoria (PyMuPDF
+tramite AdvancedPDFEditor): il PDF viene letto una volta e salvato una
+volta, senza file intermedi tra una fase e l'altra. Ogni fase riporta il
+proprio tempo.
+
+Esempio:
+    report = (PDFPipeline()
+              .rotate(90, pages="even")
+              .watermark("BOZZA")
+              .encrypt("segreta")
+              .run("contratto.pdf", "contratto_bozza.pdf"))
+
+La stessa pipeline come ricetta JSON (o YAML, se PyYAML è installato):
+    {"steps": [{"op": "rotate", "angle": 90, "pages": "even"},
+               {"op": "watermark", "text": "BOZZA"},
+               {"op": "encrypt", "password": "segreta"}]}
+
+Le ricette si eseguono anche in batch: pdf_batch.py pipeline --recipe ricetta.yaml
+"""
+import json
+import time
+
+import fitz
+
+from advanced_pdf_editor import AdvancedPDFEditor
+from page_selector import PageSelector
+from pdf_backends import rotation_plan
+from pdf_manager import stamp_watermark
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+def load_recipe(recipe):
+    """Carica una ricetta da dict, percorso JSON o percorso YAML"""
+    if isinstance(recipe, dict):
+        return recipe
+    with open(recipe, 'r', encoding='utf-8') as f:
+        if str(recipe).lower().endswith(('.yaml', '.yml')):
+            if yaml is None:
+                raise ValueError("Le ricette YAML richiedono PyYAML (pip install pyyaml)")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def _stage_merge(editor, files):
+    for pdf_file in files:
+        with fitz.open(pdf_file) as source:
+            editor.current_doc.insert_pdf(source)
+
+
+def _stage_rotate(editor, angle, pages=None):
+    doc = editor.current_doc
+    angle_for_page = rotation_plan(angle, pages, doc.page_count)
+    for page in doc:
+        page_angle = angle_for_page(page.number + 1)
+        if page_angle:
+            page.set_rotation((page.rotation + page_angle) % 360)
+
+
+def _stage_extract(editor, pages):
+    doc = editor.current_doc
+    doc.select(list(PageSelector.coerce(pages).bind(doc.page_count).indices()))
+
+
+def _stage_watermark(editor, text, pages=None, font_size=50, opacity=0.3, angle=45):
+    doc = editor.current_doc
+    stamp_watermark(doc, PageSelector.coerce(pages).bind(doc.page_count).indices(),
+                    text, font_size, opacity, angle)
+
+
+def _stage_redact(editor, terms=(), areas=()):
+    for term in terms:
+        for page_index, rect in editor.search_text(term):
+            if not editor.redact_text(page_index, rect):
+                raise RuntimeError(f"Redaction di '{term}' non riuscita")
+    for area in areas:
+        # Selezione di pagine da 1 (un intero sarebbe un indice da 0)
+        if not editor.redact_text(str(area.get('pages', 'all')), area['rect']):
+            raise RuntimeError("Redaction dell'area non riuscita")
+
+
+def _security(editor):
+    # Import locale: pdf_security carica anche l'interfaccia Qt
+    from pdf_security import PDFSecurity
+    return PDFSecurity(editor)
+
+
+def _check(result):
+    success, message = result
+    if not success:
+        raise RuntimeError(message)
+
+
+def _stage_stamp(editor, text="CONFIDENTIAL", pages=None, position="top-right"):
+    security = _security(editor)
+    for index in PageSelector.coerce(pages).bind(editor.get_page_count()).indices():
+        _check(security.add_security_stamp(index, text, position))
+
+
+def _stage_remove_metadata(editor):
+    _check(_security(editor).remove_metadata())
+
+
+def _stage_encrypt(editor, password, owner_password=None, permissions=None):
+    # Applicata al salvataggio, dopo tutte le altre fasi
+    _check(_security(editor).encrypt_pdf(password, owner_password, permissions))
+
+
+STAGES = {
+    'merge': _stage_merge,
+    'rotate': _stage_rotate,
+    'extract': _stage_extract,
+    'watermark': _stage_watermark,
+    'redact': _stage_redact,
+    'stamp': _stage_stamp,
+    'remove_metadata': _stage_remove_metadata,
+    'encrypt': _stage_encrypt,
+}
+
+
+class PDFPipeline:
+    """Sequenza di operazioni eseguite su un solo documento in memoria"""
+
+    def __init__(self, steps=None):
+        self.steps = []
+        for step in steps or []:
+            step = dict(step)
+            self.add(step.pop('op'), **step)
+
+    @classmethod
+    def from_recipe(cls, recipe):
+        """Crea la pipeline da una ricetta (dict o file JSON/YAML con chiave "steps")"""
+        return cls(load_recipe(recipe).get('steps', []))
+
+    def to_recipe(self):
+        return {'steps': [dict(step, op=operation) for operation, step in self.steps]}
+
+    def add(self, operation, **params):
+        """Aggiunge una fase (vedi STAGES per le operazioni disponibili)"""
+        if operation not in STAGES:
+            raise ValueError(f"Operazione sconosciuta: '{operation}' (disponibili: {', '.join(STAGES)})")
+        self.steps.append((operation, params))
+        return self
+
+    def merge(self, pdf_files):
+        """Accoda le pagine di altri PDF al documento"""
+        return self.add('merge', files=list(pdf_files))
+
+    def rotate(self, angle, pages=None):
+        return self.add('rotate', angle=angle, pages=pages)
+
+    def extract(self, pages):
+        """Mantiene solo le pagine selezionate, nell'ordine dell'espressione"""
+        return self.add('extract', pages=pages)
+
+    def watermark(self, text, pages=None, font_size=50, opacity=0.3, angle=45):
+        return self.add('watermark', text=text, pages=pages, font_size=font_size,
+                        opacity=opacity, angle=angle)
+
+    def redact(self, terms=(), areas=()):
+        """Rimuove i testi indicati e le aree [{"pages", "rect"}]"""
+        return self.add('redact', terms=list(terms), areas=list(areas))
+
+    def stamp(self, text="CONFIDENTIAL", pages=None, position="top-right"):
+        return self.add('stamp', text=text, pages=pages, position=position)
+
+    def remove_metadata(self):
+        return self.add('remove_metadata')
+
+    def encrypt(self, password, owner_password=None, permissions=None):
+        return self.add('encrypt', password=password, owner_password=owner_password,
+                        permissions=permissions)
+
+    def run(self, source, output_path):
+        """Esegue la pipeline e salva il risultato
+
+        Args:
+            source: PDF di partenza (None = documento vuoto, es. per
+                una pipeline che inizia con merge)
+            output_path: PDF di destinazione
+
+        Returns:
+            Lista di dict (fase, secondi, pagine) comprese lettura e
+            salvataggio, oppure None in caso di errore
+        """
+        editor = AdvancedPDFEditor()
+        report = []
+        try:
+            start_time = time.perf_counter()
+            if source is None:
+                editor.current_doc = fitz.open()
+            elif not editor.open_pdf(source):
+                return None
+            report.append(self._timing('load', start_time, editor))
+
+            for operation, params in self.steps:
+                start_time = time.perf_counter()
+                STAGES[operation](editor, **params)
+                report.append(self._timing(operation, start_time, editor))
+
+            start_time = time.perf_counter()
+            if editor.get_page_count() == 0:
+                raise ValueError("Il documento risultante non ha pagine")
+            # garbage elimina gli oggetti non più usati (es. contenuto redatto)
+            if not editor.save_pdf(output_path, garbage=2):
+                return None
+            report.append(self._timing('save', start_time, editor))
+            return report
+        except Exception as e:
+            print(f"Errore nella pipeline: {e}")
+            return None
+        finally:
+            editor.close_pdf()
+
+    def _timing(self, stage, start_time, editor):
+        return {
+            'stage': stage,
+            'seconds': time.perf_counter() - start_time,
+            'pages': editor.get_page_count(),
+        }
+
+
+def format_report(report):
+    """Riepilogo testuale dei tempi di una pipeline"""
+    lines = [f"{entry['stage']:<16} {entry['seconds'] * 1000:9.1f} ms  {entry['pages']:>6} pagine"
+             for entry in report]
+    total = sum(entry['seconds'] for entry in report)
+    lines.append(f"{'totale':<16} {total * 1000:9.1f} ms")
+    return "\n".join(lines)
+
+
+def run_recipe(recipe, source=None, output_path=None):
+    """Esegue una ricetta; input e output possono stare nella ricetta stessa"""
+    recipe = load_recipe(recipe)
+    source = source if source is not None else recipe.get('input')
+    output_path = output_path or recipe.get('output')
+    if not output_path:
+        raise ValueError("Percorso di output mancante")
+    return PDFPipeline.from_recipe(recipe).run(source, output_path)
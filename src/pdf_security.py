@@ -7,6 +7,8 @@ from PySide6.QtCore import Qt
 from PySide6.QtGui import QFont
 from theme_manager import theme_manager
 from user_config import user_config
+from instrumentation import instrumented
+from advanced_pdf_editor import modifies_pages
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
@@ -17,6 +19,7 @@ import base64
 import hashlib
 from datetime import datetime
 
+@instrumented('PDFSecurity')
 class PDFSecurity:
     def __init__(self, pdf_editor):
         self.pdf_editor = pdf_editor
@@ -35,25 +38,20 @@ class PDFSecurity:
                 permissions = (
                     fitz.PDF_PERM_PRINT |
                     fitz.PDF_PERM_COPY |
-                    fitz.PDF_PERM_EDIT |
+                    fitz.PDF_PERM_MODIFY |
                     fitz.PDF_PERM_ANNOTATE
                 )
             
-            # Cripta il documento
-            self.pdf_editor.current_doc.authenticate(owner_password)
+            # La crittografia viene applicata al salvataggio del documento
+            if not self.pdf_editor.encrypt_pdf(user_password, permissions, owner_password):
+                return False, "Errore nella crittografia"
             
-            # Imposta la crittografia
-            encrypt_data = {
-                "user_pw": user_password,
-                "owner_pw": owner_password,
-                "permissions": permissions
-            }
-            
-            return True, "PDF crittografato correttamente"
+            return True, "PDF crittografato correttamente: la protezione sarà applicata al salvataggio"
             
         except Exception as e:
             return False, f"Errore nella crittografia: {str(e)}"
     
+    @modifies_pages(None)
     def decrypt_pdf(self, password):
         """Decripta il PDF"""
         if not self.pdf_editor.current_doc:
@@ -84,7 +82,7 @@ class PDFSecurity:
             if permissions_dict.get('copy', False):
                 permissions |= fitz.PDF_PERM_COPY
             if permissions_dict.get('edit', False):
-                permissions |= fitz.PDF_PERM_EDIT
+                permissions |= fitz.PDF_PERM_MODIFY
             if permissions_dict.get('annotate', False):
                 permissions |= fitz.PDF_PERM_ANNOTATE
             if permissions_dict.get('form_fill', False):
@@ -120,7 +118,7 @@ class PDFSecurity:
                 info['permissions'] = {
                     'print': bool(perms & fitz.PDF_PERM_PRINT),
                     'copy': bool(perms & fitz.PDF_PERM_COPY),
-                    'edit': bool(perms & fitz.PDF_PERM_EDIT),
+                    'edit': bool(perms & fitz.PDF_PERM_MODIFY),
                     'annotate': bool(perms & fitz.PDF_PERM_ANNOTATE),
                     'form_fill': bool(perms & fitz.PDF_PERM_FORM),
                     'accessibility': bool(perms & fitz.PDF_PERM_ACCESSIBILITY),
@@ -134,6 +132,7 @@ class PDFSecurity:
             print(f"Errore nel recupero info sicurezza: {e}")
             return None
     
+    @modifies_pages(None)
     def add_digital_signature(self, signature_field, certificate_path=None, private_key_path=None):
         """Aggiunge una firma digitale (placeholder - richiede certificato)"""
         if not self.pdf_editor.current_doc:
@@ -226,6 +225,7 @@ class PDFSecurity:
             print(f"Errore nel salvataggio delle chiavi: {e}")
             return False
     
+    @modifies_pages(None)
     def create_watermark_security(self, text, opacity=0.3, angle=45):
         """Crea un watermark di sicurezza su tutte le pagine"""
         if not self.pdf_editor.current_doc:
@@ -267,14 +267,14 @@ class PDFSecurity:
         try:
             # Imposta metadati vuoti
             clean_metadata = {
-                "/Title": "",
-                "/Author": "",
-                "/Subject": "",
-                "/Keywords": "",
-                "/Creator": "",
-                "/Producer": "PDF Editor Pro",
-                "/CreationDate": "",
-                "/ModDate": ""
+                "title": "",
+                "author": "",
+                "subject": "",
+                "keywords": "",
+                "creator": "",
+                "producer": "PDF Editor Pro",
+                "creationDate": "",
+                "modDate": ""
             }
             
             self.pdf_editor.current_doc.set_metadata(clean_metadata)
@@ -284,6 +284,7 @@ class PDFSecurity:
         except Exception as e:
             return False, f"Errore nella rimozione dei metadati: {str(e)}"
     
+    @modifies_pages()
     def add_security_stamp(self, page_num, stamp_text="CONFIDENTIAL", position="top-right"):
         """Aggiunge un timbro di sicurezza alla pagina"""
         if not self.pdf_editor.current_doc:
@@ -0,0 +1,312 @@
+"""
+PDF Editor - Scrittura PDF in streaming
+
+Scrive gli oggetti direttamente su disco man mano che vengono prodotti,
+invece di tenere l'intero documento in memoria fino a write().
+Gli oggetti importati da altri PDF vengono deduplicati per hash, così
+font, profili ICC e immagini condivisi tra più file vengono scritti una sola volta.
+"""
+import hashlib
+import io
+import os
+
+from pypdf.generic import (ArrayObject, DictionaryObject, IndirectObject,
+                           NameObject, NumberObject, StreamObject)
+
+PDF_HEADER = b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n"
+
+# Chiavi di pagina che legano la pagina al documento di origine
+# (albero delle pagine, struttura logica, article threads)
+EXCLUDED_PAGE_KEYS = ("/Parent", "/StructParents", "/B")
+
+
+def serialize_object(obj):
+    """Serializza un oggetto pypdf (non stream) in bytes"""
+    buffer = io.BytesIO()
+    obj.write_to_stream(buffer)
+    return buffer.getvalue()
+
+
+def serialize_stream(stream_dict, data):
+    """Serializza un dizionario di stream e i suoi dati grezzi (già codificati)"""
+    stream_dict = DictionaryObject(stream_dict)
+    stream_dict[NameObject("/Length")] = NumberObject(len(data))
+    return serialize_object(stream_dict) + b"\nstream\n" + data + b"\nendstream"
+
+
+class StreamingPDFWriter:
+    """Writer PDF che scrive ogni oggetto su disco appena è completo"""
+
+    def __init__(self, output_path, deduplicate=True):
+        self.output_path = output_path
+        self.deduplicate = deduplicate
+        self._file = open(output_path, 'wb')
+        self._file.write(PDF_HEADER)
+        self._offsets = [None]  # L'oggetto 0 è sempre libero
+        self._digests = {}
+        self._page_numbers = []
+        # Mappa (idnum, generazione) del reader corrente -> numero oggetto in uscita
+        self._ref_map = {}
+        self._in_progress = {}
+        self._current_reader = None
+        self.catalog_number = self.reserve()
+        self.pages_number = self.reserve()
+        self.stats = {'objects_written': 0, 'objects_deduplicated': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+    @property
+    def page_count(self):
+        return len(self._page_numbers)
+
+    def reserve(self):
+        """Riserva un numero di oggetto da scrivere in seguito"""
+        self._offsets.append(None)
+        return len(self._offsets) - 1
+
+    def ref(self, number):
+        """Restituisce un riferimento indiretto a un oggetto del file in uscita"""
+        return IndirectObject(number, 0, None)
+
+    def write_raw(self, number, body):
+        """Scrive il corpo serializzato di un oggetto con il numero dato"""
+        self._offsets[number] = self._file.tell()
+        self._file.write(b"%d 0 obj\n" % number)
+        self._file.write(body)
+        self._file.write(b"\nendobj\n")
+        self.stats['objects_written'] += 1
+
+    def write_object(self, obj, number=None):
+        """Scrive un oggetto pypdf e ne restituisce il numero"""
+        if number is None:
+            number = self.reserve()
+        self.write_raw(number, serialize_object(obj))
+        return number
+
+    def write_stream(self, stream_dict, data, number=None):
+        """Scrive uno stream (dizionario + dati già codificati) e ne restituisce il numero"""
+        if number is None:
+            number = self.reserve()
+        self.write_raw(number, serialize_stream(stream_dict, data))
+        return number
+
+    def add_page_dict(self, page_dict, number=None):
+        """Scrive un dizionario di pagina e lo aggiunge all'albero delle pagine"""
+        page_dict[NameObject("/Parent")] = self.ref(self.pages_number)
+        number = self.write_object(page_dict, number)
+        self._page_numbers.append(number)
+        return number
+
+    def add_pages_from_reader(self, reader):
+        """Copia tutte le pagine di un PdfReader, scrivendole su disco una alla volta"""
+        self._begin_reader(reader)
+        try:
+            # Riserva prima i numeri delle pagine: annotazioni e destinazioni
+            # che puntano ad altre pagine non devono ricopiare l'intero albero
+            page_numbers = []
+            for page in reader.pages:
+                number = self.reserve()
+                self._ref_map[self._ref_key(page.indirect_reference)] = number
+                page_numbers.append(number)
+
+            for page, number in zip(reader.pages, page_numbers):
+                page_dict = DictionaryObject()
+                for key, value in page.items():
+                    if key in EXCLUDED_PAGE_KEYS:
+                        continue
+                    page_dict[NameObject(key)] = self._import_value(value)
+                self.add_page_dict(page_dict, number)
+        finally:
+            self._end_reader()
+
+    def close(self):
+        """Scrive albero delle pagine, catalogo, xref e trailer, poi chiude il file"""
+        pages = DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): ArrayObject(self.ref(n) for n in self._page_numbers),
+            NameObject("/Count"): NumberObject(len(self._page_numbers)),
+        })
+        self.write_object(pages, self.pages_number)
+        catalog = DictionaryObject({
+            NameObject("/Type"): NameObject("/Catalog"),
+            NameObject("/Pages"): self.ref(self.pages_number),
+        })
+        self.write_object(catalog, self.catalog_number)
+
+        xref_offset = self._file.tell()
+        size = len(self._offsets)
+        self._file.write(b"xref\n0 %d\n" % size)
+        self._file.write(b"0000000000 65535 f \n")
+        for offset in self._offsets[1:]:
+            if offset is None:
+                # Numero riservato ma mai scritto: lo segna come libero
+                self._file.write(b"0000000000 00001 f \n")
+            else:
+                self._file.write(b"%010d 00000 n \n" % offset)
+        self._file.write(b"trailer\n<< /Size %d /Root %d 0 R >>\n" % (size, self.catalog_number))
+        self._file.write(b"startxref\n%d\n%%%%EOF\n" % xref_offset)
+        self._file.close()
+
+    # --- Importazione oggetti da un reader ---
+
+    def _begin_reader(self, reader):
+        self._current_reader = reader
+        self._ref_map = {}
+        self._in_progress = {}
+
+    def _end_reader(self):
+        # La mappa dei riferimenti vale solo per il reader corrente: liberarla
+        # mantiene la memoria limitata anche unendo migliaia di file
+        self._current_reader = None
+        self._ref_map = {}
+        self._in_progress = {}
+
+    def _ref_key(self, ref):
+        return (ref.idnum, ref.generation)
+
+    def _import_value(self, value):
+        """Converte un valore del reader rimappando i riferimenti indiretti"""
+        if isinstance(value, IndirectObject):
+            return self.ref(self._import_ref(value))
+        if isinstance(value, StreamObject):
+            # Gli stream sono sempre indiretti; uno stream diretto non è valido
+            return self.ref(self._write_imported(value, None))
+        if isinstance(value, DictionaryObject):
+            return DictionaryObject(
+                (NameObject(k), self._import_value(v)) for k, v in value.items())
+        if isinstance(value, ArrayObject):
+            return ArrayObject(self._import_value(v) for v in value)
+        return value
+
+    def _import_ref(self, ref):
+        key = self._ref_key(ref)
+        number = self._ref_map.get(key)
+        if number is not None:
+            return number
+        if key in self._in_progress:
+            # Riferimento ciclico: riserva subito un numero e rinuncia alla
+            # deduplicazione di questo oggetto
+            if self._in_progress[key] is None:
+                self._in_progress[key] = self.reserve()
+            return self._in_progress[key]
+
+        self._in_progress[key] = None
+        number = self._write_imported(ref.get_object(), key)
+        self._ref_map[key] = number
+        return number
+
+    def _write_imported(self, obj, key):
+        if isinstance(obj, StreamObject):
+            stream_dict = DictionaryObject(
+                (NameObject(k), self._import_value(v))
+                for k, v in obj.items() if k != "/Length")
+            body = serialize_stream(stream_dict, obj._data)
+        else:
+            body = serialize_object(self._import_value(obj))
+
+        reserved = self._in_progress.pop(key, None) if key is not None else None
+        if reserved is not None:
+            self.write_raw(reserved, body)
+            return reserved
+
+        if not self.deduplicate:
+            number = self.reserve()
+            self.write_raw(number, body)
+            return number
+
+        digest = hashlib.sha256(body).digest()
+        number = self._digests.get(digest)
+        if number is not None:
+            self.stats['objects_deduplicated'] += 1
+            return number
+        number = self.reserve()
+        self.write_raw(number, body)
+        self._digests[digest] = number
+        return number
+
+
+def _find_startxref(pdf_file):
+    """Legge dalla coda del file l'offset dell'ultima sezione xref"""
+    with open(pdf_file, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+        f.seek(max(0, file_size - 2048))
+        tail = f.read()
+        position = tail.rfind(b"startxref")
+        if position < 0:
+            raise ValueError("startxref non trovato: file PDF non valido")
+        xref_offset = int(tail[position + len(b"startxref"):].split()[0])
+        f.seek(xref_offset)
+        uses_xref_stream = not f.read(4).startswith(b"xref")
+    return xref_offset, uses_xref_stream, file_size
+
+
+def append_incremental_update(pdf_file, trailer, objects):
+    """Aggiunge in coda al file un aggiornamento incrementale
+
+    Vengono scritti solo gli oggetti modificati, una nuova sezione xref
+    (tabella o stream, come nel file originale) e un trailer con /Prev:
+    il resto del file non viene né letto né riscritto.
+
+    Args:
+        pdf_file: PDF da aggiornare (viene modificato sul posto)
+        trailer: trailer del PdfReader del file originale
+        objects: lista di tuple (IndirectObject originale, nuovo oggetto)
+    """
+    prev_offset, uses_xref_stream, file_size = _find_startxref(pdf_file)
+    size = int(trailer["/Size"])
+
+    with open(pdf_file, 'ab') as f:
+        position = file_size
+        f.write(b"\n")
+        position += 1
+        entries = {}
+        for ref, obj in objects:
+            entries[ref.idnum] = (position, ref.generation)
+            body = (b"%d %d obj\n" % (ref.idnum, ref.generation)
+                    + serialize_object(obj) + b"\nendobj\n")
+            f.write(body)
+            position += len(body)
+
+        new_trailer = DictionaryObject()
+        for key in ("/Root", "/Info", "/ID"):
+            if key in trailer:
+                new_trailer[NameObject(key)] = trailer.raw_get(key)
+        new_trailer[NameObject("/Prev")] = NumberObject(prev_offset)
+        xref_offset = position
+
+        if uses_xref_stream:
+            # Lo stream xref occupa un nuovo numero di oggetto
+            xref_number = size
+            entries[xref_number] = (xref_offset, 0)
+            numbers = sorted(entries)
+            offset_width = max(4, (xref_offset.bit_length() + 7) // 8)
+            data = b"".join(
+                b"\x01" + entries[n][0].to_bytes(offset_width, 'big')
+                + entries[n][1].to_bytes(2, 'big') for n in numbers)
+            new_trailer[NameObject("/Type")] = NameObject("/XRef")
+            new_trailer[NameObject("/Size")] = NumberObject(size + 1)
+            new_trailer[NameObject("/W")] = ArrayObject(
+                [NumberObject(1), NumberObject(offset_width), NumberObject(2)])
+            new_trailer[NameObject("/Index")] = ArrayObject(
+                NumberObject(v) for n in numbers for v in (n, 1))
+            f.write(b"%d 0 obj\n" % xref_number)
+            f.write(serialize_stream(new_trailer, data))
+            f.write(b"\nendobj\n")
+        else:
+            new_trailer[NameObject("/Size")] = NumberObject(size)
+            # La sottosezione dell'oggetto 0 evita che alcuni lettori
+            # interpretino la tabella come "non indicizzata da zero"
+            f.write(b"xref\n0 1\n0000000000 65535 f \n")
+            for n in sorted(entries):
+                f.write(b"%d 1\n%010d %05d n \n" % (n, entries[n][0], entries[n][1]))
+            f.write(b"trailer\n" + serialize_object(new_trailer) + b"\n")
+
+        f.write(b"startxref\n%d\n%%%%EOF\n" % xref_offset)
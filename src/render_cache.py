@@ -0,0 +1,88 @@
+"""
+PDF Editor - Cache in memoria dei render delle pagine
+
+AdvancedPDFEditor.get_page_image e get_page_pixmap conservano qui le
+immagini già renderizzate: sfogliando il documento o ridisegnando la finestra la
+stessa pagina allo stesso zoom non viene rasterizzata di nuovo.
+
+La chiave contiene la revisione della pagina, incrementata da ogni
+metodo che la modifica (vedi advanced_pdf_editor.modifies_pages): dopo
+una modifica la chiave cambia e il render vecchio non viene più usato.
+La cache ha un limite in byte; superato il limite vengono eliminate le
+immagini usate meno di recente (LRU).
+"""
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_MB = 128
+
+
+def image_size(image):
+    """Memoria occupata dai pixel di un'immagine PIL o di un fitz.Pixmap, in byte"""
+    if hasattr(image, 'stride'):
+        return image.stride * image.height
+    return image.width * image.height * len(image.getbands())
+
+
+class RenderCache:
+    """Cache LRU di immagini con limite di memoria, condivisibile tra thread"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._entries = OrderedDict()  # chiave -> (immagine, byte)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Immagine in cache per la chiave, o None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def put(self, key, image):
+        size = image_size(image)
+        if size > self.max_bytes:
+            return  # Non entrerebbe comunque nella cache
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._entries[key] = (image, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+                self.stats['evictions'] += 1
+
+    def discard(self, predicate):
+        """Elimina le voci la cui chiave soddisfa predicate (es. un documento chiuso)"""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self.size -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __contains__(self, key):
+        """Presenza di una voce, senza contare un hit né aggiornare l'ordine LRU"""
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def info(self):
+        """Statistiche: hit, miss, eliminazioni, voci, byte occupati e hit rate"""
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return dict(self.stats, entries=len(self._entries), size=self.size,
+                        max_bytes=self.max_bytes,
+                        hit_rate=self.stats['hits'] / lookups if lookups else 0.0)
@@ -0,0 +1,288 @@
+"""
+PDF Editor - Cache dei risultati indirizzata per contenuto
+
+Le operazioni deterministiche (rotazione, watermark, estrazione del
+testo, render delle pagine...) producono sempre lo stesso risultato a
+parità di input e parametri. ResultCache conserva su disco i file
+prodotti con chiave sha256(operazione, parametri, hash dei byte degli
+input): rieseguendo la stessa operazione su un file invariato l'output
+viene copiato dalla cache senza ricalcolarlo.
+
+La cache ha una dimensione massima: superata la soglia vengono eliminate
+le voci usate meno di recente (LRU). L'indice è un database SQLite, per
+cui più processi (es. i worker di pdf_batch) possono condividerla.
+
+Uso (opzionale, disattivato per default):
+    manager = PDFManager(cache=True)             # ~/.pdf_editor_pro/result_cache
+    manager = PDFManager(cache=ResultCache(cartella, max_bytes=2 * 1024**3))
+"""
+import functools
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+
+from operation_result import OperationResult
+
+DEFAULT_CACHE_DIR = Path.home() / ".pdf_editor_pro" / "result_cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _json_default(value):
+    # PageSelector, Path e simili entrano nella chiave come stringa
+    return str(value)
+
+
+class ResultCache:
+    """Cache su disco dei file prodotti dalle operazioni, con limite di dimensione e LRU"""
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.entries_dir = self.cache_dir / "entries"
+        self.entries_dir.mkdir(parents=True, exist_ok=True)
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        self._digests = {}  # (percorso, dimensione, mtime) -> sha256 dei byte
+
+        self._connection = sqlite3.connect(str(self.cache_dir / "index.sqlite"), timeout=30)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, operation TEXT, files TEXT, result TEXT, "
+                "size INTEGER, created REAL, last_access REAL, hits INTEGER DEFAULT 0)")
+
+    @classmethod
+    def coerce(cls, cache):
+        """Converte il parametro cache dei motori: None/False, True o un'istanza"""
+        if cache is None or cache is False:
+            return None
+        if cache is True:
+            return cls()
+        return cache
+
+    def close(self):
+        self._connection.close()
+
+    def file_digest(self, path):
+        """sha256 dei byte di un file (memorizzato finché dimensione e mtime non cambiano)"""
+        stat = os.stat(path)
+        memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        digest = self._digests.get(memo_key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+            self._digests[memo_key] = digest
+        return digest
+
+    def key(self, operation, digests, params):
+        """Chiave della voce: operazione, parametri e hash degli input"""
+        payload = json.dumps([operation, list(digests), params], sort_keys=True, default=_json_default)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def lookup(self, key):
+        """Restituisce (file, risultato) della voce, o None; aggiorna LRU e statistiche"""
+        row = self._connection.execute(
+            "SELECT files, result FROM entries WHERE key = ?", (key,)).fetchone()
+        entry_dir = self.entries_dir / key
+        if row is None or not entry_dir.is_dir():
+            self.stats['misses'] += 1
+            return None
+        with self._connection:
+            self._connection.execute(
+                "UPDATE entries SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                (time.time(), key))
+        self.stats['hits'] += 1
+        files = [(name, entry_dir / str(i)) for i, name in enumerate(json.loads(row[0]))]
+        return files, json.loads(row[1])
+
+    def restore(self, key, destination_for):
+        """Copia i file della voce nelle destinazioni indicate da destination_for(nome)
+
+        Returns:
+            (True, risultato) se la voce esiste, altrimenti (False, None)
+        """
+        entry = self.lookup(key)
+        if entry is None:
+            return False, None
+        files, result = entry
+        for name, stored in files:
+            destination = destination_for(name)
+            os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+            shutil.copyfile(stored, destination)
+        return True, result
+
+    def get_bytes(self, key):
+        """Contenuto della prima voce come byte, o None"""
+        entry = self.lookup(key)
+        if entry is None:
+            return None
+        files, _ = entry
+        return files[0][1].read_bytes()
+
+    def put(self, key, operation, files, result=True):
+        """Memorizza i file [(nome, percorso)] prodotti da un'operazione"""
+        tmp_dir = self.cache_dir / f"tmp-{uuid.uuid4().hex}"
+        tmp_dir.mkdir()
+        try:
+            size = 0
+            for i, (_, path) in enumerate(files):
+                shutil.copyfile(path, tmp_dir / str(i))
+                size += os.path.getsize(path)
+            self._commit(key, operation, [name for name, _ in files], result, size, tmp_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def put_bytes(self, key, operation, data, name="data"):
+        """Memorizza un risultato già in memoria (es. il render di una pagina)"""
+        tmp_dir = self.cache_dir / f"tmp-{uuid.uuid4().hex}"
+        tmp_dir.mkdir()
+        try:
+            (tmp_dir / "0").write_bytes(data)
+            self._commit(key, operation, [name], True, len(data), tmp_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _commit(self, key, operation, names, result, size, tmp_dir):
+        if size > self.max_bytes:
+            return  # Non entrerebbe comunque nella cache
+        entry_dir = self.entries_dir / key
+        try:
+            # La rinomina è atomica: un altro processo vede la voce completa o niente
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            return  # Voce già scritta da un altro processo
+        now = time.time()
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries (key, operation, files, result, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, operation, json.dumps(names), json.dumps(result, default=_json_default),
+                 size, now, now))
+        self.stats['stores'] += 1
+        self.evict()
+
+    def evict(self, max_bytes=None):
+        """Elimina le voci usate meno di recente finché la cache supera max_bytes"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        total = self.total_size()
+        if total <= max_bytes:
+            return
+        rows = self._connection.execute(
+            "SELECT key, size FROM entries ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if total <= max_bytes:
+                break
+            with self._connection:
+                self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            shutil.rmtree(self.entries_dir / key, ignore_errors=True)
+            total -= size
+            self.stats['evictions'] += 1
+
+    def total_size(self):
+        return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def clear(self):
+        self.evict(max_bytes=0)
+
+    def info(self):
+        """Statistiche della sessione più numero di voci e dimensione su disco"""
+        count = self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = self.stats['hits'] + self.stats['misses']
+        return dict(self.stats, entries=count, size=self.total_size(), max_bytes=self.max_bytes,
+                    hit_rate=self.stats['hits'] / lookups if lookups else 0.0)
+
+
+def cached_operation(inputs, output=None, output_dir=None, ignore=()):
+    """Decoratore per i metodi file -> file che usano self.cache (se impostata)
+
+    Args:
+        inputs: nomi degli argomenti con i file di input (percorso o lista)
+        output: nome dell'argomento con il file di output
+        output_dir: nome dell'argomento con la cartella di output; vengono
+            memorizzati i file creati o modificati nella cartella
+        ignore: argomenti che non cambiano il risultato (es. workers)
+    """
+    def decorator(method):
+        signature = inspect.signature(method)
+        excluded = set(inputs) | {output, output_dir, 'self'} | set(ignore)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = getattr(self, 'cache', None)
+            if cache is None:
+                return method(self, *args, **kwargs)
+
+            try:
+                bound = signature.bind(self, *args, **kwargs)
+                bound.apply_defaults()
+                arguments = bound.arguments
+                input_files = []
+                for name in inputs:
+                    value = arguments[name]
+                    input_files.extend([value] if isinstance(value, (str, os.PathLike)) else value)
+                params = {name: value for name, value in arguments.items() if name not in excluded}
+                if output_dir is not None:
+                    # I nomi dei file prodotti dipendono dai nomi degli input
+                    params['_input_names'] = [os.path.basename(path) for path in input_files]
+                key = cache.key(method.__name__, [cache.file_digest(path) for path in input_files],
+                                params)
+                if output is not None:
+                    target = arguments[output]
+                    hit, result = cache.restore(key, lambda name: target)
+                else:
+                    target = arguments[output_dir]
+                    hit, result = cache.restore(key, lambda name: os.path.join(target, name))
+                if hit:
+                    if isinstance(result, dict) and 'operation_result' in result:
+                        result = OperationResult.from_dict(result['operation_result'])
+                        result.cached = True
+                    return result
+            except Exception as e:
+                print(f"Cache non disponibile per {method.__name__}: {e}")
+                return method(self, *args, **kwargs)
+
+            before = _snapshot(target) if output_dir is not None else None
+            result = method(self, *args, **kwargs)
+            # Gli output parziali (pagine saltate) non vengono memorizzati
+            if result and getattr(result, 'status', 'ok') == 'ok':
+                try:
+                    if output is not None:
+                        files = [(os.path.basename(target), target)]
+                    else:
+                        after = _snapshot(target)
+                        files = [(name, os.path.join(target, name)) for name in sorted(after)
+                                 if before.get(name) != after[name]]
+                    if isinstance(result, OperationResult):
+                        stored = {'operation_result': result.to_dict()}
+                    else:
+                        stored = result
+                    cache.put(key, method.__name__, files, stored)
+                except Exception as e:
+                    print(f"Errore nel salvataggio in cache: {e}")
+            return result
+
+        return wrapper
+    return decorator
+
+
+def _snapshot(directory):
+    """Nome -> (dimensione, mtime) dei file di una cartella"""
+    if not os.path.isdir(directory):
+        return {}
+    snapshot = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file():
+                stat = entry.stat()
+                snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
@@ -0,0 +1,190 @@
+"""
+PDF Editor - Miniature delle pagine per il pannello laterale
+
+ThumbnailModel fornisce le miniature a una QListView. La vista chiede i
+dati solo degli elementi visibili (con uniformItemSizes non misura gli
+altri): anche con migliaia di pagine la lista si riempie subito e le
+miniature vengono create solo per le pagine che scorrono sullo schermo,
+nel pool di processi di PageRenderer. Finché arrivano viene mostrato un
+segnaposto.
+
+Le miniature delle pagine non modificate vengono conservate nella
+ResultCache su disco con chiave hash del contenuto del file e pagina:
+riaprendo lo stesso documento, anche con un altro nome, compaiono
+subito senza renderizzarle di nuovo. L'hash di un file di centinaia di
+MB richiede tempo: viene calcolato in un thread e fino ad allora la
+chiave usa percorso, dimensione e data di modifica del file.
+
+Uso:
+    model = ThumbnailModel(editor, renderer, cache=True)
+    view.setModel(model)
+    model.reload()      # dopo aver aperto o chiuso un documento
+    model.refresh()     # dopo una modifica
+"""
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt, Signal
+from PySide6.QtGui import QColor, QImage
+
+from result_cache import ResultCache
+
+THUMBNAIL_WIDTH = 120
+
+# Miniature tenute in memoria (le altre restano nella cache su disco)
+MAX_THUMBNAILS_IN_MEMORY = 500
+
+
+class ThumbnailModel(QAbstractListModel):
+    """Modello delle pagine del documento aperto nell'editor, con le miniature"""
+
+    _digest_finished = Signal(object, object)  # (percorso, dimensione, mtime), future
+
+    def __init__(self, editor, renderer, cache=None, width=THUMBNAIL_WIDTH, parent=None):
+        """
+        Args:
+            editor: AdvancedPDFEditor del documento
+            renderer: PageRenderer che crea le miniature in background
+            cache: ResultCache per le miniature su disco; True = cartella predefinita
+            width: larghezza delle miniature in pixel
+        """
+        super().__init__(parent)
+        self.editor = editor
+        self.renderer = renderer
+        self.cache = ResultCache.coerce(cache)
+        self.width = width
+        self._images = OrderedDict()  # chiave del render -> QImage
+        self._file_key = None  # (percorso, dimensione, mtime) del file aperto
+        self._digest = None
+        self._hasher = None  # Thread dell'hash, creato al primo documento
+        self._revision = None
+        self._placeholder = None
+        renderer.thumbnail_ready.connect(self._on_thumbnail_ready)
+        self._digest_finished.connect(self._on_digest_finished)
+
+    def reload(self):
+        """Ricarica l'elenco delle pagine: dopo aver aperto o chiuso un documento"""
+        self.beginResetModel()
+        self._images.clear()
+        path = self.editor.source_path()
+        self._file_key = self._digest = None
+        if self.cache and path:
+            stat = os.stat(path)
+            file_key = self._file_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+            if self._hasher is None:
+                self._hasher = ThreadPoolExecutor(max_workers=1)
+            future = self._hasher.submit(self.cache.file_digest, path)
+            future.add_done_callback(lambda f: self._notify_digest(file_key, f))
+        self._revision = self.editor.revision
+        self.endResetModel()
+
+    def digest(self):
+        """sha256 del file aperto, o None finché non è stato calcolato"""
+        return self._digest
+
+    def refresh(self):
+        """Dopo una modifica: le miniature delle pagine cambiate vengono rigenerate"""
+        if self.editor.revision == self._revision or not self.rowCount():
+            return
+        self._revision = self.editor.revision
+        # La vista richiede di nuovo solo le miniature visibili
+        self.dataChanged.emit(self.index(0), self.index(self.rowCount() - 1),
+                              [Qt.DecorationRole])
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or not self.editor.current_doc:
+            return 0
+        return len(self.editor.current_doc)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return f"Pagina {index.row() + 1}"
+        if role == Qt.DecorationRole:
+            return self.thumbnail(index.row())
+        return None
+
+    def thumbnail(self, page_num):
+        """Miniatura della pagina, o il segnaposto se è ancora in preparazione"""
+        key = self.editor.render_key(('thumbnail', self.width), page_num, 0)
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+            return image
+        png = None
+        for disk_key in self._disk_keys(page_num):
+            png = self.cache.get_bytes(disk_key)
+            if png is not None:
+                break
+        if png is None:
+            png = self.renderer.request_thumbnail(page_num, self.width)
+        if png is None:
+            return self.placeholder()
+        return self._store(key, png)
+
+    def is_loaded(self, page_num):
+        """True se la miniatura attuale della pagina è in memoria"""
+        return self.editor.render_key(('thumbnail', self.width), page_num, 0) in self._images
+
+    def set_visible_rows(self, first, last):
+        """Pagine visibili nella vista: le miniature in coda delle altre vengono annullate"""
+        self.renderer.cancel_thumbnails(range(first, last + 1))
+
+    def placeholder(self):
+        """Immagine grigia mostrata finché la miniatura non è pronta"""
+        if self._placeholder is None:
+            self._placeholder = QImage(self.width, round(self.width * 1.414), QImage.Format_RGB32)
+            self._placeholder.fill(QColor(225, 225, 225))
+        return self._placeholder
+
+    def _disk_keys(self, page_num):
+        """Chiavi su disco della pagina, solo se non modificata: con l'hash del file
+        (se già calcolato) e con percorso, dimensione e data di modifica"""
+        if self._file_key is None or self.editor.is_page_modified(page_num):
+            return []
+        params = {'page': page_num, 'width': self.width}
+        keys = [self.cache.key('thumbnail', [list(self._file_key)], params)]
+        if self._digest is not None:
+            keys.insert(0, self.cache.key('thumbnail', [self._digest], params))
+        return keys
+
+    def _store(self, key, png):
+        image = QImage.fromData(png, "PNG")
+        self._images[key] = image
+        while len(self._images) > MAX_THUMBNAILS_IN_MEMORY:
+            self._images.popitem(last=False)
+        return image
+
+    def _on_thumbnail_ready(self, key, page_num, png):
+        if page_num >= self.rowCount():
+            return
+        if key != self.editor.render_key(('thumbnail', self.width), page_num, 0):
+            return  # Pagina modificata nel frattempo: ne verrà richiesta una nuova
+        self._store(key, png)
+        disk_keys = self._disk_keys(page_num)
+        if disk_keys:
+            self.cache.put_bytes(disk_keys[0], 'thumbnail', png, "thumbnail.png")
+        index = self.index(page_num)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def _notify_digest(self, file_key, future):
+        """Thread dell'hash: passa il risultato al thread dell'interfaccia"""
+        try:
+            self._digest_finished.emit(file_key, future)
+        except RuntimeError:
+            pass  # Modello già distrutto
+
+    def _on_digest_finished(self, file_key, future):
+        if file_key != self._file_key:
+            return  # Nel frattempo è stato aperto un altro documento
+        try:
+            self._digest = future.result()
+        except OSError as e:
+            print(f"Errore nell'hash del documento, miniature per percorso: {e}")
+            return
+        if self.rowCount():
+            # Le miniature visibili ancora in attesa possono arrivare dalla cache su disco
+            self.dataChanged.emit(self.index(0), self.index(self.rowCount() - 1),
+                                  [Qt.DecorationRole])
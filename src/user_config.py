@@ -23,7 +23,13 @@ class UserConfig:
             "remember_window_state": True,
             "language": "it",  # it, en
             "show_tooltips": True,
-            "auto_check_updates": True
+            "auto_check_updates": True,
+            "pdf_backend": "auto",  # auto, pypdf, pymupdf
+            "render_cache_mb": 128,  # memoria per i render delle pagine
+            "progressive_render": True,  # anteprima veloce prima del render definitivo
+            "preview_scale": 0.25,  # risoluzione dell'anteprima rispetto allo zoom
+            "preview_grayscale": False,
+            "preview_antialias": 0  # 0 (nessuno) - 8 (massimo)
         }
         self.config = self.load_config()
     
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test dell'interfaccia asyncio per i motori PDF
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+from pathlib import Path
+
+# Aggiungi il percorso src
+current_dir = Path(__file__).parent
+src_dir = current_dir / "src"
+sys.path.insert(0, str(src_dir))
+
+import fitz
+
+
+def make_pdf(path, num_pages):
+    """Crea un PDF di prova con testo su ogni pagina"""
+    doc = fitz.open()
+    for i in range(num_pages):
+        doc.new_page().insert_text((72, 72), f"Pagina {i + 1} riservato")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def test_async_manager():
+    """Test delle operazioni e dello streaming delle pagine nel pool di processi"""
+    print("Test AsyncPDFManager...")
+    from async_pdf import AsyncPDFManager
+    from instrumentation import metrics
+
+    async def scenario(work_dir):
+        first = make_pdf(os.path.join(work_dir, "a.pdf"), 3)
+        second = make_pdf(os.path.join(work_dir, "b.pdf"), 4)
+        merged = os.path.join(work_dir, "unito.pdf")
+
+        metrics.reset()
+        async with AsyncPDFManager(max_concurrency=2) as apdf:
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.001)
+
+            ticking = asyncio.create_task(ticker())
+            assert await apdf.merge([first, second], merged)
+            ticking.cancel()
+            assert ticks > 0, "Event loop bloccato durante l'unione"
+            assert metrics.counter("calls.PDFManager.merge_pdfs") == 1, "Metriche del worker perse"
+            print("  ✓ Unione eseguita nel pool senza bloccare l'event loop")
+
+            pages = [item async for item in apdf.extract_text(merged)]
+            assert [page_num for page_num, _ in pages] == list(range(1, 8))
+            assert pages[4][1].startswith("Pagina 2"), f"Testo errato: {pages[4][1]!r}"
+            unordered = [page_num async for page_num, _ in apdf.extract_text(merged, ordered=False)]
+            assert sorted(unordered) == list(range(1, 8))
+            print("  ✓ Testo restituito pagina per pagina, anche in ordine di completamento")
+
+            images = [item async for item in apdf.render_pages(merged, pages="1,z", zoom=0.5)]
+            assert [page_num for page_num, _ in images] == [1, 7]
+            assert images[0][1].startswith(b"\x89PNG")
+            print("  ✓ Render delle pagine in streaming")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        asyncio.run(scenario(work_dir))
+    return True
+
+
+def test_cancellation_and_limit():
+    """Test del limite di concorrenza e dell'annullamento"""
+    print("\nTest annullamento e limite di concorrenza...")
+    from async_pdf import AsyncPDFManager, AsyncPDFEditor
+
+    async def scenario(work_dir):
+        source = make_pdf(os.path.join(work_dir, "doc.pdf"), 60)
+        async with AsyncPDFManager(max_concurrency=2, use_processes=False) as apdf:
+            stream = apdf.render_pages(source, zoom=2.0)
+            async for page_num, _ in stream:
+                assert page_num == 1
+                break
+            await stream.aclose()
+            await asyncio.sleep(0.2)
+            assert apdf._semaphore._value == 2, "Pagine ancora in coda dopo la chiusura"
+            print("  ✓ Chiudendo il generatore le pagine in coda vengono annullate")
+
+            async def consume():
+                return [item async for item in apdf.render_pages(source, zoom=2.0)]
+
+            task = asyncio.create_task(consume())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            try:
+                await task
+                assert False, "Task non annullato"
+            except asyncio.CancelledError:
+                pass
+            await asyncio.sleep(0.2)
+            assert apdf._semaphore._value == 2
+            infos = await asyncio.gather(*(apdf.get_pdf_info(source) for _ in range(5)))
+            assert all(info['num_pages'] == 60 for info in infos)
+            print("  ✓ Annullamento del task e chiamate concorrenti entro il limite")
+
+        async with AsyncPDFEditor() as editor:
+            assert await editor.open_pdf(source)
+            assert await editor.get_page_count() == 60
+            results = await editor.search_text("riservato", page_num="1-3")
+            assert len(results) == 3, f"Risultati errati: {results}"
+        assert editor.editor.current_doc is None
+        print("  ✓ AsyncPDFEditor esegue l'editor in un thread dedicato")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        asyncio.run(scenario(work_dir))
+    return True
+
+
+if __name__ == "__main__":
+    success = test_async_manager() and test_cancellation_and_limit()
+
+    print("\n" + "=" * 50)
+    print("✅ TUTTI I TEST SUPERATI!" if success else "✗ ALCUNI TEST FALLITI")
+    print("=" * 50)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test dell'elaborazione batch da riga di comando
+"""
+
+import sys
+import os
+import io
+import json
+import tempfile
+import contextlib
+from pathlib import Path
+
+# Aggiungi il percorso src
+current_dir = Path(__file__).parent
+src_dir = current_dir / "src"
+sys.path.insert(0, str(src_dir))
+
+import fitz
+
+
+def make_tree(root):
+    """Crea una cartella con PDF in sottocartelle"""
+    paths = []
+    for relative, num_pages in (("a.pdf", 2), ("sub/b.pdf", 3), ("sub/deep/c.pdf", 1)):
+        path = os.path.join(root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        doc = fitz.open()
+        for i in range(num_pages):
+            doc.new_page().insert_text((72, 72), f"{relative} {i + 1}")
+        doc.save(path)
+        doc.close()
+        paths.append(path)
+    return paths
+
+
+def run(argv):
+    """Esegue il batch catturando l'output"""
+    from batch_cli import build_parser, run_batch
+    with contextlib.redirect_stdout(io.StringIO()):
+        return run_batch(build_parser().parse_args(argv), out=io.StringIO())
+
+
+def test_batch_rotate_and_resume():
+    """Test del batch su cartella con pool di processi e ripresa dal manifest"""
+    print("Test batch rotate con ripresa...")
+    from batch_cli import MANIFEST_NAME
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source_dir = os.path.join(work_dir, "archivio")
+        output_dir = os.path.join(work_dir, "ruotati")
+        make_tree(source_dir)
+
+        argv = ["rotate", source_dir, "-o", output_dir, "--angle", "90", "--workers", "2"]
+        summary = run(argv)
+        assert summary['done'] == 3 and summary['errors'] == 0, f"Riepilogo errato: {summary}"
+        assert summary['pages'] == 6 and summary['pages_per_second'] > 0, "Throughput non calcolato"
+        rotated = os.path.join(output_dir, "sub", "deep", "c.pdf")
+        with fitz.open(rotated) as doc:
+            assert doc[0].rotation == 90, "Pagina non ruotata"
+        print("  ✓ 3 file ruotati mantenendo la struttura delle cartelle")
+
+        # Simula un'interruzione: l'ultimo job non è arrivato nel manifest
+        manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        with open(manifest_path, encoding='utf-8') as f:
+            lines = f.readlines()
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            f.writelines(lines[:2])
+            f.write('{"key": "troncato')
+        summary = run(argv)
+        assert summary['skipped'] == 2 and summary['done'] == 1, f"Ripresa errata: {summary}"
+        assert run(argv)['skipped'] == 3, "Record successivo alla riga troncata perso"
+        print("  ✓ Ripresa: rielaborato solo il file mancante")
+
+        # Parametri diversi: i file vengono rielaborati
+        summary = run(argv[:-4] + ["--angle", "180", "--workers", "1"])
+        assert summary['skipped'] == 0 and summary['done'] == 3, "Parametri cambiati ignorati"
+        print("  ✓ Cambio di parametri rilevato")
+
+    return True
+
+
+def test_batch_info_and_errors():
+    """Test di info su glob, merge e registrazione degli errori nel manifest"""
+    print("\nTest batch info / merge / errori...")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source_dir = os.path.join(work_dir, "archivio")
+        make_tree(source_dir)
+        with open(os.path.join(source_dir, "rotto.pdf"), 'wb') as f:
+            f.write(b"non un pdf")
+
+        manifest_path = os.path.join(work_dir, "inventario.jsonl")
+        summary = run(["info", os.path.join(source_dir, "**", "*.pdf"),
+                       "--manifest", manifest_path, "--workers", "1"])
+        assert summary['files'] == 4 and summary['errors'] == 1, f"Riepilogo errato: {summary}"
+        with open(manifest_path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        pages = {os.path.basename(r['input']): r['info']['num_pages']
+                 for r in records if r['status'] == 'ok'}
+        assert pages == {"a.pdf": 2, "b.pdf": 3, "c.pdf": 1}, f"Info errate: {pages}"
+        assert any(r['status'] == 'error' and r['error'] for r in records), "Errore non registrato"
+        print("  ✓ Info raccolte nel manifest, file non valido registrato come errore")
+
+        merged = os.path.join(work_dir, "unito.pdf")
+        summary = run(["merge", os.path.join(source_dir, "sub"), "-o", merged])
+        with fitz.open(merged) as doc:
+            assert doc.page_count == 4, "Unione errata"
+        print("  ✓ Merge di una cartella in un solo file")
+
+        for folder in ("x", "y"):
+            os.makedirs(os.path.join(work_dir, "omonimi", folder))
+            with fitz.open() as doc:
+                doc.new_page().insert_text((72, 72), folder)
+                doc.save(os.path.join(work_dir, "omonimi", folder, "report.pdf"))
+        output_dir = os.path.join(work_dir, "ruotati")
+        summary = run(["rotate", os.path.join(work_dir, "omonimi", "**", "*.pdf"),
+                       "-o", output_dir, "--angle", "90", "--workers", "1"])
+        assert summary['done'] == 2, f"Riepilogo errato: {summary}"
+        for folder in ("x", "y"):
+            with fitz.open(os.path.join(output_dir, folder, "report.pdf")) as doc:
+                assert doc[0].get_text().strip() == folder, "Output sovrascritto"
+        print("  ✓ File omonimi da un glob ricorsivo mantengono le sottocartelle")
+
+        summary = run(["rotate", os.path.join(work_dir, "omonimi", "x", "report.pdf"),
+                       os.path.join(work_dir, "omonimi", "y", "report.pdf"),
+                       "-o", os.path.join(work_dir, "piatti"), "--angle", "90", "--workers", "1"])
+        assert summary['done'] == 1 and summary['errors'] == 1, f"Collisione non riportata: {summary}"
+        print("  ✓ Due file con lo stesso output: il secondo registrato come errore")
+
+        from batch_cli import _count_pages
+        missing = os.path.join(work_dir, "spostato.pdf")
+        assert _count_pages({'operation': 'split', 'input': missing, 'num_pages': 7}) == 7, \
+            "Pagine rilette dal file invece che dalla stima di ammissione"
+        assert _count_pages({'operation': 'split', 'input': missing, 'num_pages': 7,
+                             'retry_pages': [2, 5]}) == 2
+        print("  ✓ Pagine del job dalla stima di ammissione, senza riaprire il file")
+
+    return True
+
+
+if __name__ == "__main__":
+    success = test_batch_rotate_and_resume() and test_batch_info_and_errors()
+
+    print("\n" + "=" * 50)
+    print("✅ TUTTI I TEST SUPERATI!" if success else "✗ ALCUNI TEST FALLITI")
+    print("=" * 50)
+    sys.exit(0 if success else 1)
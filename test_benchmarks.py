@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test del generatore di corpus e della suite di benchmark
+"""
+
+import sys
+import os
+import copy
+import tempfile
+from pathlib import Path
+
+# Aggiungi i percorsi src e benchmarks
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir / "src"))
+sys.path.insert(0, str(current_dir / "benchmarks"))
+
+import fitz
+
+
+def test_corpus():
+    """Test dei documenti sintetici: tipi, numero di pagine e determinismo"""
+    print("Test corpus sintetico...")
+    from corpus import KINDS, BLOCK_PAGES, generate, ensure_corpus
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for kind in KINDS:
+            path = ensure_corpus(work_dir, kind, 3)
+            with fitz.open(path) as doc:
+                assert doc.page_count == 3, f"Pagine errate per {kind}"
+                if kind == 'image':
+                    assert doc[0].get_images(), "Immagini mancanti"
+                elif kind == 'form':
+                    assert len(list(doc[0].widgets())) == 8, "Campi modulo mancanti"
+                elif kind == 'annotation':
+                    assert len(list(doc[0].annots())) == 10, "Annotazioni mancanti"
+            again = generate(kind, 3, os.path.join(work_dir, f"{kind}_bis.pdf"))
+            with open(path, 'rb') as a, open(again, 'rb') as b:
+                assert a.read() == b.read(), f"Corpus {kind} non deterministico"
+        print("  ✓ Quattro tipi di documento, identici byte per byte a ogni generazione")
+
+        large = generate('form', BLOCK_PAGES + 7, os.path.join(work_dir, "grande.pdf"))
+        with fitz.open(large) as doc:
+            assert doc.page_count == BLOCK_PAGES + 7, "Replica del blocco errata"
+            names = [widget.field_name for page in doc for widget in page.widgets()]
+            assert len(set(names)) == len(names), "Nomi dei campi duplicati"
+        print("  ✓ Documenti grandi per replica del blocco")
+
+    return True
+
+
+def test_suite():
+    """Test delle misure e del confronto con la baseline"""
+    print("\nTest suite di benchmark...")
+    from bench_suite import OPERATIONS, run_suite, compare, format_comparison
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = run_suite(['text'], [4], corpus_dir=work_dir, isolate=False, repeat=1,
+                            log=lambda line: None)
+        entries = results['results']
+        assert [entry['operation'] for entry in entries] == list(OPERATIONS)
+        assert all(entry['seconds'] > 0 and entry['pages_processed'] for entry in entries)
+        assert results['meta']['pymupdf'], "Ambiente non registrato"
+        print("  ✓ Tempo e memoria per ogni operazione")
+
+    baseline = copy.deepcopy(results)
+    slower = copy.deepcopy(results)
+    slower['results'][0]['seconds'] = baseline['results'][0]['seconds'] * 2
+    slower['results'][1]['seconds'] = baseline['results'][1]['seconds'] / 2
+    slower['results'].append(dict(slower['results'][2], pages=1000))
+    statuses = [item['status'] for item in compare(slower, baseline, threshold=0.1)]
+    assert statuses[:3] == ['regression', 'improvement', 'ok'], f"Confronto errato: {statuses}"
+    assert statuses[-1] == 'new'
+    print("  ✓ Regressioni e miglioramenti rispetto alla baseline")
+
+    baseline['results'][0]['seconds'] = 0
+    comparison = compare(slower, baseline)
+    assert comparison[0]['time_ratio'] is None
+    assert "tempo      -" in format_comparison(comparison).splitlines()[0]
+    print("  ✓ Baseline con tempo nullo mostrata senza rapporto")
+
+    return True
+
+
+if __name__ == "__main__":
+    success = test_corpus() and test_suite()
+
+    print("\n" + "=" * 50)
+    print("✅ TUTTI I TEST SUPERATI!" if success else "✗ ALCUNI TEST FALLITI")
+    print("=" * 50)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test della strumentazione delle operazioni (metriche e log JSON)
+"""
+
+import sys
+import os
+import io
+import json
+import logging
+import tempfile
+import contextlib
+from pathlib import Path
+
+# Aggiungi il percorso src
+current_dir = Path(__file__).parent
+src_dir = current_dir / "src"
+sys.path.insert(0, str(src_dir))
+
+import fitz
+
+
+def make_pdf(path, num_pages):
+    """Crea un PDF di prova con testo su ogni pagina"""
+    doc = fitz.open()
+    for i in range(num_pages):
+        doc.new_page().insert_text((72, 72), f"Pagina {i + 1} riservato")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def test_metrics():
+    """Test di contatori e istogrammi per le chiamate dei motori"""
+    print("Test metriche delle operazioni...")
+    from instrumentation import metrics
+    from pdf_manager import PDFManager
+    from advanced_pdf_editor import AdvancedPDFEditor
+
+    metrics.reset()
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = make_pdf(os.path.join(work_dir, "doc.pdf"), 3)
+        manager = PDFManager()
+
+        output = os.path.join(work_dir, "ruotato.pdf")
+        assert manager.rotate_pdf(source, output, 90)
+        call = metrics.last
+        assert call['operation'] == "PDFManager.rotate_pdf" and call['status'] == 'ok'
+        assert call['pages'] == 3, f"Pagine errate: {call['pages']}"
+        assert call['bytes_in'] == os.path.getsize(source), "Byte letti errati"
+        assert call['bytes_out'] == os.path.getsize(output), "Byte scritti errati"
+        assert call['peak_rss_mb'] is None or call['peak_rss_mb'] > 0
+        histogram = metrics.histogram("seconds.PDFManager.rotate_pdf")
+        assert histogram['count'] == 1 and histogram['sum'] == call['seconds']
+        print("  ✓ Tempo, pagine, byte e memoria registrati")
+
+        # Le chiamate annidate vengono misurate solo all'esterno
+        split_dir = os.path.join(work_dir, "parti")
+        os.makedirs(split_dir)
+        assert manager.split_pdf_range(source, split_dir, 1, 2)
+        assert metrics.counter("calls.PDFManager.split_pdf_range") == 1
+        assert metrics.counter("calls.PDFManager.split_pdf_ranges") == 0, "Chiamata annidata contata"
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert not manager.extract_pages(source, os.path.join(work_dir, "x.pdf"), "a-b")
+        assert metrics.counter("errors.PDFManager.extract_pages") == 1
+        assert metrics.counter("errors") == 1 and metrics.counter("calls") == 3
+        print("  ✓ Chiamate annidate ed errori")
+
+        editor = AdvancedPDFEditor()
+        assert editor.open_pdf(source)
+        editor.get_page_image(1)
+        assert metrics.last['pages'] == 1
+        assert len(editor.search_text("riservato")) == 3
+        assert metrics.last['operation'] == "AdvancedPDFEditor.search_text"
+        assert metrics.last['pages'] == 3, "Ricerca su tutto il documento non contata"
+        editor.close_pdf()
+        print("  ✓ Pagine elaborate dall'editor")
+
+        with metrics.capture() as calls:
+            manager.get_pdf_info(source)
+        assert [call['operation'] for call in calls] == ["PDFManager.get_pdf_info"]
+        snapshot = json.loads(json.dumps(metrics.snapshot()))
+        assert snapshot['counters']['pages'] >= 10 and snapshot['last'] == calls[0]
+        print("  ✓ Snapshot serializzabile e cattura delle chiamate")
+
+    return True
+
+
+def test_json_logs_and_batch():
+    """Test dei log JSON configurati da config.ini e delle metriche in batch"""
+    print("\nTest log JSON e metriche batch...")
+    from instrumentation import configure_logging, metrics
+    from pdf_manager import PDFManager
+    from batch_cli import build_parser, run_batch
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        config_path = os.path.join(work_dir, "config.ini")
+        with open(config_path, 'w', encoding='utf-8') as f:
+            f.write("[logging]\nlog_level = INFO\nlog_format = json\n")
+        stream = io.StringIO()
+        handler = configure_logging(config_path, stream=stream)
+        try:
+            source = make_pdf(os.path.join(work_dir, "doc.pdf"), 2)
+            PDFManager().extract_text(source, os.path.join(work_dir, "testo.txt"))
+        finally:
+            logging.getLogger("pdf_editor").removeHandler(handler)
+        entry = json.loads(stream.getvalue().splitlines()[-1])
+        assert entry['operation'] == "PDFManager.extract_text" and entry['level'] == "INFO"
+        assert entry['pages'] == 2 and entry['bytes_out'] > 0, f"Log incompleto: {entry}"
+        print("  ✓ Una riga JSON per operazione")
+
+        os.makedirs(os.path.join(work_dir, "in"))
+        for i in range(3):
+            make_pdf(os.path.join(work_dir, "in", f"f{i}.pdf"), 2)
+        metrics.reset()
+        metrics_path = os.path.join(work_dir, "metriche.json")
+        args = build_parser().parse_args(["rotate", os.path.join(work_dir, "in"), "-o",
+                                          os.path.join(work_dir, "out"), "--angle", "90",
+                                          "--workers", "2", "--metrics", metrics_path])
+        summary = run_batch(args, out=io.StringIO())
+        assert summary['metrics']['counters']['calls.PDFManager.rotate_pdf'] == 3, \
+            "Chiamate dei worker non raccolte"
+        with open(metrics_path, 'r', encoding='utf-8') as f:
+            assert json.load(f)['counters']['pages'] == 6, "File delle metriche errato"
+        with open(os.path.join(work_dir, "out", ".pdf_batch_manifest.jsonl"), 'r') as f:
+            assert all('calls' not in json.loads(line) for line in f), "Misure nel manifest"
+        print("  ✓ Metriche dei processi worker nel riepilogo batch")
+
+    return True
+
+
+if __name__ == "__main__":
+    success = test_metrics() and test_json_logs_and_batch()
+
+    print("\n" + "=" * 50)
+    print("✅ TUTTI I TEST SUPERATI!" if success else "✗ ALCUNI TEST FALLITI")
+    print("=" * 50)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test del servizio locale a coda di job (solo client locale)
+"""
+
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+# Aggiungi il percorso src
+current_dir = Path(__file__).parent
+src_dir = current_dir / "src"
+sys.path.insert(0, str(src_dir))
+
+import fitz
+
+
+def make_pdf(path, num_pages, text="Pagina"):
+    """Crea un PDF di prova con testo su ogni pagina"""
+    doc = fitz.open()
+    for i in range(num_pages):
+        page = doc.new_page()
+        for line in range(30):
+            page.insert_text((72, 72 + line * 20), f"{text} {i + 1} riga {line + 1}")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def test_service_operations():
+    """Test di merge, split, watermark, redact ed encrypt tramite HTTP"""
+    print("Test servizio: operazioni...")
+    from job_service import PDFJobService, PDFServiceClient, ServiceError
+
+    with tempfile.TemporaryDirectory() as work_dir, PDFJobService(workers=2) as service:
+        client = PDFServiceClient(service.url)
+        assert client.health()['workers'] == 2, "Pool non avviato"
+        first = make_pdf(os.path.join(work_dir, "a.pdf"), 2)
+        second = make_pdf(os.path.join(work_dir, "b.pdf"), 3, "Riservato")
+
+        jobs = {
+            'merge': client.submit("merge", inputs=[first, second]),
+            'split': client.submit("split", input=second),
+            'watermark': client.submit("watermark", input=first, text="BOZZA"),
+            'redact': client.submit("redact", input=second, terms=["Riservato"]),
+            'encrypt': client.submit("encrypt", input=first, password="segreta"),
+        }
+        results = {name: client.wait(job['id'], timeout=30) for name, job in jobs.items()}
+        for name, job in results.items():
+            assert job['status'] == 'done', f"{name} fallito: {job['error']}"
+        print("  ✓ Tutti i job completati")
+
+        with fitz.open("pdf", client.fetch(jobs['merge']['id'])) as merged:
+            assert merged.page_count == 5, "Unione errata"
+        assert results['split']['outputs'] == [f"b_page_{i}.pdf" for i in (1, 2, 3)]
+        split_path = client.fetch(jobs['split']['id'], 2, os.path.join(work_dir, "p3.pdf"))
+        with fitz.open(split_path) as page_doc:
+            assert "Riservato 3" in page_doc[0].get_text(), "Pagina divisa errata"
+        print("  ✓ Risultati scaricati come byte e come file")
+
+        with fitz.open("pdf", client.fetch(jobs['redact']['id'])) as redacted:
+            assert "Riservato" not in "".join(page.get_text() for page in redacted), \
+                "Testo non rimosso"
+        with fitz.open("pdf", client.fetch(jobs['encrypt']['id'])) as encrypted:
+            assert encrypted.needs_pass and encrypted.authenticate("segreta"), "PDF non cifrato"
+        print("  ✓ Redaction e cifratura applicate")
+
+        try:
+            client.submit("merge", inputs=[os.path.join(work_dir, "mancante.pdf")])
+            assert False, "Job non valido accettato"
+        except ServiceError as e:
+            assert e.status == 400
+        client.delete(jobs['merge']['id'])
+        try:
+            client.status(jobs['merge']['id'])
+            assert False, "Job eliminato ancora presente"
+        except ServiceError as e:
+            assert e.status == 404
+        print("  ✓ Validazione ed eliminazione dei job")
+
+    return True
+
+
+def test_service_priority_and_backpressure():
+    """Test della coda a priorità e della risposta 429 a coda piena"""
+    print("\nTest servizio: priorità e backpressure...")
+    from job_service import PDFJobService, PDFServiceClient, ServiceBusy
+
+    with tempfile.TemporaryDirectory() as work_dir, \
+            PDFJobService(workers=1, max_queue=3) as service:
+        client = PDFServiceClient(service.url)
+        large = make_pdf(os.path.join(work_dir, "grande.pdf"), 60)
+        small = make_pdf(os.path.join(work_dir, "piccolo.pdf"), 1)
+
+        # Il primo job occupa l'unico worker mentre gli altri restano in coda
+        slow = client.submit("extract-text", input=large, backend="pypdf")
+        queued = [client.submit("extract", input=small, pages="1", priority=priority)
+                  for priority in (0, 5, 1)]
+        try:
+            client.submit("extract", input=small, pages="1")
+            assert False, "Coda piena non segnalata"
+        except ServiceBusy as e:
+            assert e.status == 429
+        print("  ✓ 429 quando la coda è piena")
+
+        finished = [client.wait(job['id'], timeout=60) for job in [slow] + queued]
+        assert all(job['status'] == 'done' for job in finished), "Job non completati"
+        order = sorted(finished[1:], key=lambda job: job['started'])
+        assert [job['priority'] for job in order] == [5, 1, 0], "Priorità non rispettata"
+        print("  ✓ Job eseguiti in ordine di priorità")
+
+    return True
+
+
+if __name__ == "__main__":
+    success = test_service_operations() and test_service_priority_and_backpressure()
+
+    print("\n" + "=" * 50)
+    print("✅ TUTTI I TEST SUPERATI!" if success else "✗ ALCUNI TEST FALLITI")
+    print("=" * 50)
+    sys.exit(0 if success else 1)
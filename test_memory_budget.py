@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test del budget di memoria e dell'elaborazione a blocchi
+"""
+
+import sys
+import os
+import io
+import json
+import threading
+import tempfile
+from pathlib import Path
+
+# Aggiungi il percorso src
+current_dir = Path(__file__).parent
+src_dir = current_dir / "src"
+sys.path.insert(0, str(src_dir))
+
+import fitz
+
+
+def make_pdf(path, num_pages):
+    """Crea un PDF di prova con testo su ogni pagina"""
+    doc = fitz.open()
+    for i in range(num_pages):
+        doc.new_page().insert_text((72, 72), f"Pagina {i + 1}")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def test_budget():
+    """Test di stima, piano di esecuzione e prenotazione della memoria"""
+    print("Test budget di memoria...")
+    from memory_budget import BudgetExceeded, MemoryBudget, estimate_cost, load_limits
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = make_pdf(os.path.join(work_dir, "doc.pdf"), 12)
+        cost = estimate_cost(source)
+        assert cost['num_pages'] == 12 and cost['file_size'] == os.path.getsize(source)
+
+        import memory_budget
+        scan = memory_budget.image_bytes
+        memory_budget.image_bytes = None  # Il controllo di ammissione non legge gli oggetti
+        try:
+            plan = MemoryBudget(budget=1024 ** 3).plan([source])
+        finally:
+            memory_budget.image_bytes = scan
+        assert plan['chunk_pages'] is None and plan['reserve'] == plan['cost']['estimated']
+        assert plan['cost']['image_bytes'] == cost['file_size'] >= cost['image_bytes']
+        assert plan['reserve'] >= cost['estimated'], "Stima di ammissione meno prudente"
+
+        small = MemoryBudget(budget=plan['reserve'] - 1, chunk_pages=5)
+        plan = small.plan([source])
+        assert plan['chunk_pages'] == 5 and plan['reserve'] < small.budget, "Blocchi non scelti"
+
+        try:
+            MemoryBudget(budget=1024 ** 3, max_file_size=100).plan([source])
+            assert False, "File oltre il limite accettato"
+        except BudgetExceeded:
+            pass
+        print("  ✓ Elaborazione diretta, a blocchi o rifiuto in base alla stima")
+
+        config_path = os.path.join(work_dir, "config.ini")
+        with open(config_path, 'w', encoding='utf-8') as f:
+            f.write("[pdf]\nmax_file_size_mb = 1\nmemory_budget_mb = 256\nchunk_pages = 50\n")
+        assert load_limits(config_path) == {'max_file_size': 1024 ** 2, 'budget': 256 * 1024 ** 2,
+                                            'chunk_pages': 50}
+        print("  ✓ Limiti letti da config.ini")
+
+    budget = MemoryBudget(budget=100)
+    assert budget.reserve(70) and not budget.reserve(50, block=False)
+    admitted = threading.Event()
+    waiter = threading.Thread(target=lambda: budget.reserve(50) and admitted.set())
+    waiter.start()
+    assert not admitted.wait(0.1), "Job ammesso oltre il budget"
+    budget.release(70)
+    waiter.join(5)
+    assert admitted.is_set() and budget.info()['in_use'] == 50
+    print("  ✓ I job attendono finché la memoria non si libera")
+
+    return True
+
+
+def test_chunked_operations():
+    """Test dei risultati a blocchi, identici a quelli dell'elaborazione diretta"""
+    print("\nTest elaborazione a blocchi...")
+    from pdf_manager import PDFManager
+
+    manager = PDFManager()
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = make_pdf(os.path.join(work_dir, "doc.pdf"), 11)
+
+        def pages_of(path):
+            with fitz.open(path) as doc:
+                return [(page.rotation, page.get_text().strip()) for page in doc]
+
+        for name, run in [
+            ("rotate", lambda out, chunk: manager.rotate_pdf(source, out, 90, pages="odd",
+                                                             chunk_pages=chunk)),
+            ("extract", lambda out, chunk: manager.extract_pages(source, out, "z-1,3",
+                                                                 chunk_pages=chunk)),
+        ]:
+            direct = os.path.join(work_dir, f"{name}.pdf")
+            chunked = os.path.join(work_dir, f"{name}_blocchi.pdf")
+            assert run(direct, None) and run(chunked, 4), f"{name} non riuscito"
+            assert pages_of(chunked) == pages_of(direct), f"{name} a blocchi diverso"
+        print("  ✓ Rotazione ed estrazione a blocchi")
+
+        with fitz.open(source) as doc:
+            doc.set_metadata({'title': "Relazione", 'author': "Ufficio"})
+            doc.set_toc([[1, "Inizio", 1], [2, "Dettagli", 2], [1, "Fine", 11]])
+            doc.saveIncr()
+        chunked = os.path.join(work_dir, "watermark_blocchi.pdf")
+        assert manager.add_watermark(source, chunked, "BOZZA", pages="2-z", chunk_pages=3)
+        with fitz.open(chunked) as doc:
+            assert doc.page_count == 11
+            assert "BOZZA" not in doc[0].get_text() and "BOZZA" in doc[10].get_text()
+            assert doc.metadata['title'] == "Relazione" and doc.metadata['author'] == "Ufficio"
+            assert doc.get_toc() == [[1, "Inizio", 1], [2, "Dettagli", 2], [1, "Fine", 11]]
+        print("  ✓ Watermark a blocchi sulle pagine selezionate, con metadati e segnalibri")
+
+        extracted = os.path.join(work_dir, "extract_segnalibri.pdf")
+        assert manager.extract_pages(source, extracted, "z-1", chunk_pages=4)
+        with fitz.open(extracted) as doc:
+            assert doc.get_toc() == [[1, "Inizio", 11], [2, "Dettagli", 10], [1, "Fine", 1]]
+        print("  ✓ Segnalibri riportati sulle pagine riordinate")
+
+    return True
+
+
+def test_batch_admission():
+    """Test del rifiuto dei file troppo grandi nel batch"""
+    print("\nTest controllo di ammissione nel batch...")
+    from batch_cli import build_parser, run_batch
+    import memory_budget
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_dir = os.path.join(work_dir, "in")
+        os.makedirs(input_dir)
+        make_pdf(os.path.join(input_dir, "piccolo.pdf"), 2)
+        make_pdf(os.path.join(input_dir, "grande.pdf"), 400)
+        limit = os.path.getsize(os.path.join(input_dir, "grande.pdf")) - 1
+
+        original = memory_budget.load_limits
+        memory_budget.load_limits = lambda config_path=None: {
+            'max_file_size': limit, 'budget': 1024 ** 3, 'chunk_pages': 100}
+        try:
+            args = build_parser().parse_args(["rotate", input_dir, "-o",
+                                              os.path.join(work_dir, "out"), "--angle", "90",
+                                              "--workers", "2"])
+            summary = run_batch(args, out=io.StringIO())
+        finally:
+            memory_budget.load_limits = original
+        assert summary['done'] == 1 and summary['errors'] == 1, f"Riepilogo errato: {summary}"
+        with open(os.path.join(work_dir, "out", ".pdf_batch_manifest.jsonl"), 'r') as f:
+            records = {os.path.basename(r['input']): r for r in map(json.loads, f)}
+        assert "rifiutato" in records['grande.pdf']['error']
+        assert not os.path.exists(os.path.join(work_dir, "out", "grande.pdf"))
+        print("  ✓ File oltre max_file_size_mb registrato come errore senza elaborarlo")
+
+    return True
+
+
+if __name__ == "__main__":
+    success = test_budget() and test_chunked_operations() and test_batch_admission()
+
+    print("\n" + "=" * 50)
+    print("✅ TUTTI I TEST SUPERATI!" if success else "✗ ALCUNI TEST FALLITI")
+    print("=" * 50)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test dell'esito pagina per pagina e della modalità "salta le pagine danneggiate"
+"""
+
+import sys
+import os
+import io
+import json
+import contextlib
+import tempfile
+from pathlib import Path
+
+# Aggiungi il percorso src
+current_dir = Path(__file__).parent
+src_dir = current_dir / "src"
+sys.path.insert(0, str(src_dir))
+
+import fitz
+
+
+def make_pdf(path, num_pages, broken=()):
+    """Crea un PDF di prova; le pagine in broken (da 1) hanno /Resources non valide"""
+    doc = fitz.open()
+    for i in range(num_pages):
+        doc.new_page().insert_text((72, 72), f"Pagina {i + 1}")
+    for page_num in broken:
+        doc.xref_set_key(doc[page_num - 1].xref, "Resources", "5")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def page_texts(path):
+    with fitz.open(path) as doc:
+        return [page.get_text().split("\n")[0] for page in doc]
+
+
+def make_faulty_backend(bad_pages):
+    """Backend PyMuPDF che fallisce sulle pagine indicate (indici da 0)"""
+    from pdf_backends import PyMuPDFBackend
+
+    class FaultyBackend(PyMuPDFBackend):
+        def write_page(self, document, page_index, output_path):
+            if page_index in bad_pages:
+                raise ValueError(f"pagina {page_index + 1} danneggiata")
+            super().write_page(document, page_index, output_path)
+
+        def page_text(self, document, page_index):
+            if page_index in bad_pages:
+                raise ValueError(f"pagina {page_index + 1} danneggiata")
+            return super().page_text(document, page_index)
+
+    return FaultyBackend()
+
+
+def test_operation_result():
+    """Test dell'esito di ogni pagina e del fallimento alla prima pagina danneggiata"""
+    print("Test esito pagina per pagina...")
+    from pdf_manager import PDFManager
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = make_pdf(os.path.join(work_dir, "doc.pdf"), 4)
+        manager = PDFManager()
+
+        result = manager.rotate_pdf(source, os.path.join(work_dir, "ruotato.pdf"), 90)
+        assert result and result.ok and result.status == 'ok'
+        assert result.completed_pages == [1, 2, 3, 4] and not result.failed_pages
+        assert all(entry['seconds'] >= 0 for entry in result.pages)
+        print("  ✓ Stato e tempo di ogni pagina")
+
+        for result in (
+            manager.rotate_pdf(source, os.path.join(work_dir, "blocchi.pdf"), 90, chunk_pages=2),
+            manager.rotate_pdf(source, os.path.join(work_dir, "incr.pdf"), 90, incremental=True),
+        ):
+            assert result.completed_pages == [1, 2, 3, 4], f"Pagine non registrate: {result}"
+            assert result.summary() == "4 pagine elaborate"
+        result = manager.add_watermark(source, os.path.join(work_dir, "wm.pdf"), "BOZZA",
+                                       pages="2-3", chunk_pages=2)
+        assert result.completed_pages == [2, 3]
+        result = manager.extract_pages(source, os.path.join(work_dir, "ext.pdf"), "z-2",
+                                       chunk_pages=2)
+        assert sorted(result.completed_pages) == [2, 3, 4]
+        print("  ✓ Pagine registrate anche a blocchi e con aggiornamento incrementale")
+
+        faulty = PDFManager(backend=make_faulty_backend({1}))
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = faulty.extract_text(source, os.path.join(work_dir, "testo.txt"))
+        assert not result and result.status == 'error', "Errore non segnalato"
+        assert result.completed_pages == [1] and result.failed_pages == [2]
+        assert "danneggiata" in result.page_errors()[2]
+        print("  ✓ Senza skip_bad_pages l'operazione si ferma alla pagina danneggiata")
+
+    return True
+
+
+def test_skip_bad_pages():
+    """Test dell'output parziale e della ripetizione delle sole pagine fallite"""
+    print("\nTest salto delle pagine danneggiate...")
+    from pdf_manager import PDFManager
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = make_pdf(os.path.join(work_dir, "doc.pdf"), 5)
+        faulty = PDFManager(backend=make_faulty_backend({1, 3}))
+
+        text_path = os.path.join(work_dir, "testo.txt")
+        result = faulty.extract_text(source, text_path, skip_bad_pages=True)
+        assert result and result.status == 'partial' and result.failed_pages == [2, 4]
+        with open(text_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        assert "--- PAGINA 5 ---" in text and "--- PAGINA 2 ---" not in text
+        print("  ✓ Testo delle pagine riuscite scritto comunque")
+
+        split_dir = os.path.join(work_dir, "pagine")
+        os.makedirs(split_dir)
+        result = faulty.split_pdf_pages(source, split_dir, skip_bad_pages=True)
+        assert result.failed_pages == [2, 4] and len(os.listdir(split_dir)) == 3
+        retry = PDFManager().split_pdf_pages(source, split_dir, pages=result.failed_pages)
+        assert retry.ok and retry.completed_pages == [2, 4], "Ripetute anche pagine riuscite"
+        assert len(os.listdir(split_dir)) == 5
+        print("  ✓ La ripetizione rielabora solo le pagine fallite")
+
+        broken = make_pdf(os.path.join(work_dir, "danneggiato.pdf"), 4, broken=[2])
+        output = os.path.join(work_dir, "watermark.pdf")
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert not PDFManager().add_watermark(broken, output, "BOZZA")
+        result = PDFManager().add_watermark(broken, output, "BOZZA", skip_bad_pages=True)
+        assert result.status == 'partial' and result.failed_pages == [2]
+        assert page_texts(output) == ["Pagina 1", "Pagina 3", "Pagina 4"]
+        print("  ✓ Pagina con risorse non valide esclusa dal watermark")
+
+    return True
+
+
+def test_batch_partial():
+    """Test dei file parziali nel batch: manifest, metriche e ripresa"""
+    print("\nTest esiti parziali nel batch...")
+    from batch_cli import build_parser, run_batch
+    from instrumentation import metrics
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_dir = os.path.join(work_dir, "in")
+        os.makedirs(input_dir)
+        make_pdf(os.path.join(input_dir, "buono.pdf"), 2)
+        make_pdf(os.path.join(input_dir, "danneggiato.pdf"), 3, broken=[3])
+        output_dir = os.path.join(work_dir, "out")
+        argv = ["watermark", input_dir, "-o", output_dir, "--text", "BOZZA", "--workers", "1",
+                "--skip-bad-pages"]
+
+        metrics.reset()
+        summary = run_batch(build_parser().parse_args(argv), out=io.StringIO())
+        assert summary['done'] == 1 and summary['partial'] == 1 and summary['errors'] == 0
+        assert metrics.counter("partial") == 1 and metrics.counter("failed_pages") == 1
+        with open(os.path.join(output_dir, ".pdf_batch_manifest.jsonl"), 'r') as f:
+            records = {os.path.basename(r['input']): r for r in map(json.loads, f)}
+        assert records['danneggiato.pdf']['status'] == 'partial'
+        assert records['danneggiato.pdf']['failed_pages'] == [3]
+        assert page_texts(os.path.join(output_dir, "danneggiato.pdf")) == ["Pagina 1", "Pagina 2"]
+        print("  ✓ File parziale registrato con le pagine fallite")
+
+        summary = run_batch(build_parser().parse_args(argv), out=io.StringIO())
+        assert summary['skipped'] == 1 and summary['partial'] == 1, "File parziale non ripreso"
+        print("  ✓ Alla ripresa i file parziali vengono rielaborati")
+
+    return True
+
+
+if __name__ == "__main__":
+    success = test_operation_result() and test_skip_bad_pages() and test_batch_partial()
+
+    print("\n" + "=" * 50)
+    print("✅ TUTTI I TEST SUPERATI!" if success else "✗ ALCUNI TEST FALLITI")
+    print("=" * 50)
+    sys.exit(0 if success else 1)
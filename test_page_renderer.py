@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test del render delle pagine in background con prefetch delle vicine
+"""
+
+import sys
+import os
+import time
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Aggiungi il percorso src
+current_dir = Path(__file__).parent
+src_dir = current_dir / "src"
+sys.path.insert(0, str(src_dir))
+
+import fitz
+from PySide6.QtCore import QCoreApplication
+
+
+def make_pdf(path, num_pages):
+    """Crea un PDF di prova con testo su ogni pagina"""
+    doc = fitz.open()
+    for i in range(num_pages):
+        doc.new_page().insert_text((72, 72), f"Pagina {i + 1}")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def wait_for(condition, timeout=30):
+    """Elabora gli eventi Qt finché condition() è vera"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Tempo scaduto in attesa dei render"
+        QCoreApplication.processEvents()
+        time.sleep(0.01)
+
+
+def test_page_renderer():
+    """Test di render nel pool, prefetch, annullamento e pagine modificate"""
+    print("Test PageRenderer...")
+    from advanced_pdf_editor import AdvancedPDFEditor
+    from page_renderer import PageRenderer
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = make_pdf(os.path.join(work_dir, "doc.pdf"), 20)
+        editor = AdvancedPDFEditor()
+        assert editor.open_pdf(source)
+        renderer = PageRenderer(editor, workers=1)
+        ready = []
+        renderer.page_ready.connect(lambda page_num, zoom: ready.append(page_num))
+        try:
+            assert renderer._executor is None, "Pool avviato prima della prima richiesta"
+            assert not renderer.request(5, 1.0), "Pagina già in cache"
+            wait_for(lambda: not renderer.pending())
+            assert sorted(ready) == [3, 4, 5, 6, 7], f"Pagine preparate: {sorted(ready)}"
+            pix = editor.get_page_pixmap(5, 1.0)
+            with fitz.open(source) as doc:
+                expected = doc[5].get_pixmap()
+            assert pix.samples == expected.samples, "Render del pool diverso"
+            assert renderer.request(6, 1.0), "Pagina vicina non preparata"
+            print("  ✓ Pagina e vicine N±1, N±2 renderizzate nel pool")
+
+            # Un solo thread, occupato finché gate non viene aperto: nessuna
+            # richiesta parte prima del controllo dell'annullamento
+            gate = threading.Event()
+            executor = ThreadPoolExecutor(max_workers=1)
+            executor.submit(gate.wait)
+            queued = PageRenderer(editor, executor=executor)
+            try:
+                queued.request(10, 2.0)
+                stale = dict(queued._pending)
+                assert [page_num for page_num, _ in queued.pending()] == [8, 9, 10, 11, 12]
+                queued.request(15, 2.0)
+                assert all(future.cancelled() for future in stale.values()), \
+                    "Richieste obsolete non annullate"
+                assert [page_num for page_num, _ in queued.pending()] == [13, 14, 15, 16, 17]
+                gate.set()
+                wait_for(lambda: not queued.pending())
+                assert queued.request(15, 2.0)
+                assert editor.render_key('pixmap', 10, 2.0) not in editor.render_cache
+            finally:
+                gate.set()
+                queued.shutdown()
+            print("  ✓ Le richieste obsolete in coda vengono annullate")
+
+            assert editor.add_rectangle(15, fitz.Rect(10, 10, 200, 200), fill_color=(1, 0, 0))
+            assert editor.add_rectangle(16, fitz.Rect(10, 10, 200, 200), fill_color=(0, 0, 1))
+            assert renderer.request(15, 1.5), "Pagina modificata non renderizzata subito"
+            edited = editor.get_page_pixmap(15, 1.5)
+            assert edited.pixel(100, 100) == (255, 0, 0), "Modifica non visibile nel render"
+            assert [page_num for page_num, _ in renderer.pending()] == [13, 14, 17], \
+                f"Vicine preparate: {renderer.pending()}"
+            wait_for(lambda: not renderer.pending())
+            assert renderer.request(14, 1.5) and renderer.request(17, 1.5)
+            print("  ✓ Dopo una modifica il pool prepara solo le pagine non modificate")
+
+            events = []
+            renderer.page_ready.connect(lambda page_num, zoom: events.append(("pagina", page_num)))
+            renderer.preview_ready.connect(lambda page_num, zoom: events.append(("anteprima", page_num)))
+            assert not renderer.request(2, 1.0, preview=True)
+            wait_for(lambda: not renderer.pending())
+            assert events.index(("anteprima", 2)) < events.index(("pagina", 2)), \
+                f"Anteprima non prima del render: {events}"
+            assert events.count(("anteprima", 2)) == 1, "Anteprima anche per le pagine vicine"
+            hits = editor.render_cache.info()['hits']
+            preview = editor.get_page_preview(2, 1.0)
+            assert editor.render_cache.info()['hits'] == hits + 1, "Anteprima del pool non in cache"
+            assert preview.width < editor.get_page_pixmap(2, 1.0).width
+            events.clear()
+            assert renderer.request(2, 1.0, preview=True) and not renderer.pending()
+            assert renderer.request(16, 1.0, preview=True), "Pagina modificata non renderizzata subito"
+            wait_for(lambda: not renderer.pending())
+            assert ("anteprima", 16) not in events, "Anteprima di una pagina modificata"
+            print("  ✓ Anteprima renderizzata nel pool prima della pagina")
+        finally:
+            renderer.shutdown()
+            editor.close_pdf()
+    del app
+    return True
+
+
+if __name__ == "__main__":
+    success = test_page_renderer()
+
+    print("\n" + "=" * 50)
+    print("✅ TUTTI I TEST SUPERATI!" if success else "✗ ALCUNI TEST FALLITI")
+    print("=" * 50)
+    sys.exit(0 if success else 1)
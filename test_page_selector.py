@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test del motore di selezione pagine
+"""
+
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+# Aggiungi il percorso src
+current_dir = Path(__file__).parent
+src_dir = current_dir / "src"
+sys.path.insert(0, str(src_dir))
+
+
+def test_page_selector():
+    """Test della sintassi delle espressioni di selezione"""
+    print("Test PageSelector...")
+    from page_selector import PageSelector
+
+    cases = {
+        "1,3,5-8": [1, 3, 5, 6, 7, 8],
+        "odd": [1, 3, 5, 7, 9],
+        "even": [2, 4, 6, 8, 10],
+        "last": [10],
+        "-5..": [6, 7, 8, 9, 10],
+        "z-1": [10, 9, 8, 7, 6, 5, 4, 3, 2, 1],
+        "10-": [10],
+        "8-": [8, 9, 10],
+        "1-z:3": [1, 4, 7, 10],
+        "1-10,!5": [1, 2, 3, 4, 6, 7, 8, 9, 10],
+        "!odd": [2, 4, 6, 8, 10],
+        "3,1,3": [3, 1],
+        "5-20": [5, 6, 7, 8, 9, 10],
+        "20": [],
+    }
+    for expression, expected in cases.items():
+        pages = list(PageSelector(expression).bind(10))
+        assert pages == expected, f"{expression}: {pages} invece di {expected}"
+    print("  ✓ Espressioni risolte correttamente")
+
+    selection = PageSelector("1-z:2,!99999").bind(100000)
+    assert 50001 in selection and 50000 not in selection, "Test di appartenenza errato"
+    assert len(selection.intervals()) == 1, "La selezione non è memorizzata come intervalli"
+    print("  ✓ Appartenenza su 100k pagine senza espansione")
+
+    assert list(PageSelector.coerce([4, 2]).bind(5)) == [4, 2]
+    assert list(PageSelector.coerce(range(0, 10, 3)).bind(20)) == [3, 6, 9]
+    try:
+        PageSelector("pagine")
+        assert False, "Espressione non valida accettata"
+    except ValueError:
+        pass
+    print("  ✓ Conversione da liste/range e validazione")
+
+    return True
+
+
+def test_selector_in_operations():
+    """Test dell'uso delle selezioni nelle operazioni sui PDF"""
+    print("\nTest selezioni in PDFManager e AdvancedPDFEditor...")
+    import fitz
+    from pdf_manager import PDFManager
+    from advanced_pdf_editor import AdvancedPDFEditor
+    from page_selector import PageSelector
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = os.path.join(work_dir, "doc.pdf")
+        doc = fitz.open()
+        for i in range(6):
+            doc.new_page().insert_text((72, 72), f"Pagina {i + 1}")
+        doc.save(source)
+        doc.close()
+
+        output = os.path.join(work_dir, "reverse.pdf")
+        assert PDFManager().extract_pages(source, output, "z-1"), "Estrazione fallita"
+        with fitz.open(output) as extracted:
+            texts = [page.get_text().strip() for page in extracted]
+        assert texts == [f"Pagina {i}" for i in range(6, 0, -1)], f"Ordine errato: {texts}"
+        print("  ✓ extract_pages con ordine inverso")
+
+        editor = AdvancedPDFEditor()
+        assert editor.open_pdf(source)
+        results = editor.search_text("Pagina", PageSelector("even"))
+        assert [page for page, _ in results] == [1, 3, 5], "Ricerca su selezione errata"
+        assert [page for page, _ in editor.search_text("Pagina", 2)] == [2]
+        assert [page for page, _ in editor.search_text("Pagina", "3,5")] == [2, 4]
+        # Liste di interi: numeri da 1 in PDFManager, rifiutate dall'editor (indici da 0)
+        assert list(PageSelector.coerce([3, 5]).bind(6).indices()) == [2, 4]
+        try:
+            editor._page_indices([2, 4])
+            assert False, "Lista di interi accettata dall'editor"
+        except TypeError:
+            pass
+        assert editor.search_text("Pagina", [2, 4]) == []
+        assert not editor.add_rectangle([0, 1], fitz.Rect(10, 10, 50, 50))
+        editor.close_pdf()
+        print("  ✓ search_text su selezione e su singola pagina; liste di interi rifiutate")
+
+    return True
+
+
+if __name__ == "__main__":
+    success = test_page_selector() and test_selector_in_operations()
+
+    print("\n" + "=" * 50)
+    print("✅ TUTTI I TEST SUPERATI!" if success else "✗ ALCUNI TEST FALLITI")
+    print("=" * 50)
+    sys.exit(0 if success else 1)
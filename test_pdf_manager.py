@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test delle operazioni di PDFManager su documenti generati al volo
+"""
+
+import sys
+import os
+import json
+import tempfile
+from pathlib import Path
+
+# Aggiungi il percorso src
+current_dir = Path(__file__).parent
+src_dir = current_dir / "src"
+sys.path.insert(0, str(src_dir))
+
+import fitz
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DictionaryObject, NameObject
+
+
+def make_pdf(path, num_pages, label="Pagina", width=595, height=842):
+    """Crea un PDF di prova con un testo riconoscibile su ogni pagina"""
+    doc = fitz.open()
+    for i in range(num_pages):
+        page = doc.new_page(width=width, height=height)
+        page.insert_text((72, 72), f"{label} {i + 1}", fontsize=14)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def page_texts(path):
+    """Restituisce il testo di ogni pagina"""
+    with fitz.open(path) as doc:
+        return [page.get_text().strip() for page in doc]
+
+
+def test_merge_streaming():
+    """Test dell'unione in streaming con deduplicazione"""
+    print("Test merge_pdfs(streaming=True)...")
+    from pdf_manager import PDFManager
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        first = make_pdf(os.path.join(work_dir, "a.pdf"), 3, "Primo")
+        second = make_pdf(os.path.join(work_dir, "b.pdf"), 2, "Secondo")
+        standard = os.path.join(work_dir, "standard.pdf")
+        streaming = os.path.join(work_dir, "streaming.pdf")
+
+        manager = PDFManager()
+        assert manager.merge_pdfs([first, second], standard), "Unione standard fallita"
+        assert manager.merge_pdfs([first, second], streaming, streaming=True), "Unione streaming fallita"
+        print("  ✓ Entrambe le modalità completate")
+
+        assert page_texts(streaming) == page_texts(standard), "Contenuto delle pagine diverso"
+        assert len(PdfReader(streaming, strict=True).pages) == 5, "Numero di pagine errato"
+        print("  ✓ Stesso contenuto della modalità standard")
+
+        # Lo stesso file unito due volte deve condividere tutte le risorse
+        twice = os.path.join(work_dir, "twice.pdf")
+        assert manager.merge_pdfs([first, first], twice, streaming=True)
+        once = os.path.join(work_dir, "once.pdf")
+        assert manager.merge_pdfs([first], once, streaming=True)
+        assert os.path.getsize(twice) < 2 * os.path.getsize(once), "Risorse non deduplicate"
+        print("  ✓ Risorse condivise scritte una sola volta")
+
+        broken = os.path.join(work_dir, "rotto.pdf")
+        with open(broken, 'wb') as f:
+            f.write(b"%PDF-1.7\nnon un pdf")
+        failed = os.path.join(work_dir, "fallito.pdf")
+        assert not manager.merge_pdfs([first, broken], failed, streaming=True)
+        assert not os.path.exists(failed), "Output a metà rimasto su disco"
+        assert not [name for name in os.listdir(work_dir) if name.endswith(".part")]
+        print("  ✓ Input non valido: nessun output parziale")
+
+    return True
+
+
+def test_split_parallel():
+    """Test della divisione parallela: output identico alla modalità seriale"""
+    print("\nTest split_pdf_pages(workers=2)...")
+    from pdf_manager import PDFManager
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = make_pdf(os.path.join(work_dir, "scan.pdf"), 7)
+        serial_dir = os.path.join(work_dir, "serial")
+        parallel_dir = os.path.join(work_dir, "parallel")
+        os.makedirs(serial_dir)
+        os.makedirs(parallel_dir)
+
+        manager = PDFManager()
+        assert manager.split_pdf_pages(source, serial_dir), "Divisione seriale fallita"
+        assert manager.split_pdf_pages(source, parallel_dir, workers=2, shard_size=3), \
+            "Divisione parallela fallita"
+
+        serial_files = sorted(os.listdir(serial_dir))
+        assert serial_files == sorted(os.listdir(parallel_dir)), "Nomi dei file diversi"
+        assert len(serial_files) == 7, "Numero di file errato"
+        for name in serial_files:
+            with open(os.path.join(serial_dir, name), 'rb') as serial_file, \
+                    open(os.path.join(parallel_dir, name), 'rb') as parallel_file:
+                assert serial_file.read() == parallel_file.read(), f"{name} diverso"
+        print("  ✓ File identici a quelli della modalità seriale")
+
+    return True
+
+
+def test_split_ranges():
+    """Test della divisione multi-intervallo da lista e da CSV"""
+    print("\nTest split_pdf_ranges...")
+    from pdf_manager import PDFManager
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = make_pdf(os.path.join(work_dir, "estratti.pdf"), 10)
+        manager = PDFManager()
+
+        report = manager.split_pdf_ranges(source, work_dir, [(1, 3), (4, 4), (8, 20)])
+        assert report is not None, "Divisione fallita"
+        assert [entry['name'] for entry in report] == [
+            "estratti_pages_1-3", "estratti_pages_4-4", "estratti_pages_8-10"]
+        assert page_texts(report[2]['output_path']) == ["Pagina 8", "Pagina 9", "Pagina 10"]
+        assert all(entry['seconds'] >= 0 for entry in report), "Tempi mancanti"
+        print("  ✓ Intervalli da lista con tempi per intervallo")
+
+        csv_path = os.path.join(work_dir, "clienti.csv")
+        with open(csv_path, 'w', encoding='utf-8') as csv_file:
+            csv_file.write("nome,pagine\nrossi,1-2\nbianchi,5\n")
+        report = manager.split_pdf_ranges(source, work_dir, csv_path)
+        assert [entry['name'] for entry in report] == ["rossi", "bianchi"]
+        assert page_texts(os.path.join(work_dir, "bianchi.pdf")) == ["Pagina 5"]
+        print("  ✓ Intervalli da CSV con nomi personalizzati")
+
+        assert manager.split_pdf_range(source, work_dir, 2, 3), "split_pdf_range fallito"
+        assert page_texts(os.path.join(work_dir, "estratti_pages_2-3.pdf")) == ["Pagina 2", "Pagina 3"]
+        print("  ✓ split_pdf_range invariato")
+
+    return True
+
+
+def test_rotate_incremental():
+    """Test della rotazione selettiva con aggiornamento incrementale"""
+    print("\nTest rotate_pdf(incremental=True)...")
+    from pdf_manager import PDFManager
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        manager = PDFManager()
+        for use_objstms in (0, 1):
+            # Con use_objstms=1 PyMuPDF scrive xref stream e object stream
+            source = os.path.join(work_dir, f"scan_{use_objstms}.pdf")
+            doc = fitz.open()
+            for i in range(5):
+                doc.new_page().insert_text((72, 72), f"Pagina {i + 1}")
+            doc.save(source, use_objstms=use_objstms)
+            doc.close()
+            with open(source, 'rb') as f:
+                original = f.read()
+
+            output = os.path.join(work_dir, f"rotated_{use_objstms}.pdf")
+            assert manager.rotate_pdf(source, output, {2: 90, 4: 270}, incremental=True), \
+                "Rotazione incrementale fallita"
+            with open(output, 'rb') as f:
+                updated = f.read()
+            assert updated.startswith(original), "Il contenuto originale è stato riscritto"
+            assert len(updated) - len(original) < 2048, "Aggiornamento troppo grande"
+
+            rotations = [page.rotation for page in PdfReader(output, strict=True).pages]
+            assert rotations == [0, 90, 0, 270, 0], f"Rotazioni errate: {rotations}"
+            with fitz.open(output) as rotated:
+                assert [page.rotation for page in rotated] == rotations
+
+            # Aggiornamento sul posto, solo pagine selezionate
+            assert manager.rotate_pdf(output, output, 90, pages=[1], incremental=True)
+            rotations = [page.rotation for page in PdfReader(output, strict=True).pages]
+            assert rotations == [90, 90, 0, 270, 0], f"Rotazioni errate: {rotations}"
+        print("  ✓ Solo le pagine modificate aggiunte in coda (xref tabella e stream)")
+
+        full = os.path.join(work_dir, "full.pdf")
+        assert manager.rotate_pdf(source, full, 180, pages=[3, 5])
+        assert [page.rotation for page in PdfReader(full).pages] == [0, 0, 180, 0, 180]
+        print("  ✓ Rotazione selettiva con riscrittura completa")
+
+    return True
+
+
+def test_watermark_shared_xobject():
+    """Test del watermark come Form XObject condiviso per formato di pagina"""
+    print("\nTest add_watermark...")
+    from pdf_manager import PDFManager
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = os.path.join(work_dir, "misto.pdf")
+        doc = fitz.open()
+        for i in range(6):
+            # Alterna A4 verticale e Letter orizzontale
+            width, height = (595, 842) if i % 2 == 0 else (792, 612)
+            doc.new_page(width=width, height=height).insert_text((72, 72), f"Pagina {i + 1}")
+        doc.save(source)
+        doc.close()
+
+        output = os.path.join(work_dir, "watermark.pdf")
+        assert PDFManager().add_watermark(source, output, "RISERVATO"), "Watermark fallito"
+
+        forms = set()
+        for page in PdfReader(output).pages:
+            for name, ref in page["/Resources"]["/XObject"].items():
+                if name.startswith("/PdfEditorWatermark"):
+                    forms.add(ref.idnum)
+        assert len(forms) == 2, f"Attesi 2 template condivisi, trovati {len(forms)}"
+        print("  ✓ Un solo template per formato di pagina")
+
+        with fitz.open(output) as stamped:
+            for page in stamped:
+                assert f"Pagina {page.number + 1}" in page.get_text(), "Contenuto originale perso"
+                hits = page.search_for("RISERVATO")
+                assert hits, f"Watermark assente a pagina {page.number + 1}"
+                center = hits[0].tl + (hits[0].br - hits[0].tl) / 2
+                assert abs(center.x - page.rect.width / 2) < page.rect.width / 4, \
+                    "Watermark non centrato"
+        print("  ✓ Watermark centrato su pagine verticali e orizzontali")
+
+        again = os.path.join(work_dir, "watermark2.pdf")
+        assert PDFManager().add_watermark(output, again, "SECONDO")
+        with fitz.open(again) as stamped:
+            for page in stamped:
+                text = page.get_text()
+                assert "RISERVATO" in text and text.count("SECONDO") == 1, \
+                    f"Watermark precedente sovrascritto: {text!r}"
+        print("  ✓ Un secondo watermark non sostituisce il primo")
+
+        shared = os.path.join(work_dir, "risorse_condivise.pdf")
+        writer = PdfWriter(clone_from=make_pdf(os.path.join(work_dir, "due.pdf"), 2))
+        resources = writer._add_object(DictionaryObject(writer.pages[0]["/Resources"]))
+        for page in writer.pages:
+            page[NameObject("/Resources")] = resources
+        writer.write(shared)
+        stamped_path = os.path.join(work_dir, "condivise_watermark.pdf")
+        assert PDFManager().add_watermark(shared, stamped_path, "RISERVATO", pages="1")
+        first, second = PdfReader(stamped_path).pages
+        assert any(name.startswith("/PdfEditorWatermark") for name in first["/Resources"]["/XObject"])
+        assert not any(name.startswith("/PdfEditorWatermark")
+                       for name in second["/Resources"].get("/XObject", {})), \
+            "Watermark nelle risorse di una pagina non selezionata"
+        assert page_texts(stamped_path) == ["Pagina 1\nRISERVATO", "Pagina 2"]
+        print("  ✓ Risorse condivise tra pagine copiate prima di aggiungere il watermark")
+
+    return True
+
+
+def test_extract_text_streaming():
+    """Test dell'estrazione del testo in streaming, seriale e parallela"""
+    print("\nTest extract_text / iter_text...")
+    from pdf_manager import PDFManager
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = make_pdf(os.path.join(work_dir, "archivio.pdf"), 9)
+        serial = os.path.join(work_dir, "serial.txt")
+        parallel = os.path.join(work_dir, "parallel.txt")
+
+        manager = PDFManager()
+        assert manager.extract_text(source, serial), "Estrazione seriale fallita"
+        assert manager.extract_text(source, parallel, workers=2), "Estrazione parallela fallita"
+        with open(serial, encoding='utf-8') as f:
+            serial_text = f.read()
+        with open(parallel, encoding='utf-8') as f:
+            assert f.read() == serial_text, "Output parallelo diverso da quello seriale"
+        assert serial_text.startswith("--- PAGINA 1 ---\nPagina 1"), "Formato di output cambiato"
+        print("  ✓ Output parallelo identico a quello seriale")
+
+        pages = [page_num for page_num, _ in manager.iter_text(source, workers=2, window=2)]
+        assert pages == list(range(1, 10)), f"Ordine delle pagine errato: {pages}"
+        first = next(iter(manager.iter_text(source, workers=2, pages="odd")))
+        assert first == (1, "Pagina 1"), f"Prima pagina errata: {first}"
+        print("  ✓ Pagine prodotte in ordine con finestra limitata")
+
+    return True
+
+
+def test_convert_images_streaming():
+    """Test della conversione immagini: JPEG senza ricodifica, TIFF multipagina"""
+    print("\nTest convert_images_to_pdf...")
+    from PIL import Image
+    from pdf_manager import PDFManager
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        jpeg_path = os.path.join(work_dir, "foto.jpg")
+        Image.new('RGB', (300, 200), (200, 30, 30)).save(jpeg_path, dpi=(150, 150))
+        png_path = os.path.join(work_dir, "schema.png")
+        Image.new('RGBA', (120, 80), (0, 0, 255, 128)).save(png_path)
+        tiff_path = os.path.join(work_dir, "scansione.tif")
+        frames = [Image.new('L', (100, 140), shade) for shade in (0, 120, 240)]
+        frames[0].save(tiff_path, save_all=True, append_images=frames[1:])
+
+        output = os.path.join(work_dir, "immagini.pdf")
+        manager = PDFManager()
+        assert manager.convert_images_to_pdf([jpeg_path, png_path, tiff_path], output, workers=2), \
+            "Conversione fallita"
+
+        with fitz.open(output) as doc:
+            assert len(doc) == 5, f"Attese 5 pagine, trovate {len(doc)}"
+            jpeg_xref = doc[0].get_images()[0][0]
+            with open(jpeg_path, 'rb') as f:
+                assert doc.xref_stream_raw(jpeg_xref) == f.read(), "JPEG ricodificato"
+            # 300 px a 150 dpi = 2 pollici = 144 punti
+            assert round(doc[0].rect.width) == 144, "Dimensione pagina errata"
+            assert doc[4].get_pixmap().pixel(50, 70)[0] > 200, "Fotogramma TIFF errato"
+        print("  ✓ JPEG incorporato byte per byte, TIFF espansa in 3 pagine")
+
+        reduced = os.path.join(work_dir, "ridotto.pdf")
+        assert manager.convert_images_to_pdf([jpeg_path], reduced, target_dpi=75)
+        with fitz.open(reduced) as doc:
+            info = doc.extract_image(doc[0].get_images()[0][0])
+            assert (info['width'], info['height']) == (150, 100), "Immagine non ridotta"
+            assert round(doc[0].rect.width) == 144, "La riduzione ha cambiato la pagina"
+        print("  ✓ Riduzione a target_dpi")
+
+    return True
+
+
+def test_probe_and_inventory():
+    """Test della lettura rapida delle informazioni e dell'inventario con cache"""
+    print("\nTest get_pdf_info / inventory...")
+    from pdf_manager import PDFManager
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        archive = os.path.join(work_dir, "archivio", "2024")
+        os.makedirs(archive)
+        doc = fitz.open()
+        for i in range(4):
+            doc.new_page()
+        doc.set_metadata({'title': "Bilancio", 'producer': "Test Producer"})
+        first = os.path.join(archive, "bilancio.pdf")
+        doc.save(first)
+        doc.save(os.path.join(work_dir, "archivio", "cifrato.pdf"),
+                 encryption=fitz.PDF_ENCRYPT_AES_256, user_pw="segreta", owner_pw="segreta")
+        doc.close()
+        with open(os.path.join(archive, "rotto.pdf"), 'wb') as f:
+            f.write(b"non sono un pdf")
+
+        manager = PDFManager()
+        info = manager.get_pdf_info(first)
+        assert info['num_pages'] == 4 and info['title'] == "Bilancio", f"Info errate: {info}"
+        assert info['producer'] == "Test Producer" and not info['encrypted']
+        assert info['file_size'] == os.path.getsize(first) and info['version']
+        print("  ✓ Informazioni lette da trailer e Info")
+
+        cache = os.path.join(work_dir, "cache.sqlite")
+        results = manager.inventory(os.path.join(work_dir, "archivio"), cache_path=cache, workers=1)
+        by_name = {os.path.basename(r['path']): r for r in results}
+        assert set(by_name) == {"bilancio.pdf", "cifrato.pdf", "rotto.pdf"}
+        assert by_name["cifrato.pdf"]['encrypted'] and by_name["cifrato.pdf"]['num_pages'] is None
+        assert 'error' in by_name["rotto.pdf"], "Errore non riportato"
+        print("  ✓ Inventario ricorsivo con file cifrati e illeggibili")
+
+        from pdf_inventory import PDFInventory
+        with PDFInventory(cache) as pdf_inventory:
+            pdf_inventory.scan(os.path.join(work_dir, "archivio"))
+            assert pdf_inventory.stats['cached'] == 3 and pdf_inventory.stats['probed'] == 0
+        print("  ✓ Seconda scansione servita dalla cache")
+
+        if hasattr(os, 'symlink'):
+            dangling = os.path.join(archive, "collegamento.pdf")
+            os.symlink(os.path.join(work_dir, "mancante.pdf"), dangling)
+            with PDFInventory(cache) as pdf_inventory:
+                results = pdf_inventory.scan(os.path.join(work_dir, "archivio"))
+            by_path = {r['path']: r for r in results}
+            assert 'error' in by_path[dangling], "Collegamento interrotto non riportato"
+            assert by_path[first]['num_pages'] == 4, "Scansione interrotta dal collegamento"
+            print("  ✓ Collegamento simbolico interrotto riportato senza fermare la scansione")
+
+    return True
+
+
+def test_backends():
+    """Test dei backend pypdf e PyMuPDF: output equivalente e scelta automatica"""
+    print("\nTest backend PDF...")
+    from pdf_manager import PDFManager
+    from pdf_backends import load_calibration, reload_calibration, select_backend
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = make_pdf(os.path.join(work_dir, "doc.pdf"), 4)
+        outputs = {}
+        for name in ("pypdf", "pymupdf"):
+            manager = PDFManager(backend=name)
+            merged = os.path.join(work_dir, f"merged_{name}.pdf")
+            rotated = os.path.join(work_dir, f"rotated_{name}.pdf")
+            text = os.path.join(work_dir, f"text_{name}.txt")
+            split_dir = os.path.join(work_dir, f"split_{name}")
+            os.makedirs(split_dir)
+            assert manager.merge_pdfs([source, source], merged), f"Unione fallita ({name})"
+            assert manager.rotate_pdf(source, rotated, 90, pages="even"), f"Rotazione fallita ({name})"
+            assert manager.extract_text(source, text), f"Estrazione fallita ({name})"
+            assert manager.split_pdf_pages(source, split_dir), f"Divisione fallita ({name})"
+            with open(text, encoding='utf-8') as f:
+                outputs[name] = (
+                    page_texts(merged),
+                    [page.rotation for page in PdfReader(rotated).pages],
+                    f.read(),
+                    sorted(os.listdir(split_dir)),
+                )
+        assert outputs["pypdf"] == outputs["pymupdf"], "I backend producono risultati diversi"
+        assert outputs["pypdf"][1] == [0, 90, 0, 90], "Rotazione errata"
+        print("  ✓ Unione, rotazione, testo e divisione equivalenti")
+
+        calibration = {"merge": [[1000, "pypdf"], [None, "pymupdf"]]}
+        assert select_backend("merge", 500, calibration) == "pypdf"
+        assert select_backend("merge", 5000, calibration) == "pymupdf"
+        uncalibrated = load_calibration(os.path.join(work_dir, "nessuna_calibrazione.json"))
+        assert all(select_backend(operation, size, uncalibrated) == "pypdf"
+                   for operation in uncalibrated for size in (1000, 10 ** 9)), \
+            "Motore cambiato senza calibrazione"
+        saved = os.path.join(work_dir, "calibrazione.json")
+        with open(saved, 'w', encoding='utf-8') as f:
+            json.dump(calibration, f)
+        reload_calibration()
+        assert load_calibration(saved)["merge"] == calibration["merge"]
+        mtime = os.stat(saved).st_mtime_ns
+        with open(saved, 'w', encoding='utf-8') as f:
+            f.write("non json")
+        os.utime(saved, ns=(mtime, mtime))  # Stessa data di modifica: il file non viene riletto
+        assert load_calibration(saved)["merge"] == calibration["merge"], "Calibrazione riletta"
+        os.utime(saved, ns=(mtime, mtime + 10 ** 9))
+        assert load_calibration(saved)["merge"] == [[None, "pypdf"]], "Calibrazione cambiata non riletta"
+        print("  ✓ Calibrazione letta una volta per processo, riletta se il file cambia")
+
+        assert PDFManager().merge_pdfs([source], os.path.join(work_dir, "auto.pdf"), backend="auto")
+        assert not PDFManager().merge_pdfs([source], os.path.join(work_dir, "x.pdf"), backend="ghostscript")
+        print("  ✓ Scelta automatica per dimensione e backend sconosciuto rifiutato")
+
+    return True
+
+
+if __name__ == "__main__":
+    tests = [
+        test_merge_streaming,
+        test_split_parallel,
+        test_split_ranges,
+        test_rotate_incremental,
+        test_watermark_shared_xobject,
+        test_extract_text_streaming,
+        test_convert_images_streaming,
+        test_probe_and_inventory,
+        test_backends,
+    ]
+    success = all(test() for test in tests)
+
+    print("\n" + "=" * 50)
+    print("✅ TUTTI I TEST SUPERATI!" if success else "✗ ALCUNI TEST FALLITI")
+    print("=" * 50)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test della pipeline di operazioni in memoria
+"""
+
+import sys
+import os
+import io
+import json
+import tempfile
+import contextlib
+from pathlib import Path
+
+# Aggiungi il percorso src
+current_dir = Path(__file__).parent
+src_dir = current_dir / "src"
+sys.path.insert(0, str(src_dir))
+
+import fitz
+
+
+def make_pdf(path, num_pages, label="Pagina"):
+    """Crea un PDF di prova con un testo riconoscibile su ogni pagina"""
+    doc = fitz.open()
+    for i in range(num_pages):
+        doc.new_page().insert_text((72, 72), f"{label} {i + 1} Riservato")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def test_pipeline_stages():
+    """Test della composizione merge → rotate → watermark → redact → encrypt"""
+    print("Test PDFPipeline...")
+    from pdf_pipeline import PDFPipeline
+    from pdf_manager import PDFManager
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        first = make_pdf(os.path.join(work_dir, "a.pdf"), 2, "Primo")
+        second = make_pdf(os.path.join(work_dir, "b.pdf"), 3, "Secondo")
+        output = os.path.join(work_dir, "out.pdf")
+
+        report = (PDFPipeline()
+                  .merge([second])
+                  .rotate(90, pages="odd")
+                  .extract("z-1")
+                  .watermark("BOZZA")
+                  .redact(terms=["Riservato"])
+                  .encrypt("segreta")
+                  .run(first, output))
+        assert report is not None, "Pipeline fallita"
+        stages = [entry['stage'] for entry in report]
+        assert stages == ['load', 'merge', 'rotate', 'extract', 'watermark', 'redact',
+                          'encrypt', 'save'], f"Fasi errate: {stages}"
+        assert all(entry['seconds'] >= 0 for entry in report)
+        assert [entry['pages'] for entry in report[:2]] == [2, 5], "Conteggio pagine errato"
+        print("  ✓ Tempi riportati per ogni fase")
+
+        with fitz.open(output) as doc:
+            assert doc.needs_pass and doc.authenticate("segreta"), "PDF non cifrato"
+            texts = [page.get_text() for page in doc]
+            assert [page.rotation for page in doc] == [90, 0, 90, 0, 90], "Rotazione errata"
+        assert texts[0].startswith("Secondo 3") and texts[-1].startswith("Primo 1"), "Ordine errato"
+        assert all("BOZZA" in text and "Riservato" not in text for text in texts), \
+            "Watermark o redaction mancanti"
+        print("  ✓ Documento letto e salvato una sola volta con tutte le modifiche")
+
+        # Il watermark coincide con quello di PDFManager, anche su pagine ruotate
+        rotated = os.path.join(work_dir, "ruotato.pdf")
+        PDFManager().rotate_pdf(first, rotated, 90, pages="1")
+        from_pipeline = os.path.join(work_dir, "pipeline.pdf")
+        from_manager = os.path.join(work_dir, "manager.pdf")
+        assert PDFPipeline().watermark("BOZZA").run(rotated, from_pipeline)
+        assert PDFManager().add_watermark(rotated, from_manager, "BOZZA")
+        with fitz.open(from_pipeline) as a, fitz.open(from_manager) as b:
+            for page_a, page_b in zip(a, b):
+                assert page_a.get_pixmap(dpi=30).samples == page_b.get_pixmap(dpi=30).samples, \
+                    "Watermark diverso da PDFManager.add_watermark"
+        print("  ✓ Watermark identico a PDFManager.add_watermark")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert PDFPipeline().extract("!all").run(first, output) is None, \
+                "Documento vuoto accettato"
+        try:
+            PDFPipeline().add("compress")
+            assert False, "Operazione sconosciuta accettata"
+        except ValueError:
+            pass
+        print("  ✓ Errori segnalati")
+
+    return True
+
+
+def test_pipeline_recipe():
+    """Test delle ricette JSON/YAML e dell'esecuzione in batch"""
+    print("\nTest ricette della pipeline...")
+    from pdf_pipeline import PDFPipeline, run_recipe, yaml
+    from batch_cli import build_parser, run_batch
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = make_pdf(os.path.join(work_dir, "doc.pdf"), 3)
+        recipe = {"steps": [{"op": "extract", "pages": "1-2"},
+                            {"op": "stamp", "text": "INTERNO", "pages": "1"},
+                            {"op": "remove_metadata"}]}
+        assert PDFPipeline.from_recipe(recipe).to_recipe() == recipe, "Ricetta non conservata"
+
+        recipe_path = os.path.join(work_dir, "ricetta.json")
+        with open(recipe_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(recipe, input=source, output=os.path.join(work_dir, "r.pdf")), f)
+        report = run_recipe(recipe_path)
+        assert report is not None and report[-1]['pages'] == 2, "Ricetta JSON non eseguita"
+        with fitz.open(os.path.join(work_dir, "r.pdf")) as doc:
+            assert "INTERNO" in doc[0].get_text(), "Timbro mancante"
+            assert doc.metadata['producer'] == "PDF Editor Pro", "Metadati non rimossi"
+        print("  ✓ Ricetta JSON con input e output")
+
+        if yaml is not None:
+            yaml_path = os.path.join(work_dir, "ricetta.yaml")
+            with open(yaml_path, 'w', encoding='utf-8') as f:
+                f.write("steps:\n  - op: rotate\n    angle: 180\n")
+            assert run_recipe(yaml_path, source, os.path.join(work_dir, "y.pdf")) is not None
+            with fitz.open(os.path.join(work_dir, "y.pdf")) as doc:
+                assert doc[0].rotation == 180, "Ricetta YAML non applicata"
+            print("  ✓ Ricetta YAML")
+
+        args = build_parser().parse_args(["pipeline", source, "-o", os.path.join(work_dir, "batch"),
+                                          "--recipe", recipe_path, "--workers", "1"])
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = run_batch(args, out=io.StringIO())
+        assert summary['done'] == 1 and summary['errors'] == 0, f"Batch fallito: {summary}"
+        assert os.path.exists(os.path.join(work_dir, "batch", "doc.pdf")), "Output batch mancante"
+        print("  ✓ Ricetta eseguita da pdf_batch")
+
+    return True
+
+
+if __name__ == "__main__":
+    success = test_pipeline_stages() and test_pipeline_recipe()
+
+    print("\n" + "=" * 50)
+    print("✅ TUTTI I TEST SUPERATI!" if success else "✗ ALCUNI TEST FALLITI")
+    print("=" * 50)
+    sys.exit(0 if success else 1)
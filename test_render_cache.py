@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test della cache in memoria dei render delle pagine
+"""
+
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+# Aggiungi il percorso src
+current_dir = Path(__file__).parent
+src_dir = current_dir / "src"
+sys.path.insert(0, str(src_dir))
+
+import fitz
+
+
+def make_pdf(path, num_pages):
+    """Crea un PDF di prova con testo su ogni pagina"""
+    doc = fitz.open()
+    for i in range(num_pages):
+        doc.new_page().insert_text((72, 72), f"Pagina {i + 1}")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def test_render_cache_lru():
+    """Test del limite di memoria e delle statistiche"""
+    print("Test RenderCache...")
+    from PIL import Image
+    from render_cache import RenderCache
+
+    cache = RenderCache(max_bytes=2 * 10 * 10 * 3)
+    for key in ("a", "b"):
+        cache.put(key, Image.new("RGB", (10, 10)))
+    assert cache.get("a") is not None  # "b" diventa il meno usato
+    cache.put("c", Image.new("RGB", (10, 10)))
+    assert cache.get("b") is None and cache.get("a") is not None and cache.get("c") is not None
+    assert cache.size <= cache.max_bytes and len(cache) == 2
+    print("  ✓ Eliminata l'immagine usata meno di recente")
+
+    cache.put("grande", Image.new("RGB", (100, 100)))
+    assert cache.get("grande") is None, "Immagine oltre il limite in cache"
+    info = cache.info()
+    assert info['hits'] == 3 and info['misses'] == 2 and info['evictions'] == 1
+    assert info['hit_rate'] == 0.6
+    print("  ✓ Statistiche di hit, miss ed eliminazioni")
+    return True
+
+
+def test_editor_render_cache():
+    """Test dei render riusati e invalidati dalle modifiche"""
+    print("\nTest cache dei render nell'editor...")
+    from advanced_pdf_editor import AdvancedPDFEditor
+    from pdf_form_editor import PDFFormEditor
+    from render_cache import RenderCache
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = make_pdf(os.path.join(work_dir, "doc.pdf"), 3)
+        editor = AdvancedPDFEditor(render_cache=RenderCache())
+        assert editor.open_pdf(source)
+
+        first = editor.get_page_image(0, 1.0)
+        other = editor.get_page_image(1, 1.0)
+        assert editor.get_page_image(0, 1.0).tobytes() == first.tobytes()
+        assert editor.render_cache.info()['hits'] == 1, "Render non riusato"
+        assert editor.get_page_image(0, 2.0).size != first.size, "Zoom diverso nella stessa voce"
+        print("  ✓ Render riusato per stessa pagina e stesso zoom")
+
+        first.paste((255, 0, 0), (0, 0, 50, 50))
+        assert editor.get_page_image(0, 1.0).getpixel((10, 10)) == (255, 255, 255), \
+            "Immagine in cache modificata dal chiamante"
+        assert editor.render_cache.info()['hits'] == 2
+        print("  ✓ Il chiamante riceve una copia modificabile")
+
+        assert editor.add_highlight(0, fitz.Rect(60, 55, 200, 80))
+        edited = editor.get_page_image(0, 1.0)
+        assert edited.getpixel((100, 70)) != (255, 255, 255), "Render obsoleto"
+        hits = editor.render_cache.info()['hits']
+        assert editor.get_page_image(1, 1.0).tobytes() == other.tobytes()
+        assert editor.render_cache.info()['hits'] == hits + 1, \
+            "Invalidata anche una pagina non modificata"
+        print("  ✓ La modifica invalida solo la pagina toccata")
+
+        assert PDFFormEditor(editor).create_text_field(1, fitz.Rect(50, 100, 200, 130), "nome")
+        editor.get_page_image(1, 1.0)
+        assert editor.render_cache.info()['hits'] == hits + 1, "Campo form non invalidato"
+        third = editor.get_page_image(2, 1.0)
+        # Modifica diretta del documento, non vista dalla cache finché non viene invalidata
+        editor.current_doc[2].draw_rect(fitz.Rect(10, 10, 50, 50), fill=(0, 0, 0))
+        assert editor.get_page_image(2, 1.0).tobytes() == third.tobytes()
+        editor.invalidate_render("3")
+        assert editor.get_page_image(2, 1.0).tobytes() != third.tobytes()
+        print("  ✓ Invalidazione da form editor e da invalidate_render")
+
+        info = editor.render_cache.info()
+        assert info['hits'] == hits + 2 and info['entries'] > 0
+        editor.close_pdf()
+        assert len(editor.render_cache) == 0, "Render del documento chiuso ancora in memoria"
+        print("  ✓ Chiudendo il documento la memoria viene liberata")
+
+    return True
+
+
+def test_pixmap_display():
+    """Test del passaggio diretto dei pixel a QImage"""
+    print("\nTest pixmap -> QImage...")
+    from advanced_pdf_editor import AdvancedPDFEditor
+    from acrobat_like_gui import pil_to_qimage, pixmap_to_qimage
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = make_pdf(os.path.join(work_dir, "doc.pdf"), 1)
+        editor = AdvancedPDFEditor()
+        assert editor.open_pdf(source)
+        assert editor.add_rectangle(0, fitz.Rect(20, 20, 120, 90), fill_color=(1, 0, 0))
+        pix = editor.get_page_pixmap(0, 1.5)
+        assert editor.get_page_pixmap(0, 1.5) is pix, "Pixmap non riusato"
+
+        direct = pixmap_to_qimage(pix)
+        fallback = pil_to_qimage(editor.get_page_image(0, 1.5))
+        assert (direct.width(), direct.height()) == (pix.width, pix.height)
+        for x, y in ((50, 50), (300, 400), (pix.width - 1, pix.height - 1)):
+            assert direct.pixelColor(x, y) == fallback.pixelColor(x, y), f"Pixel ({x}, {y}) diverso"
+        editor.close_pdf()
+        print("  ✓ Stessa immagine del percorso PIL, senza codifica PNG")
+
+    return True
+
+
+def test_page_preview():
+    """Test dell'anteprima veloce a bassa risoluzione"""
+    print("\nTest anteprima veloce...")
+    from advanced_pdf_editor import AdvancedPDFEditor
+    from acrobat_like_gui import pixmap_to_qimage
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = make_pdf(os.path.join(work_dir, "doc.pdf"), 2)
+        editor = AdvancedPDFEditor()
+        assert editor.open_pdf(source)
+        aa_level = fitz.TOOLS.show_aa_level()
+
+        preview = editor.get_page_preview(0, 2.0, scale=0.25, grayscale=True)
+        full_width, full_height = editor.page_pixel_size(0, 2.0)
+        assert abs(preview.width - full_width / 4) <= 1 and abs(preview.height - full_height / 4) <= 1
+        assert preview.n == 1 and pixmap_to_qimage(preview) is not None
+        assert fitz.TOOLS.show_aa_level() == aa_level, "Antialiasing non ripristinato"
+        assert editor.get_page_preview(0, 2.0, scale=0.25, grayscale=True) is preview
+        assert editor.get_page_preview(0, 2.0, scale=0.5, grayscale=False).n == 3
+        print("  ✓ Anteprima ridotta, in grigi, senza modificare l'antialiasing globale")
+
+        assert editor.add_rectangle(0, fitz.Rect(10, 10, 100, 100), fill_color=(0, 0, 0))
+        assert editor.get_page_preview(0, 2.0, scale=0.25, grayscale=True) is not preview
+        editor.close_pdf()
+        print("  ✓ Anteprima invalidata dalle modifiche")
+
+    return True
+
+
+if __name__ == "__main__":
+    success = (test_render_cache_lru() and test_editor_render_cache() and test_pixmap_display()
+               and test_page_preview())
+
+    print("\n" + "=" * 50)
+    print("✅ TUTTI I TEST SUPERATI!" if success else "✗ ALCUNI TEST FALLITI")
+    print("=" * 50)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test della cache dei risultati indirizzata per contenuto
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+# Aggiungi il percorso src
+current_dir = Path(__file__).parent
+src_dir = current_dir / "src"
+sys.path.insert(0, str(src_dir))
+
+import fitz
+
+
+def make_pdf(path, num_pages, label="Pagina"):
+    """Crea un PDF di prova con un testo riconoscibile su ogni pagina"""
+    doc = fitz.open()
+    for i in range(num_pages):
+        doc.new_page().insert_text((72, 72), f"{label} {i + 1}")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_manager_cache():
+    """Test della cache sulle operazioni file -> file di PDFManager"""
+    print("Test cache di PDFManager...")
+    from pdf_manager import PDFManager
+    from result_cache import ResultCache
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache = ResultCache(os.path.join(work_dir, "cache"))
+        manager = PDFManager(cache=cache)
+        source = make_pdf(os.path.join(work_dir, "doc.pdf"), 3)
+
+        first = os.path.join(work_dir, "r1.pdf")
+        assert manager.rotate_pdf(source, first, 90, pages="odd")
+        assert cache.stats['misses'] == 1 and cache.stats['stores'] == 1
+        second = os.path.join(work_dir, "r2.pdf")
+        assert manager.rotate_pdf(source, second, 90, pages="odd")
+        assert cache.stats['hits'] == 1, "Risultato non riusato"
+        assert read(first) == read(second), "Risultato in cache diverso"
+        print("  ✓ Stessa operazione sullo stesso file servita dalla cache")
+
+        # La chiave dipende dai byte, non dal percorso
+        copy = shutil.copy(source, os.path.join(work_dir, "copia.pdf"))
+        assert manager.rotate_pdf(copy, os.path.join(work_dir, "r3.pdf"), 90, pages="odd")
+        assert cache.stats['hits'] == 2, "Copia identica non riconosciuta"
+        assert manager.rotate_pdf(source, os.path.join(work_dir, "r4.pdf"), 180, pages="odd")
+        make_pdf(copy, 3, "Modificato")
+        assert manager.rotate_pdf(copy, os.path.join(work_dir, "r5.pdf"), 90, pages="odd")
+        assert cache.stats['hits'] == 2, "Parametri o contenuto diversi serviti dalla cache"
+        print("  ✓ Chiave su contenuto e parametri")
+
+        split_dir = os.path.join(work_dir, "pagine")
+        os.makedirs(split_dir)
+        assert manager.split_pdf_pages(source, split_dir)
+        shutil.rmtree(split_dir)
+        os.makedirs(split_dir)
+        assert manager.split_pdf_pages(source, split_dir, workers=4)
+        assert sorted(os.listdir(split_dir)) == [f"doc_page_{i}.pdf" for i in (1, 2, 3)], \
+            "File divisi non ripristinati"
+        assert cache.stats['hits'] == 3
+        print("  ✓ Divisione in pagine ripristinata nella cartella di output")
+
+        # Le operazioni non riuscite non vengono memorizzate
+        stores = cache.stats['stores']
+        assert not manager.extract_pages(source, os.path.join(work_dir, "x.pdf"), "a-b")
+        assert cache.stats['stores'] == stores, "Errore memorizzato in cache"
+        print("  ✓ Errori non memorizzati")
+
+        info = cache.info()
+        assert info['entries'] == cache.stats['stores'] and info['size'] > 0
+        cache.evict(max_bytes=info['size'] - 1)
+        assert cache.info()['entries'] == info['entries'] - 1, "Eviction LRU errata"
+        # La voce usata meno di recente (rotazione 90 di doc.pdf) è stata eliminata
+        assert manager.rotate_pdf(source, second, 90, pages="odd")
+        assert cache.stats['hits'] == 3 and cache.stats['evictions'] == 1
+        print("  ✓ Limite di dimensione con eviction LRU")
+        cache.close()
+
+    return True
+
+
+def test_render_cache():
+    """Test della cache dei render di AdvancedPDFEditor.get_page_image"""
+    print("\nTest cache dei render...")
+    from advanced_pdf_editor import AdvancedPDFEditor
+    from result_cache import ResultCache
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache = ResultCache(os.path.join(work_dir, "cache"))
+        source = make_pdf(os.path.join(work_dir, "doc.pdf"), 2)
+
+        editor = AdvancedPDFEditor(cache=cache)
+        assert editor.open_pdf(source)
+        image = editor.get_page_image(0, 1.5)
+        editor.close_pdf()
+
+        editor = AdvancedPDFEditor(cache=cache)
+        assert editor.open_pdf(source)
+        cached = editor.get_page_image(0, 1.5)
+        assert cache.stats['hits'] == 1, "Render non riusato"
+        assert cached.tobytes() == image.tobytes(), "Render in cache diverso"
+        print("  ✓ Render riusato tra sessioni")
+
+        # Dopo una modifica il render deve riflettere il documento in memoria
+        assert editor.add_rectangle(0, (50, 50, 200, 200), fill_color=(1, 0, 0))
+        edited = editor.get_page_image(0, 1.5)
+        assert edited.tobytes() != image.tobytes(), "Render obsoleto dopo la modifica"
+        assert cache.stats['hits'] == 1
+        editor.close_pdf()
+        print("  ✓ Nessun render obsoleto dopo una modifica")
+        cache.close()
+
+    return True
+
+
+if __name__ == "__main__":
+    success = test_manager_cache() and test_render_cache()
+
+    print("\n" + "=" * 50)
+    print("✅ TUTTI I TEST SUPERATI!" if success else "✗ ALCUNI TEST FALLITI")
+    print("=" * 50)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test delle miniature virtualizzate con cache su disco
+"""
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Aggiungi il percorso src
+current_dir = Path(__file__).parent
+src_dir = current_dir / "src"
+sys.path.insert(0, str(src_dir))
+
+import fitz
+from PySide6.QtCore import QCoreApplication, Qt
+
+from result_cache import ResultCache
+
+
+def make_pdf(path, num_pages):
+    """Crea un PDF di prova con testo su ogni pagina"""
+    doc = fitz.open()
+    for i in range(num_pages):
+        doc.new_page().insert_text((72, 72), f"Pagina {i + 1}", fontsize=40)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+class SlowDigestCache(ResultCache):
+    """ResultCache con l'hash dei file bloccato finché gate non viene aperto"""
+
+    def __init__(self, cache_dir):
+        super().__init__(cache_dir)
+        self.gate = threading.Event()
+
+    def file_digest(self, path):
+        self.gate.wait(30)
+        return super().file_digest(path)
+
+
+def wait_for(condition, timeout=30):
+    """Elabora gli eventi Qt finché condition() è vera"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Tempo scaduto in attesa delle miniature"
+        QCoreApplication.processEvents()
+        time.sleep(0.01)
+
+
+def test_thumbnail_model():
+    """Test di miniature solo per le pagine richieste, cache su disco e modifiche"""
+    print("Test miniature...")
+    from advanced_pdf_editor import AdvancedPDFEditor
+    from page_renderer import PageRenderer
+    from thumbnail_model import ThumbnailModel
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = make_pdf(os.path.join(work_dir, "doc.pdf"), 2000)
+        cache = ResultCache(os.path.join(work_dir, "cache"))
+        editor = AdvancedPDFEditor()
+        renderer = PageRenderer(editor, workers=1)
+        try:
+            model = ThumbnailModel(editor, renderer, cache=cache)
+            assert editor.open_pdf(source)
+            model.reload()
+            wait_for(lambda: model.digest() is not None)
+            assert model.rowCount() == 2000
+            assert model.data(model.index(9), Qt.DisplayRole) == "Pagina 10"
+            for page_num in range(5):
+                assert model.data(model.index(page_num), Qt.DecorationRole) is model.placeholder()
+            assert renderer.pending_thumbnails() == [0, 1, 2, 3, 4], "Miniature non richieste"
+            print("  ✓ Elenco di 2000 pagine senza renderizzarle; solo le visibili in coda")
+
+            wait_for(lambda: all(model.is_loaded(page_num) for page_num in range(5)))
+            image = model.thumbnail(0)
+            assert image.width() == model.width and image.height() > image.width()
+            assert cache.stats['stores'] == 5
+            # Un solo thread, occupato finché gate non viene aperto: le
+            # miniature restano in coda fino al controllo dell'annullamento
+            gate = threading.Event()
+            executor = ThreadPoolExecutor(max_workers=1)
+            executor.submit(gate.wait)
+            queued = PageRenderer(editor, executor=executor)
+            try:
+                queued_model = ThumbnailModel(editor, queued, cache=cache)
+                queued_model.reload()
+                for page_num in range(5, 8):
+                    assert queued_model.thumbnail(page_num) is queued_model.placeholder()
+                queued_futures = dict(queued._thumbnails_pending)
+                queued_model.set_visible_rows(0, 5)
+                assert queued.pending_thumbnails() == [5], "Miniature non più visibili ancora in coda"
+                assert [future.cancelled() for future in queued_futures.values()] == \
+                    [False, True, True]
+                gate.set()
+                wait_for(lambda: queued_model.is_loaded(5))
+            finally:
+                gate.set()
+                queued.shutdown()
+            print("  ✓ Miniature create nel pool e annullate se non più visibili")
+
+            assert editor.add_rectangle(0, fitz.Rect(0, 0, 600, 800), fill_color=(0, 0, 0))
+            model.refresh()
+            assert not model.is_loaded(0) and model.is_loaded(1), "Miniatura non invalidata"
+            model.thumbnail(0)
+            wait_for(lambda: model.is_loaded(0))
+            assert model.thumbnail(0).pixelColor(60, 60).name() == "#000000"
+            stores = cache.stats['stores']
+            print("  ✓ Dopo una modifica solo la pagina cambiata viene rigenerata")
+            editor.close_pdf()
+
+            copy = shutil.copyfile(source, os.path.join(work_dir, "copia.pdf"))
+            assert editor.open_pdf(copy)
+            model.reload()
+            wait_for(lambda: model.digest() == model.cache.file_digest(source))
+            for page_num in range(5):
+                assert model.thumbnail(page_num) is not model.placeholder(), "Miniatura non in cache"
+            assert not renderer.pending_thumbnails() and cache.stats['stores'] == stores
+            assert model.thumbnail(0).pixelColor(60, 60).name() == "#ffffff", \
+                "Miniatura della pagina modificata salvata su disco"
+            print("  ✓ Riaprendo il documento le miniature arrivano dalla cache su disco")
+            editor.close_pdf()
+        finally:
+            renderer.shutdown()
+            cache.close()
+
+        slow_cache = SlowDigestCache(os.path.join(work_dir, "cache_lenta"))
+        editor = AdvancedPDFEditor()
+        renderer = PageRenderer(editor, executor=ThreadPoolExecutor(max_workers=1))
+        try:
+            model = ThumbnailModel(editor, renderer, cache=slow_cache)
+            assert editor.open_pdf(make_pdf(os.path.join(work_dir, "piccolo.pdf"), 3))
+            model.reload()
+            assert model.digest() is None, "Hash del file calcolato in reload"
+            model.thumbnail(0)
+            wait_for(lambda: model.is_loaded(0))
+            assert slow_cache.stats['stores'] == 1
+            model.reload()
+            assert model.thumbnail(0) is not model.placeholder(), "Miniatura non trovata senza hash"
+            slow_cache.gate.set()
+            wait_for(lambda: model.digest() is not None)
+            assert model.thumbnail(0) is not model.placeholder()
+            print("  ✓ Hash del file in un thread; intanto cache per percorso e data di modifica")
+            editor.close_pdf()
+        finally:
+            slow_cache.gate.set()
+            renderer.shutdown()
+            slow_cache.close()
+    del app
+    return True
+
+
+if __name__ == "__main__":
+    success = test_thumbnail_model()
+
+    print("\n" + "=" * 50)
+    print("✅ TUTTI I TEST SUPERATI!" if success else "✗ ALCUNI TEST FALLITI")
+    print("=" * 50)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test del render a riquadri per gli zoom elevati
+"""
+
+import sys
+import os
+import time
+import tempfile
+from pathlib import Path
+
+# Aggiungi il percorso src
+current_dir = Path(__file__).parent
+src_dir = current_dir / "src"
+sys.path.insert(0, str(src_dir))
+
+import fitz
+from PySide6.QtCore import QCoreApplication
+
+
+def make_drawing(path, paper="a4"):
+    """Crea un PDF con un disegno vettoriale su tutta la pagina"""
+    doc = fitz.open()
+    width, height = fitz.paper_size(paper)
+    page = doc.new_page(width=width, height=height)
+    for i in range(40):
+        page.draw_line((10, i * height / 40), (width - 10, height - i * height / 40),
+                       color=(i / 40, 0, 1 - i / 40), width=2)
+    page.draw_rect(fitz.Rect(100, 100, 300, 250), fill=(0, 0.6, 0))
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def wait_for(condition, timeout=30):
+    """Elabora gli eventi Qt finché condition() è vera"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Tempo scaduto in attesa dei riquadri"
+        QCoreApplication.processEvents()
+        time.sleep(0.01)
+
+
+def max_difference(tile, full, x0, y0, step=3):
+    """Massima differenza di colore tra il riquadro e la stessa zona del render intero"""
+    return max(max(abs(a - b) for a, b in zip(tile.pixel(x, y), full.pixel(x0 + x, y0 + y)))
+               for x in range(0, tile.width, step) for y in range(0, tile.height, step))
+
+
+def test_page_tiles():
+    """Test dei riquadri: posizione, contenuto, cache e invalidazione"""
+    print("Test render a riquadri...")
+    from advanced_pdf_editor import AdvancedPDFEditor
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = make_drawing(os.path.join(work_dir, "disegno.pdf"))
+        editor = AdvancedPDFEditor()
+        assert editor.open_pdf(source)
+        zoom, size = 2.5, 256
+        full = editor.get_page_pixmap(0, zoom)
+        assert editor.page_pixel_size(0, zoom) == (full.width, full.height)
+
+        columns = -(-full.width // size)
+        rows = -(-full.height // size)
+        for column, row in ((0, 0), (1, 2), (columns - 1, rows - 1)):
+            tile = editor.get_page_tile(0, zoom, column, row, tile_size=size)
+            assert (tile.x, tile.y) == (column * size, row * size), "Riquadro fuori posizione"
+            assert tile.width == min(size, full.width - tile.x)
+            assert tile.height == min(size, full.height - tile.y)
+            # Differenze solo nell'antialiasing dei bordi del ritaglio
+            assert max_difference(tile, full, tile.x, tile.y) < 64, "Contenuto del riquadro errato"
+        print("  ✓ I riquadri ricompongono il render della pagina")
+
+        tile = editor.get_page_tile(0, zoom, 1, 1, tile_size=size)
+        assert editor.get_page_tile(0, zoom, 1, 1, tile_size=size) is tile, "Riquadro non riusato"
+        assert editor.add_rectangle(0, fitz.Rect(100, 100, 200, 200), fill_color=(1, 0, 0))
+        edited = editor.get_page_tile(0, zoom, 1, 1, tile_size=size)
+        assert edited is not tile and edited.pixel(100, 100) == (255, 0, 0), "Riquadro obsoleto"
+        print("  ✓ Riquadri in cache e invalidati dalle modifiche")
+        editor.close_pdf()
+
+        large = make_drawing(os.path.join(work_dir, "a0.pdf"), paper="a0")
+        assert editor.open_pdf(large)
+        assert not editor.needs_tiles(0, 0.5) and editor.needs_tiles(0, 3.0)
+        tile = editor.get_page_tile(0, 3.0, 4, 7)
+        assert (tile.width, tile.height) == (512, 512)
+        assert len(tile.samples) < 1024 * 1024, "Render oltre il riquadro"
+        editor.close_pdf()
+        print("  ✓ A0 al 300%: solo riquadri da 512 pixel")
+
+    return True
+
+
+def test_tiles_in_pool():
+    """Test dei riquadri renderizzati nel pool di PageRenderer"""
+    print("\nTest riquadri nel pool...")
+    from advanced_pdf_editor import AdvancedPDFEditor
+    from page_renderer import PageRenderer
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = make_drawing(os.path.join(work_dir, "a0.pdf"), paper="a0")
+        editor = AdvancedPDFEditor()
+        assert editor.open_pdf(source)
+        renderer = PageRenderer(editor, workers=1)
+        ready = []
+        renderer.tile_ready.connect(lambda page_num, zoom, column, row: ready.append((column, row)))
+        try:
+            zoom = 3.0
+            assert editor.get_page_tile(0, zoom, 4, 7, render=False) is None
+            renderer.request_tiles(0, zoom, [(4, 7), (5, 7)], margin=[(3, 7)])
+            assert not ready and len(renderer.pending_tiles()) == 3, "Riquadri renderizzati subito"
+            wait_for(lambda: not renderer.pending_tiles())
+            assert ready == [(4, 7), (5, 7), (3, 7)], f"Ordine dei riquadri: {ready}"
+            tile = editor.get_page_tile(0, zoom, 4, 7, render=False)
+            with fitz.open(source) as doc:
+                expected = doc[0].get_pixmap(matrix=fitz.Matrix(zoom, zoom),
+                                             clip=fitz.Rect(4 * 512, 7 * 512, 5 * 512, 8 * 512) / zoom)
+            assert (tile.x, tile.y, tile.width, tile.height) == (2048, 3584, 512, 512)
+            assert max_difference(tile, expected, 0, 0) < 64, "Riquadro del pool diverso"
+            print("  ✓ Riquadri visibili e del margine renderizzati nel pool, in ordine")
+
+            assert editor.add_rectangle(0, fitz.Rect(650, 1150, 900, 1400), fill_color=(1, 0, 0))
+            ready.clear()
+            renderer.request_tiles(0, zoom, [(4, 7)], margin=[(3, 7)])
+            assert ready == [(4, 7)] and not renderer.pending_tiles(), \
+                "Pagina modificata: solo i riquadri visibili, in questo processo"
+            assert editor.get_page_tile(0, zoom, 4, 7, render=False).pixel(100, 100) == (255, 0, 0)
+            print("  ✓ Pagina modificata: riquadri visibili renderizzati dal documento in memoria")
+        finally:
+            renderer.shutdown()
+            editor.close_pdf()
+    del app
+    return True
+
+
+if __name__ == "__main__":
+    success = test_page_tiles() and test_tiles_in_pool()
+
+    print("\n" + "=" * 50)
+    print("✅ TUTTI I TEST SUPERATI!" if success else "✗ ALCUNI TEST FALLITI")
+    print("=" * 50)
+    sys.exit(0 if success else 1)